@@ -18,6 +18,7 @@ from unfold.contrib.import_export.forms import SelectableFieldsExportForm
 
 # --- Local Imports ---
 from .models import *
+from .cache import invalidate_dashboard
 
 # --- 1. SETUP ADMIN SITE ---
 admin.site.unregister(User)
@@ -211,6 +212,7 @@ class ClientSubscriptionAdmin(ModelAdmin):
     @action(description="Mark selected subscriptions as inactive/completed")
     def mark_completed(self, request, queryset):
         updated = queryset.update(is_active=False)
+        invalidate_dashboard()
         self.message_user(request, f"{updated} subscription(s) marked as inactive.")
 
     @action(description="Renew selected subscriptions based on plan duration")
@@ -377,4 +379,5 @@ class TrainerScheduleAdmin(ModelAdmin):
 
 # --- Register remaining technical models simply ---
 admin.site.register(TrainingPlan, ModelAdmin)
-admin.site.register(TrainingExercise, ModelAdmin)
\ No newline at end of file
+admin.site.register(TrainingExercise, ModelAdmin)
+admin.site.register(TrainerRevenueLedger, ModelAdmin)
\ No newline at end of file
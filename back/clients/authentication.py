@@ -0,0 +1,126 @@
+"""
+authentication.py — JWT authentication with a persistent token denylist and an
+opt-in mode that builds the user from token claims instead of the database.
+
+DenylistJWTAuthentication is the project-wide default: it is simplejwt's
+JWTAuthentication plus a check against the denylist below.
+
+ClaimsJWTAuthentication is opted into per view (authentication_classes) by
+read-heavy polling endpoints. For GET/HEAD/OPTIONS it returns an unsaved
+User populated from the claims MyTokenObtainPairSerializer writes, so the
+request runs no User or group query; any other method loads the full row
+as usual. A claims-built user cannot be saved (see signals.py).
+
+The denylist is the TokenRevocation table, so a revocation applies to every
+worker process at once and survives restarts; every authenticated request
+checks it with one indexed EXISTS query. A user revocation rejects tokens
+issued at or before it. Login tokens carry their issue time in milliseconds
+(ISSUED_MS_CLAIM, copied into access tokens minted from the refresh token);
+tokens without it fall back to the whole-second `iat`, so one issued in the
+same second as the revocation is rejected too.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenRevocation
+from .roles import IS_RECEPTIONIST_ATTR
+
+CLAIMS_USER_ATTR = "_from_claims"
+ISSUED_MS_CLAIM = "iat_ms"
+
+
+# ---------------------------------------------------------------------------
+# DENYLIST
+# ---------------------------------------------------------------------------
+
+def _denylist_expiry(now):
+    return now + max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+
+
+def _revoke(**fields):
+    now = timezone.now()
+    TokenRevocation.objects.filter(expires_at__lte=now).delete()
+    TokenRevocation.objects.create(revoked_at=now, expires_at=_denylist_expiry(now), **fields)
+
+
+def revoke_token(token):
+    """Rejects this one token (by its jti) until it would have expired anyway."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti:
+        _revoke(jti=jti)
+
+
+def revoke_user_tokens(user_id):
+    """Rejects every token issued to `user_id` up to and including the current second."""
+    _revoke(user_id=user_id)
+
+
+def _issued_at(token):
+    if token.get(ISSUED_MS_CLAIM) is not None:
+        return datetime.fromtimestamp(int(token[ISSUED_MS_CLAIM]) / 1000, tz=dt_timezone.utc)
+    if token.get("iat") is not None:
+        return datetime.fromtimestamp(int(token["iat"]), tz=dt_timezone.utc)
+    return None
+
+
+def is_revoked(token) -> bool:
+    conditions = Q()
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti:
+        conditions |= Q(jti=jti)
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_id is not None:
+        user_rows = Q(user_id=int(user_id))
+        issued_at = _issued_at(token)
+        if issued_at is not None:
+            user_rows &= Q(revoked_at__gte=issued_at)
+        conditions |= user_rows
+    if not conditions:
+        return False
+    return TokenRevocation.objects.filter(conditions, expires_at__gt=timezone.now()).exists()
+
+
+# ---------------------------------------------------------------------------
+# AUTHENTICATION CLASSES
+# ---------------------------------------------------------------------------
+
+class DenylistJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        return token
+
+
+class ClaimsJWTAuthentication(DenylistJWTAuthentication):
+    """Skips the per-request User fetch on safe methods (see module docstring)."""
+
+    REQUIRED_CLAIMS = ("username", "first_name", "is_superuser", "is_receptionist")
+
+    def authenticate(self, request):
+        self._safe = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not self._safe or any(claim not in validated_token for claim in self.REQUIRED_CLAIMS):
+            return super().get_user(validated_token)
+
+        user = User(
+            id=validated_token[api_settings.USER_ID_CLAIM],
+            username=validated_token["username"],
+            first_name=validated_token["first_name"],
+            is_superuser=bool(validated_token["is_superuser"]),
+            is_active=True,
+        )
+        user._state.adding = False
+        setattr(user, CLAIMS_USER_ATTR, True)
+        setattr(user, IS_RECEPTIONIST_ATTR, bool(validated_token["is_receptionist"]))
+        return user
@@ -0,0 +1,76 @@
+"""
+cache.py — response cache for the dashboard stats endpoint, plus the
+content-ETag helpers other read endpoints share.
+
+Entries are keyed by (generation, role, user, month, year, host). Any write
+to data the dashboard is built from bumps the generation, which orphans
+every cached response at once; orphaned entries simply expire. This works
+the same on the local-memory and file-based backends because it never has
+to enumerate or delete keys.
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+GENERATION_KEY = "dashboard:generation"
+
+
+def dashboard_generation() -> int:
+    """Current generation, created on first use."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        cache.add(GENERATION_KEY, generation, None)
+        generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+def _bump():
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def invalidate_dashboard():
+    """
+    Drops every cached dashboard response.
+
+    The generation is bumped immediately (so later reads in the same
+    transaction miss) and again on commit, so a response computed
+    concurrently from pre-commit data is never served afterwards.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def dashboard_cache_key(generation, role, user_id, month, year, host) -> str:
+    return f"dashboard:{generation}:{role}:{user_id}:{year}-{month:02d}:{host}"
+
+
+def get_cached_dashboard(key):
+    """(etag, data) for `key`, or None."""
+    return cache.get(key)
+
+
+def set_cached_dashboard(key, data) -> str:
+    """Stores `data` under `key` and returns its strong ETag."""
+    etag = content_etag(data)
+    cache.set(key, (etag, data), settings.DASHBOARD_CACHE_TIMEOUT)
+    return etag
+
+
+def content_etag(data) -> str:
+    """Strong ETag for a JSON-serializable response payload."""
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(request, etag) -> bool:
+    """True when the request's If-None-Match lists `etag` (or is `*`)."""
+    header = request.headers.get("If-None-Match", "")
+    candidates = {tag.strip() for tag in header.split(",") if tag.strip()}
+    return etag in candidates or "*" in candidates
@@ -0,0 +1,127 @@
+"""
+food_catalog.py — the whole FoodDatabase as one versioned, compressed,
+columnar document, plus deltas between versions.
+
+Every FoodDatabase save/delete appends a FoodCatalogChange row (signals.py)
+numbered from the FoodCatalogSequence counter, which is bumped in the same
+transaction, so a committed sequence N means every change up to N is
+visible (auto-increment ids are not: a transaction holding a lower id can
+commit after a higher one). A snapshot is built once per sequence and kept
+in the default cache already serialized and compressed (gzip, and brotli
+when the optional `brotli` package is installed), so serving it costs one
+primary-key lookup of the counter. Its version is "<sequence>.<content
+hash>", used as the ETag.
+
+Clients fetch the snapshot once, then ask for the delta since the version
+they hold: the current rows of every food changed after that sequence and
+the ids of the ones deleted.
+"""
+
+import gzip
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import FoodCatalogChange, FoodCatalogSequence, FoodDatabase
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available.
+    brotli = None
+
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+COLUMNS = (
+    "id", "name", "arabic_name", "calories_per_100g", "protein_per_100g", "carbs_per_100g",
+    "fats_per_100g", "fiber_per_100g", "grams_per_serving", "common_serving_size", "is_verified",
+)
+# Low-cardinality text columns, sent as indices into a value table.
+DICTIONARY_COLUMNS = ("category", "serving_unit")
+
+
+def current_sequence() -> int:
+    return FoodCatalogSequence.objects.filter(pk=1).values_list("value", flat=True).first() or 0
+
+
+def parse_version(version):
+    """Sequence number of a "<sequence>.<hash>" version (or a bare sequence), or None."""
+    try:
+        return int(str(version).strip().strip('"').split(".", 1)[0])
+    except (TypeError, ValueError):
+        return None
+
+
+def columnar(rows) -> dict:
+    """{"columns": {name: [values...]}, "dictionaries": {name: [distinct values]}} for value dicts."""
+    columns = {name: [row[name] for row in rows] for name in COLUMNS}
+    dictionaries = {}
+    for name in DICTIONARY_COLUMNS:
+        table, codes = {}, []
+        for row in rows:
+            codes.append(table.setdefault(row[name], len(table)))
+        dictionaries[name] = list(table)
+        columns[name] = codes
+    return {"columns": columns, "dictionaries": dictionaries}
+
+
+def _rows(queryset):
+    return list(queryset.order_by("id").values(*COLUMNS, *DICTIONARY_COLUMNS))
+
+
+def snapshot():
+    """
+    (version, {encoding: body bytes}) for the current catalog; encodings are
+    "identity", "gzip" and, with brotli installed, "br".
+    """
+    sequence = current_sequence()
+    key = f"food_catalog:{sequence}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = _rows(FoodDatabase.objects.all())
+    document = {"count": len(rows), **columnar(rows)}
+    digest = hashlib.sha256(json.dumps(document, cls=DjangoJSONEncoder, sort_keys=True).encode()).hexdigest()
+    version = f"{sequence}.{digest[:16]}"
+
+    body = json.dumps(
+        {"version": version, "sequence": sequence, **document},
+        cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":"),
+    ).encode()
+    bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body)
+
+    cache.set(key, (version, bodies), SNAPSHOT_TIMEOUT)
+    return version, bodies
+
+
+def delta(since_sequence):
+    """
+    Changes after `since_sequence`: {"since", "version", "sequence",
+    "upserted": columnar rows of foods changed since, "deleted": [ids]}.
+    """
+    version, _ = snapshot()
+    sequence = parse_version(version)
+    food_ids = set(
+        FoodCatalogChange.objects.filter(sequence__gt=since_sequence, sequence__lte=sequence)
+        .values_list("food_id", flat=True)
+    )
+    rows = _rows(FoodDatabase.objects.filter(id__in=food_ids)) if food_ids else []
+    return {
+        "since": since_sequence,
+        "version": version,
+        "sequence": sequence,
+        "upserted": {"count": len(rows), **columnar(rows)},
+        "deleted": sorted(food_ids - {row["id"] for row in rows}),
+    }
+
+
+def pick_encoding(accept_encoding, bodies) -> str:
+    """Best encoding in `bodies` the client accepts (br > gzip > identity)."""
+    accepted = {part.split(";", 1)[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    for encoding in ("br", "gzip"):
+        if encoding in bodies and encoding in accepted:
+            return encoding
+    return "identity"
@@ -0,0 +1,269 @@
+"""
+food_search.py — in-process autocomplete index over FoodDatabase.
+
+Every food's name, Arabic name and category are normalized (case, Latin accents,
+Arabic diacritics / tatweel, alef-hamza, alef-maqsura, ta-marbuta and
+hamza-seat variants) and split into tokens; Arabic words are indexed with
+and without the definite article. Tokens live in a sorted list,
+so a prefix lookup is a bisect plus a short scan, and in a trigram map used
+only when a query token has no prefix match at all (typos).
+
+Ranking, highest first: whole name equals the query, name starts with the
+query, every query token prefix-matches a name token, fuzzy token matches.
+Verified foods get a small boost; remaining ties go to shorter names.
+
+The index is built once per process on first use and then kept current
+incrementally by the FoodDatabase signals in signals.py. Those bump a
+generation in the default cache as well, so other worker processes notice
+(on their next search) and rebuild; with the local-memory cache that only
+covers the current process, exactly like the dashboard cache.
+"""
+
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from .models import FoodDatabase
+
+GENERATION_KEY = "food_search:generation"
+
+# Fields copied into each entry so autocomplete answers need no query.
+ENTRY_FIELDS = (
+    "id", "name", "arabic_name", "category",
+    "calories_per_100g", "protein_per_100g", "carbs_per_100g", "fats_per_100g", "fiber_per_100g",
+    "serving_unit", "grams_per_serving", "is_verified",
+)
+
+# After NFKD decomposition hamza/madda seats (أ إ آ ؤ ئ) and harakat are
+# combining marks and get dropped; these remaining variants are folded.
+_ARABIC_FOLD = str.maketrans({
+    "\u0640": "",        # tatweel
+    "\u0621": "",        # standalone hamza
+    "\u0671": "\u0627",  # alef wasla → alef
+    "\u0649": "\u064A",  # alef maqsura → yeh
+    "\u0629": "\u0647",  # ta marbuta → heh
+})
+# Latin accents and Arabic harakat / hamza and madda marks, as left by NFKD.
+_COMBINING = re.compile("[\u0300-\u036f\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]")
+_TOKEN_SPLIT = re.compile(r"[^\w]+")
+
+FUZZY_THRESHOLD = 0.4
+
+
+def normalize(text) -> str:
+    """Lower-cased, accent/diacritic-free form used for indexing and queries."""
+    text = (text or "").lower()
+    if text.isascii():
+        return text
+    return _COMBINING.sub("", unicodedata.normalize("NFKD", text)).translate(_ARABIC_FOLD)
+
+
+def tokenize(text) -> list:
+    return _split(normalize(text))
+
+
+def _split(normalized) -> list:
+    return [token for token in _TOKEN_SPLIT.split(normalized) if token]
+
+
+def trigrams(token) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def food_generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        cache.add(GENERATION_KEY, generation, None)
+        generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+class FoodSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.generation = None
+        self.entries = {}        # food id → entry dict (ENTRY_FIELDS + private "_" ranking keys)
+        self._tokens = []        # sorted distinct tokens
+        self._postings = {}      # token → {food ids}
+        self._trigrams = {}      # trigram → {tokens}
+
+    # ── Maintenance ───────────────────────────────────────────────────────
+
+    def build(self, rows, generation=None):
+        """Replaces the whole index with `rows` (dicts carrying ENTRY_FIELDS)."""
+        with self._lock:
+            self.entries, self._postings, self._trigrams = {}, {}, {}
+            for row in rows:
+                self._add(row)
+            self._tokens = sorted(self._postings)
+            self.generation = generation
+
+    def upsert(self, row):
+        with self._lock:
+            self._remove(row["id"])
+            for token in self._add(row):
+                insort(self._tokens, token)
+
+    def remove(self, food_id):
+        with self._lock:
+            self._remove(food_id)
+
+    def _add(self, row):
+        """Indexes one row; returns the tokens that were not indexed before."""
+        entry = {field: row.get(field) for field in ENTRY_FIELDS}
+        name_tokens = [_split(normalize(row.get(field))) for field in ("name", "arabic_name")]
+        entry["_names"] = [" ".join(t) for t in name_tokens if t]
+        tokens = {*name_tokens[0], *name_tokens[1], *tokenize(row.get("category"))}
+        # "الدجاج" should also be found by "دجاج": index the word without the article.
+        tokens |= {t[2:] for t in tokens if t.startswith("\u0627\u0644") and len(t) > 4}
+        entry["_tokens"] = tokens
+        entry["_boost"] = 1 if row.get("is_verified") else 0
+        entry["_length"] = len(row.get("name") or "")
+        self.entries[row["id"]] = entry
+
+        new_tokens = []
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                new_tokens.append(token)
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings.add(row["id"])
+        return new_tokens
+
+    def _remove(self, food_id):
+        entry = self.entries.pop(food_id, None)
+        if entry is None:
+            return
+        for token in entry["_tokens"]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(food_id)
+            if not postings:
+                del self._postings[token]
+                index = bisect_left(self._tokens, token)
+                if index < len(self._tokens) and self._tokens[index] == token:
+                    del self._tokens[index]
+                for gram in trigrams(token):
+                    grams = self._trigrams.get(gram)
+                    if grams is not None:
+                        grams.discard(token)
+                        if not grams:
+                            del self._trigrams[gram]
+
+    # ── Querying ──────────────────────────────────────────────────────────
+
+    def search(self, query, limit=20, category=None):
+        """Up to `limit` entries best matching `query`, best first."""
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        query_text = " ".join(query_tokens)
+
+        with self._lock:
+            per_token = []
+            for token in query_tokens:
+                matches = self._prefix_matches(token) or self._fuzzy_matches(token)
+                if not matches:
+                    return []
+                per_token.append(matches)
+            per_token.sort(key=len)
+            candidates = per_token[0].keys()
+            for matches in per_token[1:]:
+                candidates = candidates & matches.keys()
+
+            entries = self.entries
+
+            def keyed():
+                for food_id in candidates:
+                    entry = entries[food_id]
+                    if category and entry["category"] != category:
+                        continue
+                    score = entry["_boost"]
+                    for matches in per_token:
+                        score += matches[food_id]
+                    names = entry["_names"]
+                    if query_text in names:
+                        score += 100
+                    elif any(name.startswith(query_text) for name in names):
+                        score += 50
+                    yield -score, entry["_length"], food_id
+
+            top = heapq.nsmallest(limit, keyed())
+            return [self.public(entries[food_id]) for _, _, food_id in top]
+
+    @staticmethod
+    def public(entry):
+        return {field: entry[field] for field in ENTRY_FIELDS}
+
+    def _prefix_matches(self, token):
+        """{food_id: score}; a whole-token match scores 10, a prefix 5-6 (closer is higher)."""
+        tokens, index = self._tokens, bisect_left(self._tokens, token)
+        found = []
+        while index < len(tokens) and tokens[index].startswith(token):
+            found.append(tokens[index])
+            index += 1
+        found.sort(key=len)  # Best score first, so setdefault keeps each food's best.
+
+        matches = {}
+        for candidate in found:
+            score = 10.0 if candidate == token else 5.0 + len(token) / len(candidate)
+            for food_id in self._postings[candidate]:
+                matches.setdefault(food_id, score)
+        return matches
+
+    def _fuzzy_matches(self, token):
+        """{food_id: score} for tokens sharing enough trigrams with `token`."""
+        if len(token) < 3:
+            return {}
+        query_grams = trigrams(token)
+        shared = {}
+        for gram in query_grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        matches = {}
+        for candidate, count in shared.items():
+            similarity = count / len(query_grams | trigrams(candidate))
+            if similarity < FUZZY_THRESHOLD:
+                continue
+            for food_id in self._postings[candidate]:
+                if similarity > matches.get(food_id, 0):
+                    matches[food_id] = similarity
+        return matches
+
+
+_index = FoodSearchIndex()
+
+
+def food_index() -> FoodSearchIndex:
+    """The process-wide index, (re)built if another process changed the foods."""
+    generation = food_generation()
+    if _index.generation != generation:
+        _index.build(FoodDatabase.objects.values(*ENTRY_FIELDS).iterator(), generation)
+    return _index
+
+
+def food_changed(row=None, removed_id=None):
+    """
+    Applies one FoodDatabase change to this process's index and bumps the
+    shared generation so other processes rebuild. Called from signals.py.
+    """
+    built = _index.generation is not None and _index.generation == food_generation()
+    generation = time.time_ns()
+    cache.set(GENERATION_KEY, generation, None)
+    if not built:
+        return  # Built lazily (and fully) on the next search.
+    if row is not None:
+        _index.upsert(row)
+    if removed_id is not None:
+        _index.remove(removed_id)
+    _index.generation = generation
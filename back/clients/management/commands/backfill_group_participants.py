@@ -0,0 +1,100 @@
+# clients/management/commands/backfill_group_participants.py
+#
+# Migration 0018 already fills rows deducted before the participant charge
+# snapshot existed. Run manually only after participants were bulk-written
+# outside the app (imports, shell scripts) without a snapshot:
+#   python manage.py backfill_group_participants
+#   python manage.py backfill_group_participants --dry-run
+#
+# Afterwards rebuild the revenue ledger so it reflects the snapshots:
+#   python manage.py rebuild_revenue_ledger
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from clients.models import ClientSubscription, GroupSessionParticipant, TrainerRevenueLedger
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill subscription / owner_trainer / session_value on deducted\n"
+        "GroupSessionParticipant rows written before the charge snapshot existed.\n\n"
+        "The charged subscription is taken to be the client's subscription whose\n"
+        "start_date..end_date window covers the session date (latest start wins);\n"
+        "if none covers it, the client's latest active subscription is used, which\n"
+        "is what the dashboard assumed before."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help='Report how many rows would be filled without writing anything.',
+        )
+
+    def handle(self, *args, **options):
+        pending = (
+            GroupSessionParticipant.objects.filter(
+                deducted=True, client__isnull=False, subscription__isnull=True,
+            )
+            .select_related('session')
+            .order_by('pk')
+        )
+        total = pending.count()
+        if not total:
+            self.stdout.write(self.style.SUCCESS("No participants need backfilling."))
+            return
+
+        client_ids = set(pending.values_list('client_id', flat=True))
+        subs_by_client: dict = {}
+        for sub in (
+            ClientSubscription.objects.filter(client_id__in=client_ids)
+            .select_related('plan')
+            .order_by('-start_date', '-pk')
+        ):
+            subs_by_client.setdefault(sub.client_id, []).append(sub)
+
+        to_update, unresolved = [], 0
+        for participant in pending.iterator(chunk_size=BATCH_SIZE):
+            sub = self._resolve(participant, subs_by_client.get(participant.client_id, []))
+            if sub is None:
+                unresolved += 1
+                continue
+            participant.subscription = sub
+            participant.owner_trainer_id = sub.trainer_id
+            participant.session_value = TrainerRevenueLedger.session_value(sub.plan)
+            to_update.append(participant)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"DRY RUN — {len(to_update)} of {total} participant(s) would be filled, "
+                f"{unresolved} have no matching subscription."
+            ))
+            return
+
+        with transaction.atomic():
+            GroupSessionParticipant.objects.bulk_update(
+                to_update,
+                ['subscription', 'owner_trainer', 'session_value'],
+                batch_size=BATCH_SIZE,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Filled {len(to_update)} of {total} participant(s); "
+            f"{unresolved} left without a matching subscription."
+        ))
+
+    # ── Private helpers ───────────────────────────────────────────────────
+
+    @staticmethod
+    def _resolve(participant, subs):
+        """Subscription that most plausibly paid for `participant` (subs are newest first)."""
+        session_date = timezone.localtime(participant.session.date).date()
+        for sub in subs:
+            if sub.start_date <= session_date and (sub.end_date is None or session_date <= sub.end_date):
+                return sub
+        return next((sub for sub in subs if sub.is_active), None)
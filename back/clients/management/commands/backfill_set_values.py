@@ -0,0 +1,81 @@
+# clients/management/commands/backfill_set_values.py
+#
+# Run manually (once, after migrating to the parsed set columns):
+#   python manage.py backfill_set_values
+#   python manage.py backfill_set_values --dry-run
+#
+# Re-running is safe: only rows whose parsed reps_value / weight_value /
+# weight_unit differ from what their free-text reps and weight parse to are
+# written, so it can also be used after changing the parser.
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clients.models import ExerciseHistoryEntry, SessionSet, TrainingSession, TrainingSet
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Parse the free-text reps / weight of every TrainingSet and SessionSet into\n"
+        "the numeric reps_value, weight_value and weight_unit columns, then rebuild\n"
+        "the exercise history index of the completed sessions that changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help='Report how many rows would change without writing anything.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        plan_changed, _ = self._backfill(TrainingSet, dry_run)
+        session_changed, session_ids = self._backfill(SessionSet, dry_run)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"DRY RUN — {plan_changed} plan set(s) and {session_changed} session set(s) would be "
+                f"updated, touching {len(session_ids)} session(s)."
+            ))
+            return
+
+        completed = TrainingSession.objects.filter(pk__in=session_ids, is_completed=True)
+        for session in completed.iterator():
+            ExerciseHistoryEntry.rebuild_for_session(session)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {plan_changed} plan set(s) and {session_changed} session set(s); "
+            f"re-indexed {completed.count()} completed session(s)."
+        ))
+
+    # ── Private helpers ───────────────────────────────────────────────────
+
+    def _backfill(self, model, dry_run):
+        """Returns (rows changed, ids of the sessions they belong to — SessionSet only)."""
+        changed, session_ids, batch = 0, set(), []
+
+        def flush():
+            if batch and not dry_run:
+                with transaction.atomic():
+                    model.objects.bulk_update(batch, model.PARSED_FIELDS)
+            batch.clear()
+
+        rows = model.objects.order_by('pk')
+        if model is SessionSet:
+            rows = rows.select_related('exercise')
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            if not row.parse_values():
+                continue
+            changed += 1
+            if model is SessionSet:
+                session_ids.add(row.exercise.training_session_id)
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        flush()
+        return changed, session_ids
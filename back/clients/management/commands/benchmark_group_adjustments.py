@@ -0,0 +1,183 @@
+# clients/management/commands/benchmark_group_adjustments.py
+#
+# Run manually (against a development or staging database):
+#   python manage.py benchmark_group_adjustments
+#   python manage.py benchmark_group_adjustments --sizes 1000 10000 100000 --repeat 3
+#
+# Seeds synthetic coaches, children, subscriptions and group-session
+# participants (charged through bulk_deduct(), with unsubscribed children,
+# children holding two active subscriptions and coaches who own their
+# children) for one month inside a transaction, times the current
+# _compute_group_adjustments() against the original correlated-subquery
+# implementation, checks both return the same totals, then rolls everything back.
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from clients.models import (
+    Client, ClientSubscription, GroupSessionLog, GroupSessionParticipant, Subscription,
+)
+from clients.views.utils import _compute_group_adjustments
+
+COACHES = 10
+CHILDREN_PER_SESSION = 25
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_group_adjustments(month: int, year: int) -> dict:
+    """The pre-rewrite implementation: three correlated subqueries per participant."""
+    active_sub = ClientSubscription.objects.filter(
+        client=OuterRef("client"),
+        is_active=True,
+        plan__units__gt=0,
+        trainer__isnull=False,
+    ).order_by("-start_date")
+
+    qs = (
+        GroupSessionParticipant.objects.filter(
+            deducted=True,
+            client__isnull=False,
+            session__date__month=month,
+            session__date__year=year,
+            session__coach__isnull=False,
+        )
+        .annotate(
+            coach_id_ann=F("session__coach_id"),
+            owner_id_ann=Subquery(active_sub.values("trainer_id")[:1]),
+            price_ann=Subquery(active_sub.values("plan__price")[:1]),
+            units_ann=Subquery(active_sub.values("plan__units")[:1]),
+        )
+        .filter(
+            owner_id_ann__isnull=False,
+            price_ann__isnull=False,
+            units_ann__isnull=False,
+        )
+        .exclude(coach_id_ann=F("owner_id_ann"))
+        .values("id", "coach_id_ann", "owner_id_ann", "price_ann", "units_ann")
+    )
+
+    adjustments: dict = {}
+    for row in qs:
+        if not row["units_ann"]:
+            continue
+        session_value = Decimal(str(row["price_ann"])) / Decimal(str(row["units_ann"]))
+        owner = row["owner_id_ann"]
+        coach = row["coach_id_ann"]
+        adjustments[owner] = adjustments.get(owner, Decimal(0)) - session_value
+        adjustments[coach] = adjustments.get(coach, Decimal(0)) + session_value
+    return adjustments
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark _compute_group_adjustments() against the legacy correlated-subquery\n"
+        "implementation on synthetic data. All seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Participant counts to benchmark (default: 1000 10000 100000).',
+        )
+        parser.add_argument('--repeat', type=int, default=1, help='Timed runs per size (best is kept).')
+        parser.add_argument(
+            '--skip-legacy', action='store_true', default=False,
+            help='Only time the current implementation (the legacy one is slow at 100k).',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        self.stdout.write(f"{'participants':>12} | {'current (s)':>11} | {'legacy (s)':>10} | match")
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self._seed(size, now)
+                    current = self._time(_compute_group_adjustments, now, options['repeat'])
+                    legacy = (None, None)
+                    if not options['skip_legacy']:
+                        legacy = self._time(_legacy_group_adjustments, now, options['repeat'])
+                    self._report(size, current, legacy)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    # ── Private helpers ───────────────────────────────────────────────────
+
+    def _seed(self, size, now):
+        """
+        Children charged through GroupSessionParticipant.bulk_deduct(), as the
+        app does. Every tenth child has no subscription and every tenth (offset
+        by five) a second, older active one with another trainer; subscription
+        trainers and session coaches are drawn from the same pool, so some
+        coaches own the children they train.
+        """
+        tag = f"bench-{now.timestamp():.0f}-{size}"
+        coaches = User.objects.bulk_create([
+            User(username=f"{tag}-coach-{i}") for i in range(COACHES)
+        ])
+        plan = Subscription.objects.create(name=tag, units=size, duration_days=30, price=Decimal('1500.00'))
+
+        children_count = max(size // 20, CHILDREN_PER_SESSION)
+        children = Client.objects.bulk_create([
+            Client(name=f"{tag}-child-{i}", manual_id=f"{tag}-{i}", is_child=True)
+            for i in range(children_count)
+        ])
+        # bulk_create skips ClientSubscription.save(), so the ledger is untouched.
+        subs = []
+        for i, child in enumerate(children):
+            if i % 10 == 0:
+                continue
+            subs.append(ClientSubscription(
+                client=child, plan=plan, trainer=coaches[(i * 3) % COACHES],
+                start_date=now.date(), is_active=True,
+            ))
+            if i % 10 == 5:
+                subs.append(ClientSubscription(
+                    client=child, plan=plan, trainer=coaches[(i * 3 + 1) % COACHES],
+                    start_date=now.date() - timedelta(days=7), is_active=True,
+                ))
+        ClientSubscription.objects.bulk_create(subs)
+
+        sessions_count = -(-size // CHILDREN_PER_SESSION)
+        sessions = GroupSessionLog.objects.bulk_create([
+            GroupSessionLog(coach=coaches[i % COACHES], date=now, day_name="Bench")
+            for i in range(sessions_count)
+        ])
+        for n, session in enumerate(sessions):
+            first = n * CHILDREN_PER_SESSION
+            GroupSessionParticipant.bulk_deduct(session, [
+                (children[(i * 7) % children_count].pk, "")
+                for i in range(first, min(first + CHILDREN_PER_SESSION, size))
+            ])
+
+    def _time(self, fn, now, repeat):
+        best, result = None, None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            result = fn(now.month, now.year)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _report(self, size, current, legacy):
+        current_time, current_result = current
+        legacy_time, legacy_result = legacy
+        if legacy_result is None:
+            match = "-"
+        else:
+            quantize = lambda d: {k: v.quantize(Decimal('0.0001')) for k, v in d.items() if v}
+            if quantize(current_result) != quantize(legacy_result):
+                raise CommandError(f"Results differ at {size} participants.")
+            match = "yes"
+        legacy_str = f"{legacy_time:>10.3f}" if legacy_time is not None else f"{'-':>10}"
+        self.stdout.write(f"{size:>12} | {current_time:>11.3f} | {legacy_str} | {match}")
@@ -0,0 +1,146 @@
+# clients/management/commands/benchmark_save_data.py
+#
+# Run manually once per database profile and compare the summary lines:
+#   python manage.py benchmark_save_data
+#   DB_ENGINE=postgres POSTGRES_DB=gym python manage.py benchmark_save_data --threads 16
+#
+# Seeds a trainer, a plan and one client + subscription per thread, then has
+# every thread POST /training-sessions/save-data/ in a loop (the same request
+# the workout editor sends), reporting throughput, latency percentiles and
+# failed requests ("database is locked" shows up here). Seeded rows are
+# deleted afterwards; the run does commit, so point it at a scratch database.
+
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from rest_framework.test import APIClient
+
+from clients.models import Client, ClientSubscription, Subscription
+
+EXERCISES_PER_SESSION = 6
+SETS_PER_EXERCISE = 4
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the training-session save-data endpoint with concurrent writers\n"
+        "against the configured database profile (see DB_ENGINE in settings)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writers (default: 8).')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per writer (default: 50).')
+        parser.add_argument(
+            '--complete-every', type=int, default=5,
+            help='Every Nth request also marks the session complete (default: 5, 0 = never).',
+        )
+
+    def handle(self, *args, **options):
+        threads, per_thread = options['threads'], options['requests']
+        tag = f"bench-save-{time.time_ns()}"
+        trainer, plan, subs = self._seed(tag, threads, per_thread)
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(threads)
+
+        def worker(sub_id):
+            api = APIClient()
+            api.force_authenticate(user=trainer)
+            start_barrier.wait()
+            try:
+                for i in range(per_thread):
+                    payload = self._payload(sub_id, i, options['complete_every'])
+                    started = time.perf_counter()
+                    try:
+                        response = api.post("/api/training-sessions/save-data/", payload, format="json")
+                        failed = response.status_code != 200 and f"HTTP {response.status_code}"
+                    except Exception as exc:  # e.g. OperationalError: database is locked
+                        failed = f"{type(exc).__name__}: {exc}"
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        if failed:
+                            errors.append(failed)
+            finally:
+                connections.close_all()
+
+        pool = [threading.Thread(target=worker, args=(sub.pk,)) for sub in subs]
+        wall_started = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        wall = time.perf_counter() - wall_started
+
+        try:
+            self._report(threads, latencies, errors, wall)
+        finally:
+            self._cleanup(tag, trainer, plan)
+
+    # ── Private helpers ───────────────────────────────────────────────────
+
+    def _seed(self, tag, threads, per_thread):
+        trainer = User.objects.create(username=tag)
+        plan = Subscription.objects.create(
+            name=tag, units=per_thread + 1, duration_days=30, price=Decimal('1000.00')
+        )
+        clients = Client.objects.bulk_create([
+            Client(name=f"{tag}-{i}", manual_id=f"{tag}-{i}") for i in range(threads)
+        ])
+        # bulk_create skips ClientSubscription.save(), so the ledger is untouched.
+        subs = ClientSubscription.objects.bulk_create([
+            ClientSubscription(client=c, plan=plan, trainer=trainer, is_active=True) for c in clients
+        ])
+        return trainer, plan, subs
+
+    @staticmethod
+    def _payload(sub_id, i, complete_every):
+        return {
+            "subscription": sub_id,
+            "session_number": i + 1,
+            "name": f"Session {i + 1}",
+            "mark_complete": bool(complete_every) and (i + 1) % complete_every == 0,
+            "exercises": [
+                {
+                    "name": f"Exercise {e + 1}",
+                    "note": "",
+                    "sets": [
+                        {"reps": "10", "weight": f"{20 + s * 5}", "technique": "Regular", "equipment": ""}
+                        for s in range(SETS_PER_EXERCISE)
+                    ],
+                }
+                for e in range(EXERCISES_PER_SESSION)
+            ],
+        }
+
+    def _report(self, threads, latencies, errors, wall):
+        settings_dict = connection.settings_dict
+        profile = connection.vendor
+        if profile == "sqlite":
+            profile += f" ({settings_dict['OPTIONS'].get('transaction_mode', 'DEFERRED')})"
+        else:
+            profile += f" (CONN_MAX_AGE={settings_dict.get('CONN_MAX_AGE')})"
+
+        ordered = sorted(latencies)
+        pct = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+        self.stdout.write(
+            f"{profile}: {len(latencies)} requests, {threads} threads, {wall:.2f}s wall, "
+            f"{len(latencies) / wall:.1f} req/s, p50 {pct(0.50):.0f}ms, p95 {pct(0.95):.0f}ms, "
+            f"max {ordered[-1] * 1000:.0f}ms, mean {statistics.mean(ordered) * 1000:.0f}ms"
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"{len(errors)} failed request(s); first: {errors[0]}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No failed requests."))
+
+    @staticmethod
+    def _cleanup(tag, trainer, plan):
+        Client.objects.filter(name__startswith=f"{tag}-").delete()
+        plan.delete()
+        trainer.delete()
@@ -13,6 +13,7 @@ from django.core.management.base import BaseCommand
 from django.db.models import F
 from django.utils import timezone
 from django.db import transaction
+from importlib import import_module
 
 # APP_LABEL is the only value to change if the app is ever renamed.
 APP_LABEL = 'clients'
@@ -26,6 +27,8 @@ except LookupError as exc:
         f"Check APP_LABEL in expire_subscriptions.py. Original error: {exc}"
     )
 
+invalidate_dashboard = import_module(f'{APP_LABEL}.cache').invalidate_dashboard
+
 
 class Command(BaseCommand):
     help = (
@@ -117,6 +120,8 @@ class Command(BaseCommand):
             # Re-evaluate after the first update so we don't double-count rows
             # that match both criteria (end_date expired AND sessions exhausted).
             updated_session = session_exhausted_qs.update(is_active=False)
+            if updated_date or updated_session:
+                invalidate_dashboard()
 
         total_updated = updated_date + updated_session
 
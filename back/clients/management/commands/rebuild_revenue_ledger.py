@@ -0,0 +1,127 @@
+# clients/management/commands/rebuild_revenue_ledger.py
+#
+# Run manually:
+#   python manage.py rebuild_revenue_ledger                      # every month with activity
+#   python manage.py rebuild_revenue_ledger --year 2026 --month 3
+#   python manage.py rebuild_revenue_ledger --verify             # report drift, write nothing
+#
+# Run once after deploying the ledger so historical months are populated, and
+# after any bulk_create() / queryset update() or delete() of subscriptions,
+# sessions or group participants made outside the app (imports, shell
+# scripts): those bypass the model hooks that keep the ledger current. Then
+# optionally nightly with --verify next to expire_subscriptions:
+#   30 0 * * * /path/to/venv/bin/python /path/to/manage.py rebuild_revenue_ledger --verify >> /var/log/revenue_ledger.log 2>&1
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from clients.cache import invalidate_dashboard
+from clients.models import (
+    ClientSubscription, GroupSessionLog, TrainingSession, TrainerRevenueLedger,
+)
+from clients.views.utils import _compute_monthly_revenue
+
+# Ledger rows and the ad-hoc computation may differ by sub-cent rounding of
+# price / units; anything larger is reported as drift.
+TOLERANCE = Decimal('0.01')
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild TrainerRevenueLedger rows from ClientSubscription, TrainingSession and\n"
+        "GroupSessionParticipant data, or with --verify compare the stored ledger\n"
+        "against the same ad-hoc computation without writing anything."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Only this year (all months unless --month is given).')
+        parser.add_argument('--month', type=int, help='Only this month (requires --year).')
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            default=False,
+            help='Compare the ledger with a fresh computation and exit non-zero on drift.',
+        )
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        if month and not year:
+            raise CommandError('--month requires --year.')
+        if month and not 1 <= month <= 12:
+            raise CommandError('--month must be between 1 and 12.')
+
+        periods = self._periods(year, month)
+        if not periods:
+            self.stdout.write(self.style.SUCCESS("No activity found. Nothing to do."))
+            return
+
+        if options['verify']:
+            drift = sum(self._verify_period(y, m) for y, m in periods)
+            if drift:
+                raise CommandError(f"{drift} ledger row(s) drifted from the ad-hoc computation.")
+            self.stdout.write(self.style.SUCCESS(f"Ledger verified for {len(periods)} month(s)."))
+            return
+
+        rows = 0
+        for y, m in periods:
+            rows += self._rebuild_period(y, m)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {rows} ledger row(s) across {len(periods)} month(s).")
+        )
+
+    # ── Private helpers ───────────────────────────────────────────────────
+
+    def _periods(self, year, month):
+        """Sorted (year, month) pairs that have any revenue-relevant activity."""
+        if year and month:
+            return [(year, month)]
+
+        periods = set()
+        for d in ClientSubscription.objects.datetimes('created_at', 'month'):
+            periods.add((d.year, d.month))
+        for d in TrainingSession.objects.filter(is_completed=True).dates('date_completed', 'month'):
+            periods.add((d.year, d.month))
+        for d in GroupSessionLog.objects.datetimes('date', 'month'):
+            periods.add((d.year, d.month))
+        for y, m in TrainerRevenueLedger.objects.values_list('year', 'month').distinct():
+            periods.add((y, m))
+
+        if year:
+            periods = {p for p in periods if p[0] == year}
+        return sorted(periods)
+
+    def _rebuild_period(self, year, month) -> int:
+        figures = _compute_monthly_revenue(month, year)
+        with transaction.atomic():
+            TrainerRevenueLedger.objects.filter(year=year, month=month).delete()
+            TrainerRevenueLedger.objects.bulk_create([
+                TrainerRevenueLedger(trainer_id=trainer_id, year=year, month=month, **amounts)
+                for trainer_id, amounts in figures.items()
+            ])
+        invalidate_dashboard()
+        return len(figures)
+
+    def _verify_period(self, year, month) -> int:
+        expected = _compute_monthly_revenue(month, year)
+        stored = {
+            row.trainer_id: row
+            for row in TrainerRevenueLedger.objects.filter(year=year, month=month)
+        }
+
+        drift = 0
+        for trainer_id in sorted(set(expected) | set(stored)):
+            row = stored.get(trainer_id) or TrainerRevenueLedger()
+            amounts = expected.get(trainer_id, {})
+            for field in TrainerRevenueLedger.AMOUNT_FIELDS:
+                want = amounts.get(field, Decimal(0))
+                have = getattr(row, field)
+                if abs(want - have) > TOLERANCE:
+                    drift += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"  {year}-{month:02d} trainer {trainer_id}: "
+                        f"{field} ledger={have:.2f} expected={want:.2f}"
+                    ))
+                    break
+        return drift
@@ -0,0 +1,224 @@
+"""
+meal_generator.py — fills a NutritionPlan's days with meals built from
+FoodDatabase so each meal hits its share of the plan's macro targets.
+
+Meals are built in order through the day, each aiming at its share of what
+is left of the daily protein / carbs / fats targets (main meals a full
+share, snacks SNACK_SHARE of one), so a meal that cannot hit a macro is made
+up by the meals after it. Each meal has a template of categories, one food
+per category (Protein, Carbs, Fats by default). For a handful of random
+food combinations from those categories the gram amounts are fitted by
+non-negative least squares (numpy) on the combination's rows of the
+nutrient matrix, with errors weighted by calories per gram, so a gram of fat
+off counts as much as 2.25 grams of protein. The best combination wins;
+foods already used that day are penalized so meals vary. With at most a few
+foods per meal the fit enumerates the active sets exactly, and fits are
+memoized per (whole-gram target, combination), so a four-week plan takes a
+fraction of a second.
+
+The output is MealPlanCreateSerializer-shaped data, written through
+NutritionPlan.sync_meal_plans() like an edited plan.
+"""
+
+import random
+from itertools import combinations
+
+import numpy as np
+
+from .models import MealPlan
+from .nutrient_matrix import nutrient_matrix
+
+MACROS = ("protein", "carbs", "fats")
+KCAL_PER_GRAM = {"protein": 4, "carbs": 4, "fats": 9}
+_WEIGHTS = np.array([KCAL_PER_GRAM[m] for m in MACROS], dtype=np.float64)
+
+MAIN_MEALS = ("breakfast", "lunch", "dinner")
+SNACKS = ("snack_1", "snack_2", "snack_3")
+SNACK_SHARE = 0.5
+DEFAULT_TEMPLATE = ("Protein", "Carbs", "Fats")
+
+CANDIDATES_PER_MEAL = 12
+MAX_GRAMS = 400
+GRAM_STEP = 5
+DEFAULT_TOLERANCE = 0.10
+# Macros below this many grams are judged against it, so a 4 g fat target is
+# not failed over 1 g.
+MIN_TOLERANCE_GRAMS = 3
+REPEAT_PENALTY = 25  # kcal-weighted error added per food already used that day
+
+
+class MealPlanGenerator:
+    """
+    generator = MealPlanGenerator(plan, exclude_foods=[...], ...)
+    meals, report = generator.generate()
+
+    Options:
+      days             number of days (default: plan.duration_weeks * 7)
+      meal_types       MealPlan meal types per day (default: from calc_meals / calc_snacks)
+      categories       foods are drawn only from these categories
+      meal_categories  {meal_type: [category, ...]} template per meal type
+      exclude_foods    FoodDatabase ids or names never to use
+      exclude_categories  categories never to use
+      tolerance        allowed relative miss per macro (default 0.10)
+      seed             makes the food choice reproducible
+    Invalid options raise ValueError.
+    """
+
+    def __init__(self, plan, days=None, meal_types=None, categories=None, meal_categories=None,
+                 exclude_foods=(), exclude_categories=(), tolerance=DEFAULT_TOLERANCE, seed=None):
+        self.days = int(days or max(plan.duration_weeks, 1) * 7)
+        self.meal_types = list(meal_types or self._default_meal_types(plan))
+        unknown = set(self.meal_types) - set(MealPlan.MEAL_TYPE_ORDER)
+        if unknown:
+            raise ValueError(f"Unknown meal types: {', '.join(sorted(unknown))}")
+        if not self.meal_types or self.days < 1:
+            raise ValueError("Nothing to generate: no days or no meal types.")
+
+        self.targets = {"protein": plan.target_protein, "carbs": plan.target_carbs, "fats": plan.target_fats}
+        self.tolerance = float(tolerance)
+        self.rng = random.Random(seed)
+        self._fits = {}
+
+        self.matrix = nutrient_matrix()
+        # Per-gram (protein, carbs, fats) and calories, rows aligned with the matrix.
+        self.macros = np.stack([self.matrix.columns[m] for m in MACROS], axis=1) / 100
+        self.calories = self.matrix.columns["calories"] / 100
+        self.pools = self._load_pools(categories, exclude_foods, exclude_categories)
+        meal_categories = meal_categories or {}
+        self.templates = {}
+        for meal_type in self.meal_types:
+            template = tuple(meal_categories.get(meal_type) or DEFAULT_TEMPLATE)
+            missing = [category for category in template if not self.pools.get(category)]
+            if missing:
+                raise ValueError(f"No foods available in {', '.join(missing)} for {meal_type}.")
+            self.templates[meal_type] = template
+
+        self.shares = {t: SNACK_SHARE if t in SNACKS else 1.0 for t in self.meal_types}
+
+    @staticmethod
+    def _default_meal_types(plan):
+        main = MAIN_MEALS[:max(0, min(plan.calc_meals, len(MAIN_MEALS)))]
+        snacks = SNACKS[:max(0, min(plan.calc_snacks, len(SNACKS)))]
+        return sorted(main + snacks, key=MealPlan.MEAL_TYPE_ORDER.get)
+
+    def _load_pools(self, categories, exclude_foods, exclude_categories):
+        """{category: [matrix row, ...]} of the usable foods."""
+        matrix = self.matrix
+        allowed = set(categories or ()) or None
+        excluded = set(exclude_categories or ())
+        usable = self.macros.any(axis=1)
+        for food in exclude_foods:
+            row = matrix.row_for(food)
+            if row is not None:
+                usable[row] = False
+
+        pools = {}
+        for row in np.flatnonzero(usable).tolist():
+            category = matrix.categories[row]
+            if (allowed is None or category in allowed) and category not in excluded:
+                pools.setdefault(category, []).append(row)
+        return pools
+
+    # ── Generation ────────────────────────────────────────────────────────
+
+    def generate(self):
+        """
+        (meal_plans_data, report): the meals for every day, and
+        {"days", "meals", "within_tolerance", "day_totals": [...]}.
+        """
+        meals, day_totals, within = [], [], 0
+        for day in range(1, self.days + 1):
+            used, totals = set(), dict.fromkeys(("calories",) + MACROS, 0)
+            remaining_share = sum(self.shares.values())
+            for meal_type in self.meal_types:
+                # The day's remainder split over the meals left, so one meal's miss
+                # (e.g. a carb-free snack) is made up by the ones after it.
+                share = self.shares[meal_type] / remaining_share
+                target = tuple(round(max(self.targets[m] - totals[m], 0) * share) for m in MACROS)
+                remaining_share -= self.shares[meal_type]
+                foods, ok = self._build_meal(meal_type, target, used)
+                within += ok
+                for food in foods:
+                    for key in totals:
+                        totals[key] += food[key]
+                meals.append({"day": day, "meal_type": meal_type, "foods": foods})
+            day_totals.append({"day": day, **{k: round(v, 1) for k, v in totals.items()}})
+        report = {"days": self.days, "meals": len(meals), "within_tolerance": within, "day_totals": day_totals}
+        return meals, report
+
+    def _build_meal(self, meal_type, target, used):
+        """
+        ([FoodItem data, ...], within tolerance) for one meal aiming at
+        `target` grams of (protein, carbs, fats); adds its foods to `used`.
+        """
+        pools = [self.pools[category] for category in self.templates[meal_type]]
+        best = None
+        for _ in range(CANDIDATES_PER_MEAL):
+            combo = tuple(self.rng.choice(pool) for pool in pools)
+            if len(set(combo)) < len(combo):
+                continue
+            grams, error = self._fit(target, combo)
+            score = error + REPEAT_PENALTY * sum(row in used for row in combo)
+            if best is None or score < best[0]:
+                best = (score, combo, grams)
+        if best is None:  # Every draw repeated a food (tiny pools): take one as is.
+            combo = tuple(pool[0] for pool in pools)
+            best = (0, combo, self._fit(target, combo)[0])
+
+        _, combo, grams = best
+        rows = list(combo)
+        amounts = (np.rint(grams / GRAM_STEP) * GRAM_STEP).astype(int).tolist()
+        calories = (self.calories[rows] * amounts).tolist()
+        macros = (self.macros[rows] * np.array(amounts)[:, None]).tolist()
+        foods = []
+        for row, amount, kcal, values in zip(rows, amounts, calories, macros):
+            if amount <= 0:
+                continue
+            used.add(row)
+            foods.append({
+                "name": self.matrix.names[row], "amount": amount, "unit": "g", "order": len(foods) + 1,
+                "calories": round(kcal),
+                **{macro: round(value, 1) for macro, value in zip(MACROS, values)},
+            })
+        actual = [sum(food[macro] for food in foods) for macro in MACROS]
+        ok = all(
+            abs(got - want) <= max(want * self.tolerance, MIN_TOLERANCE_GRAMS)
+            for got, want in zip(actual, target)
+        )
+        return foods, ok
+
+    def _fit(self, target, combo):
+        """Memoized fit_grams() for one meal target and food combination."""
+        key = (target, combo)
+        fit = self._fits.get(key)
+        if fit is None:
+            fit = self._fits[key] = fit_grams(target, self.macros[list(combo)])
+        return fit
+
+
+def fit_grams(target, macros, max_grams=MAX_GRAMS):
+    """
+    Non-negative grams x minimizing the calorie-weighted squared miss of
+    x @ macros against `target` ((protein, carbs, fats); `macros` is one
+    per-gram row per food), each x capped at `max_grams`. Returns (grams
+    array, error in kcal). Solves the least squares problem for every
+    subset of foods and keeps the best non-negative solution, which is
+    exact for the few foods a meal has.
+    """
+    a = (np.asarray(macros, dtype=np.float64) * _WEIGHTS).T   # macros × foods
+    b = np.asarray(target, dtype=np.float64) * _WEIGHTS
+    n = a.shape[1]
+
+    best = (np.zeros(n), float(np.linalg.norm(b)))
+    for size in range(1, n + 1):
+        for subset in combinations(range(n), size):
+            columns = list(subset)
+            solution = np.linalg.lstsq(a[:, columns], b, rcond=None)[0]
+            if (solution < 0).any():
+                continue
+            x = np.zeros(n)
+            x[columns] = np.minimum(solution, max_grams)
+            error = float(np.linalg.norm(a @ x - b))
+            if error < best[1]:
+                best = (x, error)
+    return best
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:22
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_alter_clientsubscription_end_date_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainerRevenueLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('base_revenue', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14)),
+                ('session_deductions', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14)),
+                ('session_additions', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=14)),
+                ('group_adjustment', models.DecimalField(decimal_places=4, default=Decimal('0'), help_text='Net (signed) revenue moved by cross-trainer group sessions.', max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trainerrevenueledger',
+            name='trainer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_ledger', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='trainerrevenueledger',
+            index=models.Index(fields=['year', 'month'], name='idx_ledger_period'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='trainerrevenueledger',
+            unique_together={('trainer', 'year', 'month')},
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0004_trainerrevenueledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupsessionparticipant',
+            name='owner_trainer',
+            field=models.ForeignKey(blank=True, help_text='Trainer who owned the charged subscription at deduction time.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='owned_group_participations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='groupsessionparticipant',
+            name='session_value',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='plan.price / plan.units of the charged subscription at deduction time.', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='groupsessionparticipant',
+            name='subscription',
+            field=models.ForeignKey(blank=True, help_text='Subscription that was charged for this participation.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='group_participations', to='clients.clientsubscription'),
+        ),
+        migrations.AddIndex(
+            model_name='groupsessionparticipant',
+            index=models.Index(fields=['deducted', 'owner_trainer'], name='idx_participant_owner'),
+        ),
+    ]
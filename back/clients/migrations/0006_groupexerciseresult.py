@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0005_groupsessionparticipant_charge_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupExerciseResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exercise_order', models.PositiveSmallIntegerField(default=1)),
+                ('exercise_name', models.CharField(max_length=200)),
+                ('exercise_key', models.CharField(help_text='exercise_name stripped and lower-cased.', max_length=200)),
+                ('category', models.CharField(choices=[('weight', 'Weight / وزن'), ('reps', 'Reps / عدات'), ('time', 'Time / وقت')], default='weight', max_length=20)),
+                ('sets_count', models.IntegerField(default=0)),
+                ('val1', models.CharField(blank=True, max_length=100, null=True)),
+                ('val2', models.CharField(blank=True, max_length=100, null=True)),
+                ('val3', models.CharField(blank=True, max_length=100, null=True)),
+                ('note', models.CharField(blank=True, default='', max_length=255)),
+                ('day_name', models.CharField(max_length=20)),
+                ('date', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['session', 'exercise_order'],
+            },
+        ),
+        migrations.AddField(
+            model_name='groupexerciseresult',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_exercise_results', to='clients.client'),
+        ),
+        migrations.AddField(
+            model_name='groupexerciseresult',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_results', to='clients.groupsessionlog'),
+        ),
+        migrations.AddIndex(
+            model_name='groupexerciseresult',
+            index=models.Index(fields=['client', 'exercise_key', '-date'], name='idx_result_client_exercise'),
+        ),
+        migrations.AddIndex(
+            model_name='groupexerciseresult',
+            index=models.Index(fields=['client', 'session'], name='idx_result_client_session'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupexerciseresult',
+            constraint=models.UniqueConstraint(fields=('session', 'exercise_order', 'client'), name='unique_result_per_session_exercise_client'),
+        ),
+    ]
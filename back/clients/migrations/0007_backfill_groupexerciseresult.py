@@ -0,0 +1,113 @@
+"""
+Backfills GroupExerciseResult from the exercises_summary JSON of every
+existing GroupSessionLog.
+
+The parsing mirrors GroupExerciseResult.build_rows(); it is inlined here
+because data migrations must only use historical models.
+"""
+
+import json
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+LEGACY_TYPES = {
+    "strength": "weight",
+    "cardio": "time",
+    "time": "time",
+    "weight": "weight",
+    "reps": "reps",
+}
+
+
+def _value(result, key):
+    return str(result[key]) if key in result and result[key] is not None else None
+
+
+def _build_rows(GroupExerciseResult, session, clients):
+    summary = session.exercises_summary
+    if isinstance(summary, str):
+        try:
+            summary = json.loads(summary)
+        except Exception:
+            summary = []
+    if not isinstance(summary, list):
+        return []
+
+    rows = []
+    for order, ex in enumerate(summary, start=1):
+        if not isinstance(ex, dict):
+            continue
+        name = str(ex.get("name", "Unknown"))
+        results = ex.get("results", [])
+        results = [r for r in results if isinstance(r, dict)] if isinstance(results, list) else []
+        try:
+            sets_count = int(ex.get("sets_count") or 0)
+        except (TypeError, ValueError):
+            sets_count = 0
+        category = ex.get("category") or LEGACY_TYPES.get(str(ex.get("type") or "").lower(), "weight")
+
+        for client_id, client_name in clients.items():
+            user_res = next(
+                (
+                    r for r in results
+                    if r.get("client") == client_name or str(r.get("client_id")) == str(client_id)
+                ),
+                None,
+            )
+            if user_res is None:
+                continue
+            rows.append(GroupExerciseResult(
+                session_id=session.id,
+                client_id=client_id,
+                exercise_order=order,
+                exercise_name=name,
+                exercise_key=name.strip().lower(),
+                category=category,
+                sets_count=sets_count,
+                val1=_value(user_res, "val1"),
+                val2=_value(user_res, "val2"),
+                val3=_value(user_res, "val3"),
+                note=str(user_res.get("note", "") or ""),
+                day_name=session.day_name,
+                date=session.date,
+            ))
+    return rows
+
+
+def backfill(apps, schema_editor):
+    GroupSessionLog = apps.get_model("clients", "GroupSessionLog")
+    GroupSessionParticipant = apps.get_model("clients", "GroupSessionParticipant")
+    GroupExerciseResult = apps.get_model("clients", "GroupExerciseResult")
+
+    clients_by_session: dict = {}
+    for session_id, client_id, client_name in (
+        GroupSessionParticipant.objects.filter(client__isnull=False)
+        .values_list("session_id", "client_id", "client__name")
+    ):
+        clients_by_session.setdefault(session_id, {})[client_id] = client_name
+
+    pending = []
+    for session in GroupSessionLog.objects.filter(id__in=clients_by_session.keys()).iterator():
+        pending.extend(_build_rows(GroupExerciseResult, session, clients_by_session[session.id]))
+        if len(pending) >= BATCH_SIZE:
+            GroupExerciseResult.objects.bulk_create(pending)
+            pending = []
+    if pending:
+        GroupExerciseResult.objects.bulk_create(pending)
+
+
+def unfill(apps, schema_editor):
+    apps.get_model("clients", "GroupExerciseResult").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0006_groupexerciseresult'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, unfill),
+    ]
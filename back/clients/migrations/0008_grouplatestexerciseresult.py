@@ -0,0 +1,61 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    """Points every (client, day_name, exercise_key) at its newest result."""
+    GroupExerciseResult = apps.get_model("clients", "GroupExerciseResult")
+    GroupLatestExerciseResult = apps.get_model("clients", "GroupLatestExerciseResult")
+
+    newest = {}
+    rows = (
+        GroupExerciseResult.objects.order_by("-date", "-session_id", "exercise_order")
+        .values_list("id", "client_id", "day_name", "exercise_key")
+    )
+    for result_id, client_id, day_name, exercise_key in rows.iterator():
+        newest.setdefault((client_id, day_name, exercise_key), result_id)
+
+    GroupLatestExerciseResult.objects.bulk_create(
+        [
+            GroupLatestExerciseResult(
+                client_id=client_id, day_name=day_name, exercise_key=exercise_key, result_id=result_id,
+            )
+            for (client_id, day_name, exercise_key), result_id in newest.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0007_backfill_groupexerciseresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupLatestExerciseResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day_name', models.CharField(max_length=20)),
+                ('exercise_key', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='grouplatestexerciseresult',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latest_group_results', to='clients.client'),
+        ),
+        migrations.AddField(
+            model_name='grouplatestexerciseresult',
+            name='result',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clients.groupexerciseresult'),
+        ),
+        migrations.AddConstraint(
+            model_name='grouplatestexerciseresult',
+            constraint=models.UniqueConstraint(fields=('client', 'day_name', 'exercise_key'), name='unique_latest_result_key'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
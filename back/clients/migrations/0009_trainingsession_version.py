@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0008_grouplatestexerciseresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingsession',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Incremented on every save; clients send it back (If-Match) to detect lost updates.'),
+        ),
+    ]
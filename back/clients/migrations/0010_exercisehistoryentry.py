@@ -0,0 +1,124 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:41
+
+import re
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+CHUNK_SIZE = 200
+
+# Exclusive bounds of the columns written below; larger values are typos
+# ("6000000") and are stored as NULL rather than overflowing the column.
+MAX_TOTAL_REPS = 2 ** 31                 # PositiveIntegerField
+MAX_TOP_WEIGHT = Decimal(10) ** 6        # DecimalField(max_digits=8, decimal_places=2)
+MAX_VOLUME = Decimal(10) ** 10           # DecimalField(max_digits=12, decimal_places=2)
+
+
+def _first_number(text):
+    match = NUMBER_RE.search(text or "")
+    return Decimal(match.group().replace(",", ".")) if match else None
+
+
+def _bounded(value, limit):
+    return value if value is not None and value < limit else None
+
+
+def _rows(session):
+    rows = []
+    for exercise in session.exercises.all():
+        sets = list(exercise.sets.all())
+        reps = [_first_number(s.reps) for s in sets]
+        weights = [_first_number(s.weight) for s in sets]
+        numeric_reps = [r for r in reps if r is not None]
+        numeric_weights = [w for w in weights if w is not None]
+        pairs = [(r, w) for r, w in zip(reps, weights) if r is not None and w is not None]
+        rows.append({
+            "session_id": session.id,
+            "client_id": session.subscription.client_id,
+            "subscription_id": session.subscription_id,
+            "date": session.date_completed,
+            "exercise_order": exercise.order,
+            "exercise_name": exercise.name,
+            "exercise_key": exercise.name.strip().lower(),
+            "sets_count": len(sets),
+            "total_reps": _bounded(int(sum(numeric_reps)), MAX_TOTAL_REPS) if numeric_reps else None,
+            "top_weight": _bounded(max(numeric_weights), MAX_TOP_WEIGHT) if numeric_weights else None,
+            "volume": _bounded(sum(r * w for r, w in pairs), MAX_VOLUME) if pairs else None,
+            "sets": [{"reps": s.reps, "weight": s.weight} for s in sets],
+        })
+    return rows
+
+
+def backfill(apps, schema_editor):
+    """
+    Indexes every already-completed session (inlined: models may change
+    later), CHUNK_SIZE sessions at a time so memory stays flat.
+    """
+    TrainingSession = apps.get_model("clients", "TrainingSession")
+    ExerciseHistoryEntry = apps.get_model("clients", "ExerciseHistoryEntry")
+
+    completed = TrainingSession.objects.filter(is_completed=True, date_completed__isnull=False)
+    last_pk = 0
+    while True:
+        sessions = list(
+            completed.filter(pk__gt=last_pk).order_by("pk")
+            .select_related("subscription")
+            .prefetch_related("exercises__sets")[:CHUNK_SIZE]
+        )
+        if not sessions:
+            break
+        ExerciseHistoryEntry.objects.bulk_create(
+            [ExerciseHistoryEntry(**row) for session in sessions for row in _rows(session)],
+            batch_size=500,
+        )
+        last_pk = sessions[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0009_trainingsession_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseHistoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('exercise_order', models.IntegerField(default=1)),
+                ('exercise_name', models.CharField(max_length=200)),
+                ('exercise_key', models.CharField(help_text='exercise_name stripped and lower-cased.', max_length=200)),
+                ('sets_count', models.PositiveSmallIntegerField(default=0)),
+                ('total_reps', models.PositiveIntegerField(blank=True, null=True)),
+                ('top_weight', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('volume', models.DecimalField(blank=True, decimal_places=2, help_text='Sum of reps × weight over the sets where both are numeric.', max_digits=12, null=True)),
+                ('sets', models.JSONField(default=list, help_text='[{"reps": "10", "weight": "60"}, ...] as entered.')),
+            ],
+            options={
+                'ordering': ['date', 'session', 'exercise_order'],
+            },
+        ),
+        migrations.AddField(
+            model_name='exercisehistoryentry',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_history', to='clients.client'),
+        ),
+        migrations.AddField(
+            model_name='exercisehistoryentry',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history_entries', to='clients.trainingsession'),
+        ),
+        migrations.AddField(
+            model_name='exercisehistoryentry',
+            name='subscription',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clients.clientsubscription'),
+        ),
+        migrations.AddIndex(
+            model_name='exercisehistoryentry',
+            index=models.Index(fields=['client', 'exercise_key', 'date'], name='idx_history_client_exercise'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
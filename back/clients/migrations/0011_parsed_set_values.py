@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0010_exercisehistoryentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionset',
+            name='reps_value',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sessionset',
+            name='weight_unit',
+            field=models.CharField(blank=True, choices=[('kg', 'kg'), ('lb', 'lb')], default='', editable=False, max_length=2),
+        ),
+        migrations.AddField(
+            model_name='sessionset',
+            name='weight_value',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingset',
+            name='reps_value',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingset',
+            name='weight_unit',
+            field=models.CharField(blank=True, choices=[('kg', 'kg'), ('lb', 'lb')], default='', editable=False, max_length=2),
+        ),
+        migrations.AddField(
+            model_name='trainingset',
+            name='weight_value',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, editable=False, max_digits=7, null=True),
+        ),
+        migrations.AlterField(
+            model_name='exercisehistoryentry',
+            name='top_weight',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='kg', max_digits=8, null=True),
+        ),
+        migrations.AlterField(
+            model_name='exercisehistoryentry',
+            name='volume',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Sum of reps × weight (kg) over the sets where both are numeric.', max_digits=12, null=True),
+        ),
+    ]
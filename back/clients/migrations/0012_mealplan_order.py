@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+MEAL_TYPE_ORDER = {
+    'breakfast': 1,
+    'snack_1': 2,
+    'lunch': 3,
+    'snack_2': 4,
+    'dinner': 5,
+    'snack_3': 6,
+}
+
+
+def backfill_order(apps, schema_editor):
+    """Sets order from meal_type, as MealPlan.save() does (99 for unknown types)."""
+    MealPlan = apps.get_model("clients", "MealPlan")
+    MealPlan.objects.update(order=99)
+    for meal_type, order in MEAL_TYPE_ORDER.items():
+        MealPlan.objects.filter(meal_type=meal_type).update(order=order)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0011_parsed_set_values'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='mealplan',
+            options={'ordering': ['day', 'order']},
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='order',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, help_text='Chronological order within a day (auto-set from meal_type).'),
+        ),
+        migrations.RunPython(backfill_order, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0012_mealplan_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodCatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('food_id', models.IntegerField(db_index=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:02
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def backfill_sequence(apps, schema_editor):
+    """Existing changes keep their id as sequence; the counter starts at the newest."""
+    FoodCatalogChange = apps.get_model("clients", "FoodCatalogChange")
+    FoodCatalogSequence = apps.get_model("clients", "FoodCatalogSequence")
+    FoodCatalogChange.objects.update(sequence=F("id"))
+    latest = FoodCatalogChange.objects.aggregate(latest=Max("id"))["latest"] or 0
+    FoodCatalogSequence.objects.update_or_create(pk=1, defaults={"value": latest})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0014_tokenrevocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodCatalogSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='foodcatalogchange',
+            name='sequence',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(backfill_sequence, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='foodcatalogchange',
+            name='sequence',
+            field=models.PositiveBigIntegerField(unique=True),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:40
+
+from django.db import migrations
+from django.db.models import FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+TOTAL_FIELDS = {
+    'total_calories': 'calories',
+    'total_protein': 'protein',
+    'total_carbs': 'carbs',
+    'total_fats': 'fats',
+}
+CHUNK_SIZE = 2000
+
+
+def recompute_totals(apps, schema_editor):
+    """
+    Meals written before the totals were derived from their foods may hold
+    client-sent totals; recomputes every meal as MealPlan.recompute_totals()
+    does, one UPDATE per CHUNK_SIZE primary keys.
+    """
+    MealPlan = apps.get_model("clients", "MealPlan")
+    FoodItem = apps.get_model("clients", "FoodItem")
+    foods = FoodItem.objects.filter(meal_plan=OuterRef('pk')).order_by().values('meal_plan')
+
+    def food_sum(field, output_field):
+        return Coalesce(
+            Subquery(foods.annotate(total=Sum(field)).values('total')),
+            Value(0), output_field=output_field,
+        )
+
+    totals = {
+        total: food_sum(field, IntegerField() if field == 'calories' else FloatField())
+        for total, field in TOTAL_FIELDS.items()
+    }
+    last_pk = 0
+    while True:
+        pks = list(
+            MealPlan.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE]
+        )
+        if not pks:
+            break
+        MealPlan.objects.filter(pk__in=pks).update(**totals)
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0015_foodcatalogsequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_totals, migrations.RunPython.noop),
+    ]
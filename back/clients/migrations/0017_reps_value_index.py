@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0016_recompute_meal_totals'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sessionset',
+            name='reps_value',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='trainingset',
+            name='reps_value',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:10
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.utils import timezone
+
+CHUNK_SIZE = 1000
+
+
+def _session_value(plan):
+    if not plan or not plan.units or plan.units <= 0 or plan.price is None:
+        return None
+    return Decimal(str(plan.price)) / Decimal(plan.units)
+
+
+def _resolve(session_date, subs):
+    """Subscription whose window covers the session (subs newest first), else the latest active one."""
+    for sub in subs:
+        if sub.start_date <= session_date and (sub.end_date is None or session_date <= sub.end_date):
+            return sub
+    return next((sub for sub in subs if sub.is_active), None)
+
+
+def backfill_snapshot(apps, schema_editor):
+    """
+    Fills the charge snapshot (subscription, owner_trainer, session_value)
+    of deducted participants written before it existed, with the rule of
+    `backfill_group_participants` (inlined: models may change later), so
+    the group adjustments count them without a manual step. Runs CHUNK_SIZE
+    participants at a time.
+    """
+    GroupSessionParticipant = apps.get_model("clients", "GroupSessionParticipant")
+    ClientSubscription = apps.get_model("clients", "ClientSubscription")
+
+    pending = GroupSessionParticipant.objects.filter(
+        deducted=True, client__isnull=False, subscription__isnull=True,
+    ).select_related("session").order_by("pk")
+    last_pk = 0
+    while True:
+        participants = list(pending.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not participants:
+            break
+        last_pk = participants[-1].pk
+
+        subs_by_client = {}
+        for sub in (
+            ClientSubscription.objects.filter(client_id__in={p.client_id for p in participants})
+            .select_related("plan")
+            .order_by("-start_date", "-pk")
+        ):
+            subs_by_client.setdefault(sub.client_id, []).append(sub)
+
+        filled = []
+        for participant in participants:
+            session_date = timezone.localtime(participant.session.date).date()
+            sub = _resolve(session_date, subs_by_client.get(participant.client_id, []))
+            if sub is None:
+                continue
+            participant.subscription_id = sub.pk
+            participant.owner_trainer_id = sub.trainer_id
+            participant.session_value = _session_value(sub.plan)
+            filled.append(participant)
+        GroupSessionParticipant.objects.bulk_update(filled, ["subscription", "owner_trainer", "session_value"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0017_reps_value_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop),
+    ]
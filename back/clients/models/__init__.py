@@ -6,6 +6,12 @@ can continue to use `from clients.models import SomeModel` without change.
 from .client import Client, Country
 from .subscription import Subscription, ClientSubscription
 from .training import (
+    WEIGHT_UNIT_KG,
+    WEIGHT_UNIT_LB,
+    WEIGHT_UNIT_CHOICES,
+    LB_TO_KG,
+    parse_reps,
+    parse_weight,
     TrainingPlan,
     TrainingDaySplit,
     SessionLog,
@@ -14,9 +20,12 @@ from .training import (
     TrainingSession,
     SessionExercise,
     SessionSet,
+    ExerciseHistoryEntry,
 )
 from .nutrition import (
     FoodDatabase,
+    FoodCatalogSequence,
+    FoodCatalogChange,
     NutritionPlan,
     MealPlan,
     FoodItem,
@@ -27,13 +36,18 @@ from .group import (
     EXERCISE_CATEGORY_REPS,
     EXERCISE_CATEGORY_TIME,
     EXERCISE_CATEGORY_CHOICES,
+    legacy_type_to_category,
     CoachSchedule,
     GroupSessionLog,
     GroupSessionParticipant,
+    GroupExerciseResult,
+    GroupLatestExerciseResult,
     GroupWorkoutTemplate,
 )
 from .schedule import TrainerShift, TrainerSchedule
 from .manual import SessionTransferRequest, ManualNutritionSave, ManualWorkoutSave
+from .revenue import TrainerRevenueLedger
+from .auth import TokenRevocation
 
 __all__ = [
     # client
@@ -41,17 +55,23 @@ __all__ = [
     # subscription
     'Subscription', 'ClientSubscription',
     # training
+    'WEIGHT_UNIT_KG', 'WEIGHT_UNIT_LB', 'WEIGHT_UNIT_CHOICES', 'LB_TO_KG', 'parse_reps', 'parse_weight',
     'TrainingPlan', 'TrainingDaySplit', 'SessionLog',
     'TrainingExercise', 'TrainingSet',
-    'TrainingSession', 'SessionExercise', 'SessionSet',
+    'TrainingSession', 'SessionExercise', 'SessionSet', 'ExerciseHistoryEntry',
     # nutrition
-    'FoodDatabase', 'NutritionPlan', 'MealPlan', 'FoodItem', 'NutritionProgress',
+    'FoodDatabase', 'FoodCatalogSequence', 'FoodCatalogChange', 'NutritionPlan', 'MealPlan', 'FoodItem', 'NutritionProgress',
     # group
     'EXERCISE_CATEGORY_WEIGHT', 'EXERCISE_CATEGORY_REPS', 'EXERCISE_CATEGORY_TIME',
-    'EXERCISE_CATEGORY_CHOICES',
-    'CoachSchedule', 'GroupSessionLog', 'GroupSessionParticipant', 'GroupWorkoutTemplate',
+    'EXERCISE_CATEGORY_CHOICES', 'legacy_type_to_category',
+    'CoachSchedule', 'GroupSessionLog', 'GroupSessionParticipant',
+    'GroupExerciseResult', 'GroupLatestExerciseResult', 'GroupWorkoutTemplate',
     # schedule
     'TrainerShift', 'TrainerSchedule',
     # manual / transfers
     'SessionTransferRequest', 'ManualNutritionSave', 'ManualWorkoutSave',
+    # revenue
+    'TrainerRevenueLedger',
+    # auth
+    'TokenRevocation',
 ]
@@ -0,0 +1,27 @@
+from django.db import models
+from django.utils import timezone
+
+
+# ---------------------------------------------------------------------------
+# JWT DENYLIST
+# ---------------------------------------------------------------------------
+
+class TokenRevocation(models.Model):
+    """
+    Persistent JWT denylist checked by clients.authentication on every
+    authenticated request, so a revocation reaches every worker process and
+    survives restarts.
+
+    A row with `jti` rejects that one token; a row with `user_id` rejects
+    every token issued to that user at or before `revoked_at`. `user_id` is a
+    plain integer rather than a foreign key so the row outlives a deleted
+    user. Rows are dead once `expires_at` (revocation time plus the longest
+    token lifetime) has passed and are purged by later revocations.
+    """
+    jti = models.CharField(max_length=255, blank=True, default='', db_index=True)
+    user_id = models.IntegerField(blank=True, null=True, db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"jti {self.jti}" if self.jti else f"user {self.user_id} before {self.revoked_at}"
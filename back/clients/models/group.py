@@ -1,9 +1,13 @@
+import json
+
 from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from ..cache import invalidate_dashboard
 from .client import Client
 from .subscription import ClientSubscription
+from .revenue import TrainerRevenueLedger
 
 
 # ---------------------------------------------------------------------------
@@ -21,6 +25,18 @@ EXERCISE_CATEGORY_CHOICES = [
 ]
 
 
+def legacy_type_to_category(type_str: str) -> str:
+    """Maps the pre-category `type` key of old exercises_summary entries."""
+    mapping = {
+        "strength": EXERCISE_CATEGORY_WEIGHT,
+        "cardio": EXERCISE_CATEGORY_TIME,
+        "time": EXERCISE_CATEGORY_TIME,
+        "weight": EXERCISE_CATEGORY_WEIGHT,
+        "reps": EXERCISE_CATEGORY_REPS,
+    }
+    return mapping.get((type_str or "").lower(), EXERCISE_CATEGORY_WEIGHT)
+
+
 # ---------------------------------------------------------------------------
 # COACH SCHEDULE (children group scheduling)
 # ---------------------------------------------------------------------------
@@ -61,6 +77,27 @@ class GroupSessionParticipant(models.Model):
     note = models.CharField(max_length=255, blank=True)
     deducted = models.BooleanField(default=False, db_index=True)
 
+    # Snapshot of what was charged, written when the participant is deducted.
+    subscription = models.ForeignKey(
+        ClientSubscription, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='group_participations',
+        help_text="Subscription that was charged for this participation.",
+    )
+    owner_trainer = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='owned_group_participations',
+        help_text="Trainer who owned the charged subscription at deduction time.",
+    )
+    session_value = models.DecimalField(
+        max_digits=12, decimal_places=4, null=True, blank=True,
+        help_text="plan.price / plan.units of the charged subscription at deduction time.",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deducted', 'owner_trainer'], name='idx_participant_owner'),
+        ]
+
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         previously_deducted = False
@@ -82,11 +119,14 @@ class GroupSessionParticipant(models.Model):
             return
 
         with transaction.atomic():
+            # With several active subscriptions the latest-started one is
+            # charged, the one the revenue reports have always attributed to.
             active_sub = (
                 ClientSubscription.objects
                 .select_for_update()
                 .filter(client_id=self.client_id, is_active=True)
                 .select_related('plan')
+                .order_by('-start_date', '-pk')
                 .first()
             )
             if active_sub is None:
@@ -101,10 +141,325 @@ class GroupSessionParticipant(models.Model):
                 active_sub.is_active = False
                 active_sub.save(update_fields=['is_active'])
 
+            self.subscription = active_sub
+            self.owner_trainer_id = active_sub.trainer_id
+            self.session_value = TrainerRevenueLedger.session_value(active_sub.plan)
+            GroupSessionParticipant.objects.filter(pk=self.pk).update(
+                subscription=active_sub,
+                owner_trainer_id=self.owner_trainer_id,
+                session_value=self.session_value,
+            )
+
+            TrainerRevenueLedger.record_group_participation(self.session, active_sub)
+
+    @classmethod
+    def bulk_deduct(cls, session, entries):
+        """
+        Set-based equivalent of creating one deducted participant per entry
+        through save(). `entries` is a list of (client_id, note) pairs.
+
+        All affected active subscriptions are locked in one query, participants
+        are bulk-inserted with their charge snapshot, and sessions_used
+        increments plus auto-deactivation are applied with UPDATE statements,
+        so the query count does not grow with the size of the class. Semantics
+        match save(): a client without an active subscription still gets a
+        participant row but is not charged, and a subscription stops being
+        charged once it reaches its plan's units.
+        """
+        if not entries:
+            return []
+
+        entries = [(int(client_id), note) for client_id, note in entries]
+
+        with transaction.atomic():
+            client_ids = {client_id for client_id, _ in entries}
+            active_subs: dict = {}
+            for sub in (
+                ClientSubscription.objects
+                .select_for_update()
+                .filter(client_id__in=client_ids, is_active=True)
+                .select_related('plan')
+                .order_by('-start_date', '-pk')
+            ):
+                active_subs.setdefault(sub.client_id, sub)  # Latest-started, as in save().
+
+            participants = []
+            charged_subs = []
+            increments: dict = {}
+            for client_id, note in entries:
+                sub = active_subs.get(client_id)
+                participant = cls(session=session, client_id=client_id, note=note, deducted=True)
+                if sub is not None and cls._can_charge(sub, increments.get(sub.pk, 0)):
+                    increments[sub.pk] = increments.get(sub.pk, 0) + 1
+                    participant.subscription = sub
+                    participant.owner_trainer_id = sub.trainer_id
+                    participant.session_value = TrainerRevenueLedger.session_value(sub.plan)
+                    charged_subs.append(sub)
+                participants.append(participant)
+
+            cls.objects.bulk_create(participants)
+
+            # Usually every child is charged once, so this is a single UPDATE.
+            by_increment: dict = {}
+            for sub_pk, n in increments.items():
+                by_increment.setdefault(n, []).append(sub_pk)
+            for n, sub_pks in by_increment.items():
+                ClientSubscription.objects.filter(pk__in=sub_pks).update(
+                    sessions_used=models.F('sessions_used') + n
+                )
+
+            if increments:
+                ClientSubscription.objects.filter(
+                    pk__in=increments.keys(),
+                    plan__isnull=False,
+                    sessions_used__gte=models.F('plan__units'),
+                ).update(is_active=False)
+
+            TrainerRevenueLedger.record_group_participations(session, charged_subs)
+            # bulk_create()/update() send no model signals.
+            invalidate_dashboard()
+
+        return participants
+
+    @staticmethod
+    def _can_charge(sub, already_charged):
+        """
+        Whether `sub` is still active after `already_charged` deductions in the
+        current batch — save() deactivates it once sessions_used reaches units.
+        """
+        if already_charged == 0:
+            return True
+        if sub.plan is None:
+            return True
+        return sub.sessions_used + already_charged < sub.plan.units
+
     def __str__(self):
         return f"{self.client.name if self.client else 'Unknown'} in {self.session}"
 
 
+# ---------------------------------------------------------------------------
+# GROUP EXERCISE RESULTS (normalised from GroupSessionLog.exercises_summary)
+# ---------------------------------------------------------------------------
+
+class GroupExerciseResult(models.Model):
+    """
+    One row per (group session, exercise, participating client), written when
+    a session is completed so per-child history is an indexed lookup instead
+    of a scan over exercises_summary JSON.
+
+    val1..val3 are None when the client's result did not carry that key, so
+    callers can keep their historical defaults ("-" vs "").
+    """
+    session = models.ForeignKey(GroupSessionLog, on_delete=models.CASCADE, related_name='exercise_results')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='group_exercise_results')
+    exercise_order = models.PositiveSmallIntegerField(default=1)
+    exercise_name = models.CharField(max_length=200)
+    exercise_key = models.CharField(max_length=200, help_text="exercise_name stripped and lower-cased.")
+    category = models.CharField(
+        max_length=20, choices=EXERCISE_CATEGORY_CHOICES, default=EXERCISE_CATEGORY_WEIGHT
+    )
+    sets_count = models.IntegerField(default=0)
+    val1 = models.CharField(max_length=100, blank=True, null=True)
+    val2 = models.CharField(max_length=100, blank=True, null=True)
+    val3 = models.CharField(max_length=100, blank=True, null=True)
+    note = models.CharField(max_length=255, blank=True, default="")
+
+    # Copied from the session so history lookups never join back to it.
+    day_name = models.CharField(max_length=20)
+    date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['session', 'exercise_order']
+        indexes = [
+            models.Index(fields=['client', 'exercise_key', '-date'], name='idx_result_client_exercise'),
+            models.Index(fields=['client', 'session'], name='idx_result_client_session'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session', 'exercise_order', 'client'],
+                name='unique_result_per_session_exercise_client',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.exercise_name} — {self.client} ({self.session})"
+
+    @staticmethod
+    def parse_summary(exercises_summary):
+        """exercises_summary as a list, tolerating legacy JSON-encoded strings."""
+        if isinstance(exercises_summary, str):
+            try:
+                exercises_summary = json.loads(exercises_summary)
+            except Exception:
+                return []
+        return exercises_summary if isinstance(exercises_summary, list) else []
+
+    @classmethod
+    def build_rows(cls, session, clients):
+        """
+        Unsaved rows for `session`. `clients` maps client_id -> client name for
+        the session's participants; each participant is matched to the first
+        result whose client_id or client name matches, as the history views did.
+        """
+        rows = []
+        for order, ex in enumerate(cls.parse_summary(session.exercises_summary), start=1):
+            if not isinstance(ex, dict):
+                continue
+            name = str(ex.get("name", "Unknown"))
+            results = ex.get("results", [])
+            results = [r for r in results if isinstance(r, dict)] if isinstance(results, list) else []
+            try:
+                sets_count = int(ex.get("sets_count") or 0)
+            except (TypeError, ValueError):
+                sets_count = 0
+
+            for client_id, client_name in clients.items():
+                user_res = next(
+                    (
+                        r for r in results
+                        if r.get("client") == client_name
+                        or str(r.get("client_id")) == str(client_id)
+                    ),
+                    None,
+                )
+                if user_res is None:
+                    continue
+                rows.append(cls(
+                    session=session,
+                    client_id=client_id,
+                    exercise_order=order,
+                    exercise_name=name,
+                    exercise_key=name.strip().lower(),
+                    category=ex.get("category") or legacy_type_to_category(ex.get("type", "")),
+                    sets_count=sets_count,
+                    val1=cls._value(user_res, "val1"),
+                    val2=cls._value(user_res, "val2"),
+                    val3=cls._value(user_res, "val3"),
+                    note=str(user_res.get("note", "") or ""),
+                    day_name=session.day_name,
+                    date=session.date,
+                ))
+        return rows
+
+    @staticmethod
+    def _value(result, key):
+        return str(result[key]) if key in result and result[key] is not None else None
+
+    @classmethod
+    def rebuild_for_session(cls, session, fresh=False):
+        """
+        Replaces the session's rows from its exercises_summary and participants.
+        Pass fresh=True for a session created in the same transaction, which
+        has no rows to delete yet.
+        """
+        clients = dict(
+            GroupSessionParticipant.objects.filter(session=session, client__isnull=False)
+            .values_list('client_id', 'client__name')
+        )
+        rows = cls.build_rows(session, clients)
+        if fresh:
+            rows = cls.objects.bulk_create(rows)
+            GroupLatestExerciseResult.record(rows)
+            return rows
+        with transaction.atomic():
+            existing = cls.objects.filter(session=session)
+            day_names = set(existing.values_list('day_name', flat=True)) | {session.day_name}
+            client_ids = set(existing.values_list('client_id', flat=True)) | set(clients)
+            existing.delete()
+            rows = cls.objects.bulk_create(rows)
+            GroupLatestExerciseResult.rebuild(client_ids, day_names)
+        return rows
+
+    def rank(self):
+        """Sort key matching the history views' newest-first order."""
+        return (self.date, self.session_id, -self.exercise_order)
+
+
+class GroupLatestExerciseResult(models.Model):
+    """
+    Points at the newest GroupExerciseResult for each (client, day_name,
+    exercise_key), so prefilling the next session's form is one keyed read
+    whatever the size of the history.
+
+    complete_session advances the pointers with record(); edits and deletes
+    of past sessions recompute the affected clients with rebuild().
+    """
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='latest_group_results')
+    day_name = models.CharField(max_length=20)
+    exercise_key = models.CharField(max_length=200)
+    result = models.ForeignKey(GroupExerciseResult, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['client', 'day_name', 'exercise_key'],
+                name='unique_latest_result_key',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.exercise_key} — {self.client} ({self.day_name})"
+
+    @staticmethod
+    def _key(row):
+        return (row.client_id, row.day_name, row.exercise_key)
+
+    @classmethod
+    def record(cls, results):
+        """
+        Advances the pointers to `results` (saved GroupExerciseResult rows)
+        wherever they are newer than what is stored. Two queries at most.
+        """
+        newest: dict = {}
+        for row in results:
+            key = cls._key(row)
+            if key not in newest or row.rank() > newest[key].rank():
+                newest[key] = row
+        if not newest:
+            return
+
+        for latest in cls.objects.filter(
+            client_id__in={k[0] for k in newest},
+            day_name__in={k[1] for k in newest},
+            exercise_key__in={k[2] for k in newest},
+        ).select_related('result'):
+            key = cls._key(latest)
+            if key in newest and latest.result.rank() >= newest[key].rank():
+                del newest[key]
+
+        cls.objects.bulk_create(
+            [
+                cls(client_id=client_id, day_name=day_name, exercise_key=exercise_key, result=row)
+                for (client_id, day_name, exercise_key), row in newest.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['client', 'day_name', 'exercise_key'],
+            update_fields=['result'],
+        )
+
+    @classmethod
+    def rebuild(cls, client_ids, day_names=None):
+        """Recomputes every pointer of `client_ids` (optionally only for `day_names`)."""
+        results = GroupExerciseResult.objects.filter(client_id__in=client_ids)
+        pointers = cls.objects.filter(client_id__in=client_ids)
+        if day_names is not None:
+            results = results.filter(day_name__in=day_names)
+            pointers = pointers.filter(day_name__in=day_names)
+
+        newest: dict = {}
+        for row in results.order_by('-date', '-session_id', 'exercise_order').only(
+            'id', 'client_id', 'day_name', 'exercise_key'
+        ):
+            newest.setdefault(cls._key(row), row.id)
+
+        with transaction.atomic():
+            pointers.delete()
+            cls.objects.bulk_create([
+                cls(client_id=client_id, day_name=day_name, exercise_key=exercise_key, result_id=result_id)
+                for (client_id, day_name, exercise_key), result_id in newest.items()
+            ])
+
+
 # ---------------------------------------------------------------------------
 # GROUP WORKOUT TEMPLATE
 # ---------------------------------------------------------------------------
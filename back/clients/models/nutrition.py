@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 from .subscription import ClientSubscription
+from .training import _assign_changed
 
 
 # ---------------------------------------------------------------------------
@@ -35,6 +38,46 @@ class FoodDatabase(models.Model):
         verbose_name_plural = "Food Database"
 
 
+class FoodCatalogSequence(models.Model):
+    """
+    Single-row counter holding the current catalog sequence number. Each
+    logged change increments it in its own transaction, so the row stays
+    locked until commit and sequence numbers become visible in commit
+    order, unlike auto-increment ids, which are handed out before commit.
+    """
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"catalog sequence {self.value}"
+
+
+class FoodCatalogChange(models.Model):
+    """
+    Append-only log of FoodDatabase writes (see signals.py); `sequence`
+    versions snapshots and drives deltas in food_catalog.py. Writes that
+    bypass signals (queryset.update()) are not logged.
+    """
+    food_id = models.IntegerField(db_index=True)
+    deleted = models.BooleanField(default=False)
+    sequence = models.PositiveBigIntegerField(unique=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.sequence} food {self.food_id}{' deleted' if self.deleted else ''}"
+
+    @classmethod
+    def log(cls, food_id, deleted=False):
+        """
+        Records a change under the next sequence number. Once a reader sees
+        sequence N, every change numbered up to N has been committed.
+        """
+        with transaction.atomic():
+            FoodCatalogSequence.objects.get_or_create(pk=1)
+            FoodCatalogSequence.objects.filter(pk=1).update(value=F('value') + 1)
+            sequence = FoodCatalogSequence.objects.values_list('value', flat=True).get(pk=1)
+            return cls.objects.create(food_id=food_id, deleted=deleted, sequence=sequence)
+
+
 # ---------------------------------------------------------------------------
 # NUTRITION PLAN & MEALS
 # ---------------------------------------------------------------------------
@@ -85,6 +128,94 @@ class NutritionPlan(models.Model):
     class Meta:
         ordering = ['-created_at']
 
+    def day_totals(self):
+        """
+        [{"day", "meals", "calories", "protein", "carbs", "fats"}, ...] per day
+        of the plan, summed in the database from the maintained meal totals.
+        """
+        return list(
+            self.meal_plans.order_by('day').values('day').annotate(
+                meals=models.Count('id'),
+                calories=Sum('total_calories'),
+                protein=Sum('total_protein'),
+                carbs=Sum('total_carbs'),
+                fats=Sum('total_fats'),
+            )
+        )
+
+    def sync_meal_plans(self, meal_plans_data):
+        """
+        Makes this plan's meals and foods match `meal_plans_data` (validated
+        MealPlanCreateSerializer data) with set-based writes: one delete for
+        removed meals, one for removed foods, and one bulk_create /
+        bulk_update each for new and changed meals and foods, then one
+        recompute_totals() for the meals whose foods changed. Rows whose
+        values are unchanged are not written at all.
+
+        Meals and foods are matched by "id" among this plan's rows; anything
+        else is created. A meal's foods list replaces its foods (a meal
+        given without "foods" ends up with none).
+        """
+        existing_meals = {m.id: m for m in self.meal_plans.prefetch_related('foods')}
+        incoming_meal_ids = {item['id'] for item in meal_plans_data if item.get('id') in existing_meals}
+        now = timezone.now()
+
+        meal_create, meal_update, food_create, food_update = [], [], [], []
+        recompute = set()
+        meal_delete = [pk for pk in existing_meals if pk not in incoming_meal_ids]
+        food_delete, meal_foods = [], []
+
+        for meal_data in meal_plans_data:
+            meal_data = dict(meal_data)
+            meal_id = meal_data.pop('id', None)
+            foods_data = meal_data.pop('foods', [])
+
+            meal = existing_meals.get(meal_id)
+            if meal is None:
+                meal = MealPlan(nutrition_plan=self, **meal_data)
+                meal.order = MealPlan.MEAL_TYPE_ORDER.get(meal.meal_type, 99)
+                meal_create.append(meal)
+                existing_foods = {}
+            else:
+                if _assign_changed(meal, meal_data):
+                    meal.order = MealPlan.MEAL_TYPE_ORDER.get(meal.meal_type, 99)
+                    meal.updated_at = now
+                    meal_update.append(meal)
+                existing_foods = {f.id: f for f in meal.foods.all()}
+
+            incoming_food_ids = {f['id'] for f in foods_data if f.get('id') in existing_foods}
+            removed_foods = [pk for pk in existing_foods if pk not in incoming_food_ids]
+            if removed_foods:
+                food_delete.extend(removed_foods)
+                recompute.add(meal)
+            meal_foods.append((meal, existing_foods, foods_data))
+
+        if meal_delete:
+            MealPlan.objects.filter(id__in=meal_delete).delete()
+        if food_delete:
+            FoodItem.objects.filter(id__in=food_delete).delete()
+        if meal_create:
+            MealPlan.objects.bulk_create(meal_create)
+        if meal_update:
+            MealPlan.objects.bulk_update(meal_update, MealPlan.EDITABLE_FIELDS + ['order', 'updated_at'])
+
+        for meal, existing_foods, foods_data in meal_foods:
+            for food_data in foods_data:
+                food_data = dict(food_data)
+                food = existing_foods.get(food_data.pop('id', None))
+                if food is None:
+                    food_create.append(FoodItem(meal_plan=meal, **food_data))
+                    recompute.add(meal)
+                elif _assign_changed(food, food_data):
+                    food_update.append(food)
+                    recompute.add(meal)
+
+        if food_create:
+            FoodItem.objects.bulk_create(food_create)
+        if food_update:
+            FoodItem.objects.bulk_update(food_update, FoodItem.EDITABLE_FIELDS)
+        MealPlan.recompute_totals(meal.pk for meal in recompute)
+
 
 class MealPlan(models.Model):
     nutrition_plan = models.ForeignKey(
@@ -133,6 +264,17 @@ class MealPlan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Written by NutritionPlanCreateSerializer / NutritionPlan.sync_meal_plans().
+    EDITABLE_FIELDS = ['day', 'meal_type', 'meal_name', 'meal_time', 'notes']
+
+    # total_* column → FoodItem column it sums; maintained by recompute_totals().
+    TOTAL_FIELDS = {
+        'total_calories': 'calories',
+        'total_protein': 'protein',
+        'total_carbs': 'carbs',
+        'total_fats': 'fats',
+    }
+
     def save(self, *args, **kwargs):
         self.order = self.MEAL_TYPE_ORDER.get(self.meal_type, 99)
         super().save(*args, **kwargs)
@@ -140,6 +282,32 @@ class MealPlan(models.Model):
     def __str__(self):
         return f"Day {self.day} - {self.get_meal_type_display()}"
 
+    @classmethod
+    def recompute_totals(cls, meal_ids):
+        """
+        Sets total_* of the given meals to the sums of their FoodItems (0 for
+        a meal without foods) in a single UPDATE with correlated aggregates.
+        Called by every write path that adds, changes or removes foods.
+        """
+        meal_ids = list(meal_ids)
+        if not meal_ids:
+            return 0
+        foods = FoodItem.objects.filter(meal_plan=OuterRef('pk')).order_by().values('meal_plan')
+
+        def food_sum(field, output_field):
+            return Coalesce(
+                Subquery(foods.annotate(total=Sum(field)).values('total')),
+                Value(0), output_field=output_field,
+            )
+
+        return cls.objects.filter(pk__in=meal_ids).update(
+            **{
+                total: food_sum(field, IntegerField() if field == 'calories' else FloatField())
+                for total, field in cls.TOTAL_FIELDS.items()
+            },
+            updated_at=timezone.now(),
+        )
+
     class Meta:
         ordering = ['day', 'order']
 
@@ -155,6 +323,8 @@ class FoodItem(models.Model):
     fats = models.FloatField(default=0.0)
     order = models.IntegerField(default=1, help_text="Order within the meal")
 
+    EDITABLE_FIELDS = ['name', 'amount', 'unit', 'calories', 'protein', 'carbs', 'fats', 'order']
+
     class Meta:
         ordering = ['order']
 
@@ -0,0 +1,173 @@
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from ..cache import invalidate_dashboard
+
+
+# ---------------------------------------------------------------------------
+# TRAINER REVENUE LEDGER (materialised dashboard figures)
+# ---------------------------------------------------------------------------
+
+class TrainerRevenueLedger(models.Model):
+    """
+    One row per (trainer, year, month) holding the revenue figures shown on
+    the dashboard.
+
+    Rows are updated incrementally with F() deltas when a subscription is sold,
+    an individual session is completed by a trainer who does not own the
+    subscription, or a child is deducted from a group session run by another
+    coach, and reversed when any of those is deleted, a session is
+    un-completed or re-attributed, or a package's price or units change
+    (ClientSubscription/TrainingSession.save() and signals.py).
+
+    bulk_create() and queryset update()/delete() bypass those hooks; code
+    using them must apply the deltas itself (as bulk_deduct() does) or run
+    `python manage.py rebuild_revenue_ledger`, which recomputes every row from
+    scratch; `--verify` reports any drift.
+    """
+    trainer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='revenue_ledger')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+
+    base_revenue = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0'))
+    session_deductions = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0'))
+    session_additions = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0'))
+    group_adjustment = models.DecimalField(
+        max_digits=14, decimal_places=4, default=Decimal('0'),
+        help_text="Net (signed) revenue moved by cross-trainer group sessions."
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    AMOUNT_FIELDS = ('base_revenue', 'session_deductions', 'session_additions', 'group_adjustment')
+
+    class Meta:
+        unique_together = ('trainer', 'year', 'month')
+        indexes = [
+            models.Index(fields=['year', 'month'], name='idx_ledger_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.trainer} — {self.year}-{self.month:02d}"
+
+    # ── Derived figures (mirror the dashboard's historical arithmetic) ─────
+
+    @property
+    def additions(self) -> Decimal:
+        return self.session_additions + max(self.group_adjustment, Decimal(0))
+
+    @property
+    def deductions(self) -> Decimal:
+        return self.session_deductions + max(-self.group_adjustment, Decimal(0))
+
+    @property
+    def adjustment(self) -> Decimal:
+        return self.session_additions - self.session_deductions + self.group_adjustment
+
+    @property
+    def net_revenue(self) -> Decimal:
+        return self.base_revenue + self.adjustment
+
+    # ── Incremental writers ────────────────────────────────────────────────
+
+    @classmethod
+    def apply(cls, trainer_id, when, **deltas):
+        """
+        Adds each delta in `deltas` to the ledger row of `trainer_id` for the
+        month containing `when` (a date or aware datetime). No-op when there is
+        no trainer or every delta is zero.
+        """
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not trainer_id or not deltas or when is None:
+            return
+        if hasattr(when, 'tzinfo') and timezone.is_aware(when):
+            when = timezone.localtime(when)
+
+        with transaction.atomic():
+            cls.objects.get_or_create(trainer_id=trainer_id, year=when.year, month=when.month)
+            cls.objects.filter(
+                trainer_id=trainer_id, year=when.year, month=when.month
+            ).update(**{field: models.F(field) + value for field, value in deltas.items()})
+        invalidate_dashboard()
+
+    @staticmethod
+    def session_value(plan):
+        """Price of a single unit of `plan`, or None when it cannot be valued."""
+        if not plan or not plan.units or plan.units <= 0 or plan.price is None:
+            return None
+        return Decimal(str(plan.price)) / Decimal(plan.units)
+
+    @classmethod
+    def record_subscription(cls, subscription, sign=1):
+        """Books (or, with sign=-1, reverses) the sale of `subscription`."""
+        plan = subscription.plan
+        if plan is None or plan.price is None:
+            return
+        cls.apply(
+            subscription.trainer_id,
+            subscription.created_at,
+            base_revenue=Decimal(str(plan.price)) * sign,
+        )
+
+    @classmethod
+    def record_session(cls, session, subscription, sign=1):
+        """
+        Moves one completed session's value from the subscription owner to the
+        trainer who completed it (with sign=-1, moves it back). Same-trainer
+        completions do not touch the ledger.
+        """
+        if subscription is None or not session.is_completed or not session.date_completed:
+            return
+        owner_id = subscription.trainer_id
+        coach_id = session.completed_by_id
+        if not owner_id or not coach_id or owner_id == coach_id:
+            return
+        value = cls.session_value(subscription.plan)
+        if value is None:
+            return
+        cls.apply(owner_id, session.date_completed, session_deductions=value * sign)
+        cls.apply(coach_id, session.date_completed, session_additions=value * sign)
+
+    @classmethod
+    def record_group_participation(cls, session_log, subscription):
+        """Same as record_session() for a child deducted from a group session."""
+        cls.record_group_participations(session_log, [subscription])
+
+    @classmethod
+    def record_group_participations(cls, session_log, subscriptions):
+        """
+        Batched record_group_participation(): one charged subscription per
+        deducted participant of `session_log`. Deltas are summed per trainer so
+        a whole class costs one ledger write per trainer involved.
+        """
+        coach_id = session_log.coach_id
+        if not coach_id:
+            return
+        totals: dict = {}
+        for subscription in subscriptions:
+            owner_id = subscription.trainer_id
+            if not owner_id or owner_id == coach_id:
+                continue
+            value = cls.session_value(subscription.plan)
+            if value is None:
+                continue
+            totals[owner_id] = totals.get(owner_id, Decimal(0)) - value
+            totals[coach_id] = totals.get(coach_id, Decimal(0)) + value
+        for trainer_id, amount in totals.items():
+            cls.apply(trainer_id, session_log.date, group_adjustment=amount)
+
+    @classmethod
+    def reverse_group_participation(cls, participant):
+        """
+        Undoes the charge of a deleted participant from its snapshot
+        (owner_trainer, session_value), the same figures the rebuild uses.
+        """
+        session_log = participant.session
+        owner_id, coach_id = participant.owner_trainer_id, session_log.coach_id
+        value = participant.session_value
+        if not participant.deducted or not owner_id or not coach_id or owner_id == coach_id or value is None:
+            return
+        cls.apply(owner_id, session_log.date, group_adjustment=value)
+        cls.apply(coach_id, session_log.date, group_adjustment=-value)
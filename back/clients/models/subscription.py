@@ -5,6 +5,7 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 
 from .client import Client
+from .revenue import TrainerRevenueLedger
 
 
 class Subscription(models.Model):
@@ -79,7 +80,29 @@ class ClientSubscription(models.Model):
         if self.is_active and self.end_date and self.end_date < timezone.now().date():
             self.is_active = False
 
-        super().save(*args, **kwargs)
+        is_new = self.pk is None
+        previous = None
+        update_fields = kwargs.get('update_fields')
+        if not is_new and (update_fields is None or {'trainer', 'plan'} & set(update_fields)):
+            previous = (
+                ClientSubscription.objects
+                .select_related('plan')
+                .filter(pk=self.pk)
+                .first()
+            )
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Keep the revenue ledger's base_revenue in step with sales and with
+            # re-assignments of an existing sale to another trainer or package.
+            if is_new:
+                TrainerRevenueLedger.record_subscription(self)
+            elif previous and (
+                previous.trainer_id != self.trainer_id or previous.plan_id != self.plan_id
+            ):
+                TrainerRevenueLedger.record_subscription(previous, sign=-1)
+                TrainerRevenueLedger.record_subscription(self)
 
     @property
     def is_expired(self) -> bool:
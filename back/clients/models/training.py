@@ -1,7 +1,12 @@
-from django.db import models
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .client import Client
+from .revenue import TrainerRevenueLedger
 from .subscription import ClientSubscription
 
 
@@ -19,6 +24,35 @@ class TrainingPlan(models.Model):
     def __str__(self):
         return f"Plan for {self.subscription}"
 
+    def sync_splits(self, splits_data):
+        """
+        Applies a bulk plan edit: `splits_data` is [{"id": split_id,
+        "name"?: ..., "exercises"?: [...]}, ...] for any subset of this
+        plan's splits. Names are updated in one query and every listed
+        exercises tree is diffed like TrainingSession.sync_exercises, all
+        splits together (see _sync_exercise_tree). Splits themselves are
+        never created or deleted here; they follow cycle_length. Items for
+        splits of other plans are ignored.
+
+        Returns {split_id: [{"id": exercise_id, "sets": [set_id, ...]}, ...]}
+        for the splits whose exercises were given.
+        """
+        splits = {split.pk: split for split in self.splits.prefetch_related('exercises__sets')}
+        renamed, groups = [], []
+        for item in splits_data:
+            split = splits.get(item.get('id'))
+            if split is None:
+                continue
+            if 'name' in item and _assign_changed(split, {'name': _text(item['name']) or ''}):
+                renamed.append(split)
+            if 'exercises' in item:
+                groups.append((split, list(split.exercises.all()), item['exercises']))
+
+        if renamed:
+            TrainingDaySplit.objects.bulk_update(renamed, ['name'])
+        trees = _sync_exercise_tree(TrainingExercise, TrainingSet, 'split', groups)
+        return {split.pk: tree for (split, _, _), tree in zip(groups, trees)}
+
 
 class TrainingDaySplit(models.Model):
     plan = models.ForeignKey(TrainingPlan, on_delete=models.CASCADE, related_name='splits')
@@ -65,7 +99,94 @@ class TrainingExercise(models.Model):
         ordering = ['order']
 
 
-class TrainingSet(models.Model):
+# ---------------------------------------------------------------------------
+# PARSED SET VALUES (numeric reps / weight next to the free-text fields)
+# ---------------------------------------------------------------------------
+
+WEIGHT_UNIT_KG = 'kg'
+WEIGHT_UNIT_LB = 'lb'
+WEIGHT_UNIT_CHOICES = [(WEIGHT_UNIT_KG, 'kg'), (WEIGHT_UNIT_LB, 'lb')]
+LB_TO_KG = Decimal('0.45359237')
+
+_REPS_RE = re.compile(r"(\d+)\s*([a-z]*)", re.IGNORECASE)
+_TIMED_UNITS = {'s', 'sec', 'secs', 'second', 'seconds', 'min', 'mins', 'minute', 'minutes'}
+_WEIGHT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(kgs?|kilos?|lbs?|pounds?)?", re.IGNORECASE)
+
+
+def parse_reps(text):
+    """
+    Leading rep count of a free-text reps value: "10" → 10, "10reps" → 10,
+    "8-10" → 8, "5x3" → 5, "12 each side" → 12. Timed ("30s", "1 min") and
+    non-numeric values ("AMRAP", "failure") give None.
+    """
+    match = _REPS_RE.search(text or "")
+    if not match or match.group(2).lower() in _TIMED_UNITS:
+        return None
+    value = int(match.group(1))
+    return value if value < 10_000 else None
+
+
+def parse_weight(text):
+    """
+    (value, unit) of a free-text weight: "60" → (60, 'kg'), "60kg",
+    "132.5 lbs" → (132.5, 'lb'), "22,5" → (22.5, 'kg'). Values without a
+    number ("BW", "band") give (None, '').
+    """
+    match = _WEIGHT_RE.search(text or "")
+    if not match:
+        return None, ''
+    try:
+        value = Decimal(match.group(1).replace(",", "."))
+    except InvalidOperation:
+        return None, ''
+    if value >= 100_000:
+        return None, ''
+    unit = match.group(2) or ''
+    return value, WEIGHT_UNIT_LB if unit.lower().startswith(('lb', 'pound')) else WEIGHT_UNIT_KG
+
+
+class ParsedSetValues(models.Model):
+    """
+    Numeric reps / weight / unit parsed from the free-text `reps` and
+    `weight` fields whenever a set is written, so load analytics can be
+    aggregated in the database. Bulk writers must call parse_values()
+    themselves; `python manage.py backfill_set_values` fills older rows.
+    """
+    reps_value = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
+    weight_value = models.DecimalField(
+        max_digits=7, decimal_places=2, null=True, blank=True, editable=False, db_index=True
+    )
+    weight_unit = models.CharField(max_length=2, choices=WEIGHT_UNIT_CHOICES, blank=True, default='', editable=False)
+
+    PARSED_FIELDS = ['reps_value', 'weight_value', 'weight_unit']
+
+    class Meta:
+        abstract = True
+
+    def parse_values(self) -> bool:
+        """Refreshes the parsed columns from reps/weight; True when any changed."""
+        weight_value, weight_unit = parse_weight(self.weight)
+        return _assign_changed(self, {
+            'reps_value': parse_reps(self.reps),
+            'weight_value': weight_value,
+            'weight_unit': weight_unit,
+        })
+
+    @property
+    def weight_kg(self):
+        if self.weight_value is None or self.weight_unit != WEIGHT_UNIT_LB:
+            return self.weight_value
+        return (self.weight_value * LB_TO_KG).quantize(Decimal('0.01'))
+
+    def save(self, *args, **kwargs):
+        self.parse_values()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'reps', 'weight'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, *self.PARSED_FIELDS}
+        super().save(*args, **kwargs)
+
+
+class TrainingSet(ParsedSetValues):
     exercise = models.ForeignKey(TrainingExercise, on_delete=models.CASCADE, related_name='sets')
     order = models.IntegerField(default=1)
     reps = models.CharField(max_length=50, blank=True)
@@ -101,10 +222,271 @@ class TrainingSession(models.Model):
     is_completed = models.BooleanField(default=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     completed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    version = models.PositiveIntegerField(
+        default=1,
+        help_text="Incremented on every save; clients send it back (If-Match) to detect lost updates.",
+    )
+
+    # Fields that decide whether, when and to whom a session moves revenue.
+    LEDGER_FIELDS = ('subscription_id', 'is_completed', 'date_completed', 'completed_by_id')
 
     class Meta:
         unique_together = ('subscription', 'session_number')
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        previous = None
+        if not is_new:
+            self.version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+            if update_fields is None or {f.removesuffix('_id') for f in self.LEDGER_FIELDS} & {
+                f.removesuffix('_id') for f in update_fields
+            }:
+                previous = TrainingSession.objects.filter(pk=self.pk).first()
+
+        if previous is None and not (is_new and self.is_completed):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Keep the revenue ledger in step with completions, un-completions and
+            # re-attribution of a completed session to another trainer or date.
+            if previous is not None:
+                if all(getattr(previous, f) == getattr(self, f) for f in self.LEDGER_FIELDS):
+                    return
+                if previous.is_completed:
+                    TrainerRevenueLedger.record_session(previous, previous.subscription, sign=-1)
+            if self.is_completed:
+                TrainerRevenueLedger.record_session(self, self.subscription)
+
+    @classmethod
+    def claim_version(cls, pk, expected) -> bool:
+        """
+        Conditional write: bumps the row from `expected` to `expected + 1`
+        and returns False when another writer got there first. Within a
+        transaction the claimed row stays write-locked until commit, so the
+        caller can go on to save() it (which keeps it at expected + 1).
+        """
+        return bool(cls.objects.filter(pk=pk, version=expected).update(version=expected + 1))
+
+    @classmethod
+    def materialize(cls, subscription_id, session_number, carry_forward=False):
+        """
+        Creates session `session_number` of a subscription from its training
+        plan: the split at (session_number - 1) % cycle_length (the same
+        mapping as the session grid) is copied into SessionExercise /
+        SessionSet rows with two bulk inserts, so the query count does not
+        grow with the size of the template.
+
+        With carry_forward, each exercise's set weights are taken from the
+        client's most recent completed session containing it (via
+        ExerciseHistoryEntry, so across subscriptions); template values fill
+        the rest.
+
+        Returns (session, materialized). A completed session or one that
+        already has exercises is returned untouched with materialized=False;
+        (None, False) when the subscription has no plan or the split is missing.
+        """
+        splits = list(
+            TrainingDaySplit.objects.filter(plan__subscription_id=subscription_id)
+            .select_related('plan__subscription')
+            .order_by('order')
+        )
+        if not splits or not splits[0].plan.cycle_length:
+            return None, False
+        index = (session_number - 1) % splits[0].plan.cycle_length
+        if index >= len(splits):
+            return None, False
+        split = splits[index]
+
+        with transaction.atomic():
+            session, created = cls.objects.select_for_update().get_or_create(
+                subscription_id=subscription_id,
+                session_number=session_number,
+                defaults={"name": split.name or f"Session {session_number}"},
+            )
+            if session.is_completed or (not created and session.exercises.exists()):
+                return session, False
+
+            template = list(split.exercises.prefetch_related('sets'))
+            previous = {}
+            if carry_forward and template:
+                entries = ExerciseHistoryEntry.objects.filter(
+                    client_id=split.plan.subscription.client_id,
+                    exercise_key__in={t.name.strip().lower() for t in template},
+                ).order_by('-date', '-session_id').values_list('exercise_key', 'sets')
+                for key, sets in entries:
+                    previous.setdefault(key, sets)
+
+            exercises = SessionExercise.objects.bulk_create([
+                SessionExercise(training_session=session, order=t.order, name=t.name, note=t.note)
+                for t in template
+            ])
+            sets = []
+            for exercise, t in zip(exercises, template):
+                last_sets = previous.get(t.name.strip().lower()) or []
+                for i, template_set in enumerate(t.sets.all()):
+                    weight = template_set.weight
+                    if last_sets:
+                        weight = last_sets[min(i, len(last_sets) - 1)].get('weight') or weight
+                    set_obj = SessionSet(
+                        exercise=exercise,
+                        order=template_set.order,
+                        reps=template_set.reps,
+                        weight=weight,
+                        technique=template_set.technique,
+                        equipment=template_set.equipment,
+                    )
+                    set_obj.parse_values()
+                    sets.append(set_obj)
+            SessionSet.objects.bulk_create(sets)
+
+            if not created:
+                session.save(update_fields=['version'])  # Content changed under existing readers.
+        return session, True
+
+    def sync_exercises(self, exercises_data, created=False):
+        """
+        Makes the stored exercise/set tree match `exercises_data` (the
+        save-data payload) by inserting, updating and deleting only the rows
+        that differ, so row IDs stay stable across autosaves.
+
+        Incoming items carrying an "id" of one of this session's rows update
+        that row; when no item at a level carries an id they are matched by
+        position instead. Unmatched stored rows are deleted. Returns
+        [{"id": exercise_id, "sets": [set_id, ...]}, ...] in payload order.
+        """
+        stored = [] if created else list(self.exercises.prefetch_related('sets'))
+        return _sync_exercise_tree(
+            SessionExercise, SessionSet, 'training_session', [(self, stored, exercises_data)]
+        )[0]
+
+
+def _sync_exercise_tree(exercise_model, set_model, parent_field, groups):
+    """
+    Diff-applies exercise/set trees under one or more parents (a session,
+    or several plan splits) with one bulk query per kind of write.
+
+    `groups` is [(parent, stored_exercises, exercises_data), ...] where the
+    stored exercises have their sets prefetched. Rows are matched with
+    _match_rows(); set parsed values are refreshed via parse_values().
+    Returns one [{"id": exercise_id, "sets": [set_id, ...]}, ...] list per
+    group, in payload order.
+    """
+    ex_create, ex_update, ex_delete = [], [], []
+    set_create, set_update, set_delete = [], [], []
+
+    group_pairs = []
+    for parent, stored, exercises_data in groups:
+        pairs, removed = _match_rows(stored, exercises_data)
+        ex_delete.extend(e.pk for e in removed)
+        set_pairs = []
+        for idx, (exercise, ex_data) in enumerate(pairs):
+            values = {
+                'order': idx + 1,
+                'name': _text(ex_data.get('name', '')),
+                'note': _text(ex_data.get('note', '')),
+            }
+            if exercise is None:
+                exercise = exercise_model(**{parent_field: parent}, **values)
+                ex_create.append(exercise)
+                stored_sets = []
+            else:
+                if _assign_changed(exercise, values):
+                    ex_update.append(exercise)
+                stored_sets = list(exercise.sets.all())
+
+            matched_sets, removed_sets = _match_rows(stored_sets, ex_data.get('sets', []))
+            set_delete.extend(s.pk for s in removed_sets)
+            set_pairs.append((exercise, matched_sets))
+        group_pairs.append(set_pairs)
+
+    if ex_delete:
+        exercise_model.objects.filter(pk__in=ex_delete).delete()
+    if set_delete:
+        set_model.objects.filter(pk__in=set_delete).delete()
+    if ex_create:
+        exercise_model.objects.bulk_create(ex_create)
+    if ex_update:
+        exercise_model.objects.bulk_update(ex_update, ['order', 'name', 'note'])
+
+    trees = []
+    for set_pairs in group_pairs:
+        tree = []
+        for exercise, matched_sets in set_pairs:
+            set_objs = []
+            for idx, (set_obj, set_data) in enumerate(matched_sets):
+                values = {
+                    'order': idx + 1,
+                    'reps': _text(set_data.get('reps', '')),
+                    'weight': _text(set_data.get('weight', '')),
+                    'technique': _text(set_data.get('technique', 'Regular')),
+                    'equipment': _text(set_data.get('equipment', '')),
+                }
+                if set_obj is None:
+                    set_obj = set_model(exercise=exercise, **values)
+                    set_obj.parse_values()
+                    set_create.append(set_obj)
+                elif _assign_changed(set_obj, values):
+                    set_obj.parse_values()
+                    set_update.append(set_obj)
+                set_objs.append(set_obj)
+            tree.append({"id": exercise.pk, "sets": set_objs})
+        trees.append(tree)
+
+    if set_create:
+        set_model.objects.bulk_create(set_create)
+    if set_update:
+        set_model.objects.bulk_update(
+            set_update,
+            ['order', 'reps', 'weight', 'technique', 'equipment', *set_model.PARSED_FIELDS],
+        )
+
+    for tree in trees:
+        for item in tree:
+            item["sets"] = [s.pk for s in item["sets"]]
+    return trees
+
+
+def _text(value):
+    """Payload value as it will be stored in a CharField (None stays None)."""
+    return None if value is None else str(value)
+
+
+def _assign_changed(obj, values) -> bool:
+    """Sets `values` on `obj`; True when any of them differed."""
+    changed = False
+    for field, value in values.items():
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed = True
+    return changed
+
+
+def _match_rows(stored, incoming):
+    """
+    Pairs each incoming dict with a stored row (or None for a new row) and
+    returns (pairs, unmatched_stored). Matches by "id" when any incoming item
+    has one, otherwise by position.
+    """
+    incoming = [item for item in incoming if isinstance(item, dict)] if isinstance(incoming, list) else []
+    if any(item.get('id') for item in incoming):
+        by_id = {row.pk: row for row in stored}
+        pairs = []
+        for item in incoming:
+            try:
+                row = by_id.pop(int(item.get('id')), None)
+            except (TypeError, ValueError):
+                row = None
+            pairs.append((row, item))
+        return pairs, list(by_id.values())
+
+    pairs = [(stored[i] if i < len(stored) else None, item) for i, item in enumerate(incoming)]
+    return pairs, stored[len(incoming):]
+
 
 class SessionExercise(models.Model):
     training_session = models.ForeignKey(
@@ -118,7 +500,7 @@ class SessionExercise(models.Model):
         ordering = ['order']
 
 
-class SessionSet(models.Model):
+class SessionSet(ParsedSetValues):
     exercise = models.ForeignKey(SessionExercise, on_delete=models.CASCADE, related_name='sets')
     order = models.IntegerField(default=1)
     reps = models.CharField(max_length=50, blank=True)
@@ -139,3 +521,85 @@ class SessionSet(models.Model):
 
     class Meta:
         ordering = ['order']
+
+
+# ---------------------------------------------------------------------------
+# EXERCISE HISTORY INDEX (per-exercise progression across subscriptions)
+# ---------------------------------------------------------------------------
+
+class ExerciseHistoryEntry(models.Model):
+    """
+    One row per exercise of a completed TrainingSession, keyed by client so
+    history and progression queries span every subscription the client has
+    had, without loading or serializing session trees.
+
+    Rebuilt for a session whenever it is completed or a completed session's
+    exercises are edited (rebuild_for_session).
+    """
+    session = models.ForeignKey(TrainingSession, on_delete=models.CASCADE, related_name='history_entries')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='exercise_history')
+    subscription = models.ForeignKey(ClientSubscription, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    exercise_order = models.IntegerField(default=1)
+    exercise_name = models.CharField(max_length=200)
+    exercise_key = models.CharField(max_length=200, help_text="exercise_name stripped and lower-cased.")
+
+    sets_count = models.PositiveSmallIntegerField(default=0)
+    total_reps = models.PositiveIntegerField(null=True, blank=True)
+    top_weight = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, help_text="kg")
+    volume = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True,
+        help_text="Sum of reps × weight (kg) over the sets where both are numeric.",
+    )
+    sets = models.JSONField(default=list, help_text='[{"reps": "10", "weight": "60"}, ...] as entered.')
+
+    class Meta:
+        ordering = ['date', 'session', 'exercise_order']
+        indexes = [
+            models.Index(fields=['client', 'exercise_key', 'date'], name='idx_history_client_exercise'),
+        ]
+
+    def __str__(self):
+        return f"{self.exercise_name} — {self.client} ({self.date})"
+
+    @classmethod
+    def build_rows(cls, session, client_id):
+        """Unsaved rows for a completed `session` whose exercises__sets are loaded."""
+        rows = []
+        for exercise in session.exercises.all():
+            sets = list(exercise.sets.all())
+            reps = [s.reps_value for s in sets]
+            weights = [s.weight_kg for s in sets]
+            numeric_reps = [r for r in reps if r is not None]
+            numeric_weights = [w for w in weights if w is not None]
+            pairs = [(r, w) for r, w in zip(reps, weights) if r is not None and w is not None]
+            rows.append(cls(
+                session=session,
+                client_id=client_id,
+                subscription_id=session.subscription_id,
+                date=session.date_completed,
+                exercise_order=exercise.order,
+                exercise_name=exercise.name,
+                exercise_key=exercise.name.strip().lower(),
+                sets_count=len(sets),
+                total_reps=int(sum(numeric_reps)) if numeric_reps else None,
+                top_weight=max(numeric_weights) if numeric_weights else None,
+                volume=sum(r * w for r, w in pairs) if pairs else None,
+                sets=[{"reps": s.reps, "weight": s.weight} for s in sets],
+            ))
+        return rows
+
+    @classmethod
+    def rebuild_for_session(cls, session):
+        """Replaces the session's rows; a session that is not completed has none."""
+        with transaction.atomic():
+            cls.objects.filter(session=session).delete()
+            if not session.is_completed or not session.date_completed:
+                return []
+            session = (
+                TrainingSession.objects.select_related('subscription')
+                .prefetch_related('exercises__sets')
+                .get(pk=session.pk)
+            )
+            return cls.objects.bulk_create(cls.build_rows(session, session.subscription.client_id))
+
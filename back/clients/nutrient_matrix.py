@@ -0,0 +1,158 @@
+"""
+nutrient_matrix.py — in-process, column-per-nutrient copy of FoodDatabase
+for batch macro math.
+
+The nutrients live in one float64 numpy array (rows aligned with `ids`,
+one column per NUTRIENTS entry, per 100 g), with `columns` exposing each
+column, grams_per_serving included, as a 1-D view, plus an id → row and a
+lower-cased name → row index. It is loaded with a single values_list()
+query on first use and reloaded lazily whenever the shared food generation
+(food_search.py, bumped by the FoodDatabase signals) has moved, so saves
+and deletes in any process invalidate it without extra signal receivers.
+
+Batch calculations take (food id or name, grams) pairs and never touch the
+database or model instances once the matrix is loaded: the rows are looked
+up once, then gathered with fancy indexing and summed with one matrix
+product (np.add.at for per-meal sums).
+"""
+
+import threading
+
+import numpy as np
+
+from .food_search import food_generation
+from .models import FoodDatabase
+
+NUTRIENTS = ("calories", "protein", "carbs", "fats", "fiber")
+COLUMNS = NUTRIENTS + ("grams_per_serving",)
+_SOURCE_FIELDS = {
+    "calories": "calories_per_100g",
+    "protein": "protein_per_100g",
+    "carbs": "carbs_per_100g",
+    "fats": "fats_per_100g",
+    "fiber": "fiber_per_100g",
+    "grams_per_serving": "grams_per_serving",
+}
+
+
+class NutrientMatrix:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = None
+        self._set(np.zeros(0, dtype=np.int64), [], [], np.zeros((0, len(COLUMNS))))
+
+    def _set(self, ids, names, categories, values):
+        self.ids, self.names, self.categories = ids, names, categories
+        self.values = values                                   # rows × COLUMNS
+        self.nutrients = values[:, :len(NUTRIENTS)]           # rows × NUTRIENTS view
+        self.columns = {name: values[:, i] for i, name in enumerate(COLUMNS)}
+        self.rows = {int(pk): row for row, pk in enumerate(ids)}            # food id → row
+        self.name_rows = {name.lower(): row for row, name in enumerate(names)}  # lower-cased name → row
+
+    def load(self, records, generation=None):
+        """Replaces the matrix with `records`: (id, name, category, *COLUMNS values) tuples."""
+        ids, names, categories, values = [], [], [], []
+        for pk, name, category, *row in records:
+            ids.append(pk)
+            names.append(name)
+            categories.append(category)
+            values.append([value or 0.0 for value in row])
+        matrix = np.array(values, dtype=np.float64).reshape(len(ids), len(COLUMNS))
+        with self._lock:
+            self._set(np.array(ids, dtype=np.int64), names, categories, matrix)
+            self.generation = generation
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row_for(self, food):
+        """Row of a food given by id or (case-insensitive) name, or None."""
+        if isinstance(food, int) or str(food).isdigit():
+            return self.rows.get(int(food))
+        return self.name_rows.get(str(food).strip().lower())
+
+    # ── Batch calculations ────────────────────────────────────────────────
+
+    def _lookup(self, items):
+        """
+        (positions, rows, grams) arrays for the (food, grams) pairs whose food
+        is known, positions being their indices in `items`.
+        """
+        positions, rows, grams = [], [], []
+        for position, (food, amount) in enumerate(items):
+            row = self.row_for(food)
+            if row is not None:
+                positions.append(position)
+                rows.append(row)
+                grams.append(float(amount))
+        return (
+            np.array(positions, dtype=np.intp),
+            np.array(rows, dtype=np.intp),
+            np.array(grams, dtype=np.float64),
+        )
+
+    def macros(self, items):
+        """
+        [{"food_id", "grams", "calories", "protein", "carbs", "fats", "fiber"}, ...]
+        for (food, grams) pairs, food being an id or a name. Unknown foods
+        are skipped; check `missing()` first when that matters.
+        """
+        _, rows, grams = self._lookup(items)
+        values = np.round(self.nutrients[rows] * (grams / 100)[:, None], 1)
+        return [
+            {"food_id": pk, "grams": amount, **dict(zip(NUTRIENTS, row))}
+            for pk, amount, row in zip(self.ids[rows].tolist(), grams.tolist(), values.tolist())
+        ]
+
+    def totals(self, items):
+        """Summed {nutrient: value} for (food, grams) pairs."""
+        _, rows, grams = self._lookup(items)
+        sums = (grams / 100) @ self.nutrients[rows]
+        return dict(zip(NUTRIENTS, np.round(sums, 1).tolist()))
+
+    def missing(self, foods):
+        """The foods (ids or names) not in the matrix."""
+        return [food for food in foods if self.row_for(food) is None]
+
+    def meal_plan_totals(self, meals):
+        """
+        Per-meal and per-day totals for [(day, meal_type, [(food, grams), ...]), ...]:
+        {"meals": [{"day", "meal_type", **totals}], "days": [{"day", **totals}]}.
+        """
+        meal_index, pairs = [], []
+        for index, (_, _, items) in enumerate(meals):
+            meal_index.extend([index] * len(items))
+            pairs.extend(items)
+        positions, rows, grams = self._lookup(pairs)
+        per_meal = np.zeros((len(meals), len(NUTRIENTS)))
+        np.add.at(per_meal, np.array(meal_index, dtype=np.intp)[positions], self.nutrients[rows] * (grams / 100)[:, None])
+
+        days = {day: index for index, day in enumerate(sorted({day for day, _, _ in meals}))}
+        per_day = np.zeros((len(days), len(NUTRIENTS)))
+        np.add.at(per_day, np.array([days[day] for day, _, _ in meals], dtype=np.intp), per_meal)
+        return {
+            "meals": [
+                {"day": day, "meal_type": meal_type, **dict(zip(NUTRIENTS, totals))}
+                for (day, meal_type, _), totals in zip(meals, np.round(per_meal, 1).tolist())
+            ],
+            "days": [
+                {"day": day, **dict(zip(NUTRIENTS, totals))}
+                for day, totals in zip(days, np.round(per_day, 1).tolist())
+            ],
+        }
+
+
+_matrix = NutrientMatrix()
+
+
+def nutrient_matrix() -> NutrientMatrix:
+    """The process-wide matrix, (re)loaded if any process changed the foods."""
+    generation = food_generation()
+    if _matrix.generation != generation:
+        _matrix.load(
+            FoodDatabase.objects.order_by("id").values_list(
+                "id", "name", "category", *(_SOURCE_FIELDS[name] for name in COLUMNS)
+            ).iterator(),
+            generation,
+        )
+    return _matrix
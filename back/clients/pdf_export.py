@@ -0,0 +1,493 @@
+"""
+pdf_export.py — server-side PDF export of nutrition plans, training plans
+and training sessions.
+
+A view turns the model rows into a small JSON-able *document* (brand, title,
+meta pairs and sections of tables or text; see the *_document() builders)
+and hands it to render(). The document's SHA-256 is the cache key and ETag:
+a document rendered before is served straight from the default cache, so
+repeated exports are instant. Otherwise the rendering is submitted to a
+small thread pool, de-duplicated per hash, and the request waits up to
+PDF_RENDER_WAIT seconds for it; when that is not enough the view answers
+202 and the client asks again.
+
+Pages are drawn as vector text and rectangles with reportlab, in the Cairo
+fonts from PDF_FONT_DIR (clients/fonts/, embedded as subsets), so the text
+is selectable and a page costs a few kilobytes; each page's stream is
+compressed as soon as it is finished. Missing fonts raise
+ImproperlyConfigured rather than falling back to a font without Arabic.
+
+Arabic documents are laid out right to left. reportlab does not shape text,
+so _visual() joins the letters through the Unicode presentation forms and
+reverses Arabic runs into drawing order.
+"""
+
+import hashlib
+import io
+import json
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+
+# Bump when the layout changes so cached PDFs are not served for it.
+RENDERER_VERSION = 2
+
+PAGE_SIZE = A4  # points; layout y runs top-down and is flipped when drawing
+MARGIN = 38
+ROW_HEIGHT = 22
+COLORS = {
+    "primary": (249, 115, 22),
+    "text": (39, 39, 42),
+    "muted": (113, 113, 122),
+    "header": (39, 39, 42),
+    "stripe": (244, 244, 245),
+    "rule": (228, 228, 231),
+    "inverse": (255, 255, 255),
+}
+FONT_FILES = {"regular": "Cairo-Regular.ttf", "bold": "Cairo-Bold.ttf", "black": "Cairo-ExtraBold.ttf"}
+
+LABELS = {
+    "en": {
+        "nutrition": "Nutrition Plan", "training": "Training Program", "session": "Training Session",
+        "client": "Client", "trainer": "Trainer", "date": "Date", "targets": "Daily Targets",
+        "calories": "Calories", "protein": "Protein", "carbs": "Carbs", "fats": "Fats",
+        "day": "Day", "meal": "Meal", "item": "Item", "amount": "Amount", "notes": "Notes",
+        "set": "Set", "reps": "Reps", "weight": "Weight", "technique": "Technique",
+        "equipment": "Equipment", "generated": "Generated by", "page": "Page", "no_items": "No items.",
+    },
+    "ar": {
+        "nutrition": "النظام الغذائي", "training": "البرنامج التدريبي", "session": "الحصة التدريبية",
+        "client": "العميل", "trainer": "المدرب", "date": "التاريخ", "targets": "الأهداف اليومية",
+        "calories": "السعرات", "protein": "بروتين", "carbs": "كربوهيدرات", "fats": "دهون",
+        "day": "اليوم", "meal": "الوجبة", "item": "الصنف", "amount": "الكمية", "notes": "ملاحظات",
+        "set": "مجموعة", "reps": "تكرارات", "weight": "الوزن", "technique": "التكنيك",
+        "equipment": "الأداة", "generated": "تم الإنشاء بواسطة", "page": "صفحة", "no_items": "لا توجد أصناف.",
+    },
+}
+MEAL_LABELS = {
+    "ar": {
+        "breakfast": "الإفطار", "snack_1": "سناك 1", "lunch": "الغداء",
+        "snack_2": "سناك 2", "dinner": "العشاء", "snack_3": "سناك 3",
+    },
+}
+
+
+def labels(language):
+    return LABELS.get(language, LABELS["en"])
+
+
+# ── Documents ─────────────────────────────────────────────────────────────
+
+def _person(user):
+    return (user.get_full_name() or user.username) if user else ""
+
+
+def nutrition_plan_document(plan, language="en"):
+    """Document for a NutritionPlan (subscription__client and created_by selected)."""
+    t = labels(language)
+    meal_names = dict(plan.meal_plans.model.MEAL_CHOICES) | MEAL_LABELS.get(language, {})
+    sections = [{
+        "title": t["targets"],
+        "columns": [[t["calories"], 1], [t["protein"], 1], [t["carbs"], 1], [t["fats"], 1]],
+        "rows": [[f"{plan.target_calories} kcal", f"{plan.target_protein:g} g",
+                  f"{plan.target_carbs:g} g", f"{plan.target_fats:g} g"]],
+    }]
+    columns = [[t["meal"], 2], [t["item"], 4], [t["amount"], 2], ["kcal", 1], ["P", 1], ["C", 1], ["F", 1]]
+    day = None
+    for meal in plan.meal_plans.prefetch_related("foods").order_by("day", "order"):
+        if meal.day != day:
+            day = meal.day
+            sections.append({"title": f"{t['day']} {day}", "columns": columns, "rows": []})
+        rows = sections[-1]["rows"]
+        label = meal.meal_name or meal_names.get(meal.meal_type, meal.meal_type)
+        for food in meal.foods.all():
+            rows.append([label, food.name, f"{food.amount:g} {food.unit}", str(food.calories),
+                         f"{food.protein:g}", f"{food.carbs:g}", f"{food.fats:g}"])
+            label = ""
+        rows.append(["", "", "", str(meal.total_calories), f"{meal.total_protein:g}",
+                     f"{meal.total_carbs:g}", f"{meal.total_fats:g}"] if meal.foods.all() else
+                    [label, t["no_items"], "", "", "", "", ""])
+    if plan.notes:
+        sections.append({"title": t["notes"], "text": plan.notes})
+
+    return {
+        "language": language,
+        "brand": plan.pdf_brand_text or "TFG",
+        "title": t["nutrition"],
+        "meta": [
+            [t["client"], plan.subscription.client.name],
+            [t["trainer"], _person(plan.created_by)],
+            [t["date"], timezone.localdate().isoformat()],
+        ],
+        "sections": sections,
+    }
+
+
+def _exercise_sections(exercises, language, heading=None):
+    t = labels(language)
+    columns = [[t["set"], 1], [t["reps"], 2], [t["weight"], 2], [t["technique"], 3], [t["equipment"], 3]]
+    sections = []
+    for number, exercise in enumerate(exercises, start=1):
+        sections.append({
+            "heading": heading if number == 1 else None,
+            "title": f"{number}. {exercise.name}",
+            "subtitle": exercise.note,
+            "columns": columns,
+            "rows": [
+                [str(index), s.reps, s.weight, s.technique or "Regular", s.equipment or ""]
+                for index, s in enumerate(exercise.sets.all(), start=1)
+            ],
+        })
+    return sections
+
+
+def training_plan_document(plan, language="en"):
+    """Document for a TrainingPlan: every split with its exercises and sets."""
+    t = labels(language)
+    subscription = plan.subscription
+    sections = []
+    for split in plan.splits.prefetch_related("exercises__sets").order_by("order"):
+        sections += _exercise_sections(
+            split.exercises.all(), language, heading=f"{t['day']} {split.order}" + (f" · {split.name}" if split.name else ""),
+        )
+    return {
+        "language": language,
+        "brand": "TFG",
+        "title": t["training"],
+        "meta": [
+            [t["client"], subscription.client.name],
+            [t["trainer"], _person(subscription.trainer)],
+            [t["date"], timezone.localdate().isoformat()],
+        ],
+        "sections": sections,
+    }
+
+
+def training_session_document(session, language="en"):
+    """Document for one TrainingSession with its exercises and sets."""
+    t = labels(language)
+    subscription = session.subscription
+    name = session.name or f"{t['day']} {session.session_number}"
+    return {
+        "language": language,
+        "brand": "TFG",
+        "title": f"{t['session']} · {name}",
+        "meta": [
+            [t["client"], subscription.client.name],
+            [t["trainer"], _person(subscription.trainer)],
+            [t["date"], (session.date_completed or timezone.localdate()).isoformat()],
+        ],
+        "sections": _exercise_sections(session.exercises.prefetch_related("sets").order_by("order"), language),
+    }
+
+
+# ── Cache and worker pool ─────────────────────────────────────────────────
+
+_executor = None
+_pending = {}  # document hash → Future
+_pool_lock = threading.Lock()
+
+
+def document_hash(document) -> str:
+    body = json.dumps({"renderer": RENDERER_VERSION, **document}, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _cache_key(digest):
+    return f"pdf:{digest}"
+
+
+def render(document, wait=None):
+    """
+    (hash, PDF bytes) for `document`, or (hash, None) if it is still
+    rendering after `wait` seconds (default PDF_RENDER_WAIT).
+    """
+    digest = document_hash(document)
+    pdf = cache.get(_cache_key(digest))
+    if pdf is not None:
+        return digest, pdf
+
+    global _executor
+    with _pool_lock:
+        future = _pending.get(digest)
+        if future is None:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(settings.PDF_RENDER_WORKERS, thread_name_prefix="pdf-render")
+            future = _pending[digest] = _executor.submit(_render_and_store, digest, document)
+    try:
+        return digest, future.result(timeout=settings.PDF_RENDER_WAIT if wait is None else wait)
+    except FutureTimeout:
+        return digest, None
+
+
+def _render_and_store(digest, document):
+    try:
+        pdf = render_pdf(document)
+        cache.set(_cache_key(digest), pdf, settings.PDF_CACHE_TIMEOUT)
+        return pdf
+    finally:
+        with _pool_lock:
+            _pending.pop(digest, None)
+
+
+# ── Arabic text ───────────────────────────────────────────────────────────
+
+def _presentation_forms():
+    """({letter: {form: glyph}}, {lam + alef: {form: glyph}}) from the Unicode decompositions."""
+    forms, ligatures = {}, {}
+    for code in range(0xFE70, 0xFEFD):
+        tag, *chars = (unicodedata.decomposition(chr(code)) or "<none>").split()
+        base = "".join(chr(int(c, 16)) for c in chars)
+        if not base or not all(unicodedata.category(c) == "Lo" for c in base):
+            continue
+        (ligatures if len(base) == 2 else forms).setdefault(base, {})[tag.strip("<>")] = chr(code)
+    return forms, ligatures
+
+
+_FORMS, _LIGATURES = _presentation_forms()
+_ARABIC = "\u0600-\u06ff\ufb50-\ufdff\ufe70-\ufeff"
+_ARABIC_RUN = re.compile(f"([{_ARABIC}]+(?:[ ().\\-\u060c]+[{_ARABIC}]+)*)")
+_MIRROR = str.maketrans("()[]", ")(][")
+_NEUTRAL_EDGES = re.compile(r"([\W_]*)(.*?)([\W_]*)", re.DOTALL)
+
+
+def _dual_joining(char):
+    return char == "ـ" or "initial" in _FORMS.get(char, ())
+
+
+def _shape(text):
+    """Arabic letters replaced by their contextual presentation forms (logical order kept)."""
+    chars = [c for c in text if unicodedata.category(c) != "Mn"]  # Marks are not positioned here.
+    out, i = [], 0
+    while i < len(chars):
+        char = chars[i]
+        prev = chars[i - 1] if i else ""
+        joins_prev = _dual_joining(prev) and (char == "ـ" or "final" in _FORMS.get(char, ()))
+        ligature = _LIGATURES.get(char + (chars[i + 1] if i + 1 < len(chars) else ""))
+        if ligature:
+            out.append(ligature.get("final" if joins_prev else "isolated", ligature.get("isolated")))
+            i += 2
+            continue
+        forms = _FORMS.get(char)
+        if forms:
+            nxt = chars[i + 1] if i + 1 < len(chars) else ""
+            joins_next = "initial" in forms and (nxt == "ـ" or "final" in _FORMS.get(nxt, ()))
+            form = {(True, True): "medial", (True, False): "final", (False, True): "initial"}.get(
+                (joins_prev, joins_next)
+            )
+            # Isolated letters stay as they are: fonts draw the base letter
+            # isolated, and some (Cairo) have no isolated presentation forms.
+            char = forms.get(form, char)
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def _visual(text, rtl):
+    """Text in drawing order for reportlab, which neither shapes nor reorders it."""
+    if not _ARABIC_RUN.search(text):
+        return text
+    parts = _ARABIC_RUN.split(_shape(text))
+    # split() with a group alternates other, Arabic, other, ...; Arabic runs are reversed.
+    parts = [part[::-1].translate(_MIRROR) if index % 2 else part for index, part in enumerate(parts)]
+    if not rtl:
+        return "".join(parts)
+    # Right to left, the spaces and brackets around Latin/digit runs follow the
+    # paragraph direction; the runs themselves keep their order.
+    for index in range(0, len(parts), 2):
+        lead, core, trail = _NEUTRAL_EDGES.fullmatch(parts[index]).groups()
+        parts[index] = trail[::-1].translate(_MIRROR) + core + lead[::-1].translate(_MIRROR)
+    return "".join(reversed(parts))
+
+
+# ── Rendering ─────────────────────────────────────────────────────────────
+
+_fonts_lock = threading.Lock()
+
+
+def _font(weight, size):
+    """(registered font name, size) for a FONT_FILES weight, registering the TTF once."""
+    name = f"Cairo-{weight}"
+    with _fonts_lock:
+        if name not in pdfmetrics.getRegisteredFontNames():
+            path = Path(settings.PDF_FONT_DIR) / FONT_FILES[weight]
+            if not path.is_file():
+                raise ImproperlyConfigured(f"PDF export font {path} is missing; check PDF_FONT_DIR.")
+            pdfmetrics.registerFont(TTFont(name, str(path)))
+    return name, size
+
+
+class _Pages:
+    """
+    Lays a document out on A4 pages, mirrored horizontally for RTL. Without
+    a canvas it only measures, which is how render_pdf() learns the page
+    count for the footers before drawing.
+    """
+
+    def __init__(self, document, canvas=None, page_count=None):
+        self.document = document
+        self.canvas = canvas
+        self.rtl = document.get("language") == "ar"
+        self.t = labels(document.get("language"))
+        self.page_count = page_count
+        self.count = 0
+        self.new_page()
+
+    @staticmethod
+    def _width(text, font):
+        return pdfmetrics.stringWidth(text, *font)
+
+    # Coordinates are given left-to-right from the top-left corner; RTL mirrors them.
+    def text(self, x, y, text, font, fill="text", align="left", width=None):
+        if self.canvas is None:
+            return
+        text = str(text or "")
+        if width is not None:
+            text = self._fit(text, font, width)
+        if self.rtl:
+            x = PAGE_SIZE[0] - x
+            align = {"left": "right", "right": "left"}.get(align, align)
+        baseline = PAGE_SIZE[1] - y - pdfmetrics.getAscent(*font)
+        self.canvas.setFont(*font)
+        self.canvas.setFillColorRGB(*(value / 255 for value in COLORS[fill]))
+        draw = {
+            "left": self.canvas.drawString, "right": self.canvas.drawRightString,
+            "center": self.canvas.drawCentredString,
+        }[align]
+        draw(x, baseline, _visual(text, self.rtl))
+
+    def rect(self, x, y, w, h, fill):
+        if self.canvas is None:
+            return
+        if self.rtl:
+            x = PAGE_SIZE[0] - x - w
+        self.canvas.setFillColorRGB(*(value / 255 for value in COLORS[fill]))
+        self.canvas.rect(x, PAGE_SIZE[1] - y - h, w, h, stroke=0, fill=1)
+
+    def _fit(self, text, font, width):
+        if self._width(_visual(text, self.rtl), font) <= width:
+            return text
+        while text and self._width(_visual(text + "…", self.rtl), font) > width:
+            text = text[:-1]
+        return text + "…"
+
+    def new_page(self):
+        if self.count:
+            self.footer()
+        self.count += 1
+        document = self.document
+        self.rect(0, 0, 6, PAGE_SIZE[1], "primary")
+        self.text(MARGIN, MARGIN - 10, document["brand"], _font("black", 31), "primary")
+        self.text(MARGIN, MARGIN + 34, document["title"], _font("bold", 14), "muted")
+        y = MARGIN - 5
+        for label, value in document.get("meta", []):
+            self.text(PAGE_SIZE[0] - MARGIN - 125, y, label, _font("regular", 10), "muted")
+            self.text(PAGE_SIZE[0] - MARGIN, y, value, _font("bold", 10.5), align="right", width=115)
+            y += 18
+        self.rect(MARGIN, MARGIN + 62, PAGE_SIZE[0] - 2 * MARGIN, 2, "primary")
+        self.y = MARGIN + 82
+
+    def footer(self):
+        y = PAGE_SIZE[1] - MARGIN
+        self.rect(MARGIN, y - 8, PAGE_SIZE[0] - 2 * MARGIN, 1, "rule")
+        self.text(MARGIN, y, f"{self.t['generated']} {self.document['brand']}", _font("regular", 8.5), "muted")
+        self.text(PAGE_SIZE[0] - MARGIN, y, f"{self.t['page']} {self.count} / {self.page_count}",
+                  _font("regular", 8.5), "muted", align="right")
+        if self.canvas is not None:
+            self.canvas.showPage()
+
+    def ensure(self, height):
+        if self.y + height > PAGE_SIZE[1] - MARGIN - 20:
+            self.new_page()
+
+    def section(self, section):
+        inner = PAGE_SIZE[0] - 2 * MARGIN
+        if section.get("heading"):
+            self.ensure(38 + ROW_HEIGHT * 3)
+            self.text(MARGIN, self.y, section["heading"], _font("black", 17), "primary")
+            self.y += 31
+        self.ensure(29 + ROW_HEIGHT * 2)
+        self.text(MARGIN, self.y, section["title"], _font("bold", 14))
+        self.y += 24
+        if section.get("subtitle"):
+            self.text(MARGIN, self.y, section["subtitle"], _font("regular", 10.5), "muted", width=inner)
+            self.y += 17
+        if "text" in section:
+            self.paragraph(section["text"], inner)
+        if "columns" in section:
+            self.table(section["columns"], section["rows"], inner)
+        self.y += 14
+
+    def paragraph(self, text, width):
+        font = _font("regular", 11.5)
+        for source_line in str(text).splitlines() or [""]:
+            line = ""
+            for word in source_line.split():
+                candidate = f"{line} {word}".strip()
+                if line and self._width(_visual(candidate, self.rtl), font) > width:
+                    self.ensure(18)
+                    self.text(MARGIN, self.y, line, font)
+                    self.y += 18
+                    line = word
+                else:
+                    line = candidate
+            self.ensure(18)
+            self.text(MARGIN, self.y, line, font)
+            self.y += 18
+
+    def table(self, columns, rows, width):
+        total = sum(weight for _, weight in columns)
+        widths = [width * weight / total for _, weight in columns]
+        lefts = [MARGIN + sum(widths[:i]) for i in range(len(widths))]
+
+        def header():
+            self.rect(MARGIN, self.y, width, ROW_HEIGHT, "header")
+            for (label, _), left, w in zip(columns, lefts, widths):
+                self.text(left + 5, self.y + 4, label, _font("bold", 9.5), "inverse", width=w - 10)
+            self.y += ROW_HEIGHT
+
+        header()
+        body = _font("regular", 10.5)
+        for index, row in enumerate(rows):
+            if self.y + ROW_HEIGHT > PAGE_SIZE[1] - MARGIN - 20:
+                self.new_page()
+                header()
+            if index % 2:
+                self.rect(MARGIN, self.y, width, ROW_HEIGHT, "stripe")
+            for cell, left, w in zip(row, lefts, widths):
+                self.text(left + 5, self.y + 4, cell, body, width=w - 10)
+            self.y += ROW_HEIGHT
+
+    def finish(self):
+        self.footer()
+        return self.count
+
+
+def _layout(document, canvas=None, page_count=None):
+    pages = _Pages(document, canvas, page_count)
+    for section in document.get("sections", []):
+        pages.section(section)
+    return pages.finish()
+
+
+def render_pdf(document) -> bytes:
+    """Lays `document` out on A4 pages and returns the PDF bytes."""
+    page_count = _layout(document)
+    output = io.BytesIO()
+    canvas = Canvas(output, pagesize=PAGE_SIZE, pageCompression=1, invariant=1)
+    canvas.setTitle(document.get("title", ""))
+    _layout(document, canvas, page_count)
+    canvas.save()
+    return output.getvalue()
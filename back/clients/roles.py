@@ -0,0 +1,56 @@
+"""
+roles.py — resolves the requesting user's role once per request.
+
+Receptionists are members of the REC group. MyTokenObtainPairSerializer
+writes that as the `is_receptionist` claim, so for JWT-authenticated
+requests the role is read from the token without touching the database.
+Requests without the claim (older tokens, session or forced auth) fall
+back to a single group lookup, memoized on the user object so views,
+serializers and permissions handling the same request share it.
+
+Because the claim travels with the token, changing a user's groups (or the
+user fields copied into claims) through the ORM revokes that user's tokens
+at once (signals.py), so the next request must log in again and gets the
+new role. Only raw SQL or queryset .update() calls bypass that.
+"""
+
+REC_GROUP = "REC"
+
+ROLE_TRAINER = "trainer"
+ROLE_REC = "rec"
+ROLE_ADMIN = "admin"
+
+# Set on the user object; ClaimsJWTAuthentication pre-fills it from the token.
+IS_RECEPTIONIST_ATTR = "_is_receptionist"
+
+
+def is_receptionist(request) -> bool:
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return False
+
+    cached = getattr(user, IS_RECEPTIONIST_ATTR, None)
+    if cached is not None:
+        return cached
+
+    token = getattr(request, "auth", None)
+    claim = token.get("is_receptionist") if hasattr(token, "get") else None
+    if isinstance(claim, bool):
+        value = claim
+    else:
+        value = user.groups.filter(name=REC_GROUP).exists()
+    setattr(user, IS_RECEPTIONIST_ATTR, value)
+    return value
+
+
+def is_admin_or_receptionist(request) -> bool:
+    return request.user.is_superuser or is_receptionist(request)
+
+
+def get_role(request) -> str:
+    """ROLE_TRAINER, ROLE_REC or ROLE_ADMIN; REC wins over superuser, as on the dashboard."""
+    if is_receptionist(request):
+        return ROLE_REC
+    if request.user.is_superuser:
+        return ROLE_ADMIN
+    return ROLE_TRAINER
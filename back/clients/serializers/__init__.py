@@ -19,6 +19,8 @@ from .training import (
     TrainingExerciseSerializer,
     TrainingDaySplitSerializer,
     TrainingPlanSerializer,
+    CompactTrainingPlanSerializer,
+    TrainingPlanTreeSerializer,
     SessionLogSerializer,
     SessionSetSerializer,
     SessionExerciseSerializer,
@@ -32,6 +34,7 @@ from .nutrition import (
     MealPlanCreateSerializer,
     NutritionPlanSerializer,
     NutritionPlanCreateSerializer,
+    MealPlanGenerateSerializer,
     NutritionProgressSerializer,
     FoodDatabaseSerializer,
 )
@@ -60,13 +63,14 @@ __all__ = [
     'SubscriptionSerializer', 'ClientSubscriptionSerializer',
     # training
     'TrainingSetSerializer', 'TrainingExerciseSerializer',
-    'TrainingDaySplitSerializer', 'TrainingPlanSerializer',
+    'TrainingDaySplitSerializer', 'TrainingPlanSerializer', 'CompactTrainingPlanSerializer',
+    'TrainingPlanTreeSerializer',
     'SessionLogSerializer',
     'SessionSetSerializer', 'SessionExerciseSerializer',
     'TrainingSessionSerializer', 'TrainingSessionListSerializer',
     # nutrition
     'FoodItemSerializer', 'MealPlanSerializer', 'MealPlanCreateSerializer',
-    'NutritionPlanSerializer', 'NutritionPlanCreateSerializer',
+    'NutritionPlanSerializer', 'NutritionPlanCreateSerializer', 'MealPlanGenerateSerializer',
     'NutritionProgressSerializer', 'FoodDatabaseSerializer',
     # group
     'CoachScheduleSerializer', 'GroupSessionParticipantSerializer',
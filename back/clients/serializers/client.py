@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from ..models import Client, Country, Subscription, ClientSubscription
+from ..roles import is_receptionist
 from .utils import _build_photo_url
 
 
@@ -40,7 +41,7 @@ class ClientSerializer(serializers.ModelSerializer):
         if request and hasattr(request, 'user'):
             user = request.user
             is_admin = user.is_superuser
-            is_rec = user.groups.filter(name='REC').exists()
+            is_rec = is_receptionist(request)
 
             if not is_admin and not is_rec and self.instance:
                 if 'name' in data and data['name'] != self.instance.name:
@@ -27,9 +27,12 @@ class MealPlanSerializer(serializers.ModelSerializer):
             'total_carbs', 'total_fats', 'notes', 'is_completed',
             'completed_at', 'photo', 'foods', 'created_at', 'updated_at',
         ]
+        read_only_fields = list(MealPlan.TOTAL_FIELDS)
 
 
 class MealPlanCreateSerializer(serializers.ModelSerializer):
+    # Writable like FoodItemSerializer.id so nested updates can match existing meals.
+    id = serializers.IntegerField(required=False)
     foods = FoodItemSerializer(many=True, required=False)
 
     class Meta:
@@ -39,13 +42,18 @@ class MealPlanCreateSerializer(serializers.ModelSerializer):
             'total_calories', 'total_protein', 'total_carbs', 'total_fats',
             'notes', 'foods',
         ]
+        # Summed from the foods on the server (MealPlan.recompute_totals).
+        read_only_fields = list(MealPlan.TOTAL_FIELDS)
 
     def create(self, validated_data):
         foods_data = validated_data.pop('foods', [])
+        validated_data.pop('id', None)
         meal_plan = MealPlan.objects.create(**validated_data)
         for food_data in foods_data:
             food_data.pop('id', None)
-            FoodItem.objects.create(meal_plan=meal_plan, **food_data)
+        FoodItem.objects.bulk_create([FoodItem(meal_plan=meal_plan, **food_data) for food_data in foods_data])
+        MealPlan.recompute_totals([meal_plan.pk])
+        meal_plan.refresh_from_db(fields=list(MealPlan.TOTAL_FIELDS))
         return meal_plan
 
 
@@ -110,6 +118,7 @@ class NutritionPlanCreateSerializer(serializers.ModelSerializer):
         food_items_to_create = []
         for meal_data in meal_plans_data:
             foods_data = meal_data.pop('foods', [])
+            meal_data.pop('id', None)
             meal_plan = MealPlan.objects.create(nutrition_plan=nutrition_plan, **meal_data)
             for food_data in foods_data:
                 food_data.pop('id', None)
@@ -117,6 +126,7 @@ class NutritionPlanCreateSerializer(serializers.ModelSerializer):
 
         if food_items_to_create:
             FoodItem.objects.bulk_create(food_items_to_create)
+            MealPlan.recompute_totals({food.meal_plan_id for food in food_items_to_create})
 
         return nutrition_plan
 
@@ -131,48 +141,43 @@ class NutritionPlanCreateSerializer(serializers.ModelSerializer):
 
         with transaction.atomic():
             instance.save()
-            existing_meals = {m.id: m for m in instance.meal_plans.prefetch_related('foods').all()}
-            existing_meal_ids = set(existing_meals.keys())
-            incoming_meal_ids = {item['id'] for item in meal_plans_data if item.get('id')}
-
-            ids_to_delete = existing_meal_ids - incoming_meal_ids
-            if ids_to_delete:
-                MealPlan.objects.filter(id__in=ids_to_delete).delete()
-
-            for meal_data in meal_plans_data:
-                meal_id    = meal_data.get('id')
-                foods_data = meal_data.pop('foods', [])
-
-                if meal_id and meal_id in existing_meal_ids:
-                    meal_obj = existing_meals[meal_id]
-                    for k, v in meal_data.items():
-                        if k != 'id':
-                            setattr(meal_obj, k, v)
-                    meal_obj.save()
-                else:
-                    meal_data.pop('id', None)
-                    meal_obj = MealPlan.objects.create(nutrition_plan=instance, **meal_data)
-
-                existing_food_ids  = set(meal_obj.foods.values_list('id', flat=True))
-                incoming_food_ids  = {f['id'] for f in foods_data if f.get('id')}
-                food_ids_to_delete = existing_food_ids - incoming_food_ids
-                if food_ids_to_delete:
-                    FoodItem.objects.filter(id__in=food_ids_to_delete).delete()
-
-                foods_to_create = []
-                for food_data in foods_data:
-                    food_id = food_data.pop('id', None)
-                    if food_id and food_id in existing_food_ids:
-                        FoodItem.objects.filter(id=food_id).update(**food_data)
-                    else:
-                        foods_to_create.append(FoodItem(meal_plan=meal_obj, **food_data))
-
-                if foods_to_create:
-                    FoodItem.objects.bulk_create(foods_to_create)
+            instance.sync_meal_plans(meal_plans_data)
 
         return instance
 
 
+class MealPlanGenerateSerializer(serializers.Serializer):
+    """
+    Options of POST /nutrition-plans/<id>/generate/ (see MealPlanGenerator).
+    Every meal template food multiplies the fit's work, hence the caps.
+    """
+    MAX_DAYS = 366
+    MAX_TEMPLATE_FOODS = 6
+
+    days = serializers.IntegerField(min_value=1, max_value=MAX_DAYS, required=False)
+    meal_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=MealPlan.MEAL_CHOICES), allow_empty=False, required=False
+    )
+    categories = serializers.ListField(child=serializers.CharField(max_length=50), required=False)
+    meal_categories = serializers.DictField(
+        child=serializers.ListField(
+            child=serializers.CharField(max_length=50), allow_empty=False, max_length=MAX_TEMPLATE_FOODS
+        ),
+        required=False,
+    )
+    exclude_foods = serializers.ListField(child=serializers.CharField(max_length=200), required=False)
+    exclude_categories = serializers.ListField(child=serializers.CharField(max_length=50), required=False)
+    tolerance = serializers.FloatField(min_value=0, max_value=1, required=False)
+    seed = serializers.IntegerField(required=False)
+    save = serializers.BooleanField(default=True)
+
+    def validate_meal_categories(self, value):
+        unknown = set(value) - set(MealPlan.MEAL_TYPE_ORDER)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown meal types: {', '.join(sorted(unknown))}")
+        return value
+
+
 class NutritionProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = NutritionProgress
@@ -79,6 +79,121 @@ class TrainingPlanSerializer(serializers.ModelSerializer):
         return plan
 
 
+def _change_points(values):
+    """Run-length encodes a per-set column: [[set_index, value], ...] at each change."""
+    points = []
+    for i, value in enumerate(values):
+        if not points or points[-1][1] != value:
+            points.append([i, value])
+    return points
+
+
+class CompactTrainingPlanSerializer(serializers.BaseSerializer):
+    """
+    Read-only, flattened plan payload for GET /training-plans/compact/.
+
+    Built from two values_list() queries (exercises, sets) instead of three
+    nested ModelSerializer layers. Each exercise carries its sets as
+    parallel arrays (set_ids / reps / weight). The choice columns technique
+    and equipment are indices into the top-level `techniques` / `equipment`
+    tables, delta-encoded as [[first_set_index, choice_index], ...] change
+    points: the value at set i is that of the last point with index <= i,
+    so an exercise whose sets all use the same technique costs one pair.
+    Equipment index -1 means none.
+    """
+
+    TECHNIQUES = [value for value, _ in TrainingSet.TECHNIQUE_CHOICES]
+    EQUIPMENT = [value for value, _ in TrainingSet.EQUIPMENT_CHOICES]
+
+    def to_representation(self, plan):
+        technique_index = {value: i for i, value in enumerate(self.TECHNIQUES)}
+        equipment_index = {value: i for i, value in enumerate(self.EQUIPMENT)}
+
+        sets_by_exercise: dict = {}
+        for exercise_id, set_id, reps, weight, technique, equipment in (
+            TrainingSet.objects.filter(exercise__split__plan=plan)
+            .order_by('exercise_id', 'order', 'id')
+            .values_list('exercise_id', 'id', 'reps', 'weight', 'technique', 'equipment')
+        ):
+            columns = sets_by_exercise.setdefault(exercise_id, ([], [], [], [], []))
+            columns[0].append(set_id)
+            columns[1].append(reps)
+            columns[2].append(weight)
+            columns[3].append(technique_index.get(technique, 0))
+            columns[4].append(equipment_index.get(equipment, -1))
+
+        exercises_by_split: dict = {}
+        for exercise_id, split_id, order, name, note in (
+            TrainingExercise.objects.filter(split__plan=plan)
+            .order_by('split_id', 'order', 'id')
+            .values_list('id', 'split_id', 'order', 'name', 'note')
+        ):
+            set_ids, reps, weight, technique, equipment = sets_by_exercise.get(exercise_id, ([], [], [], [], []))
+            exercises_by_split.setdefault(split_id, []).append({
+                'id': exercise_id,
+                'order': order,
+                'name': name,
+                'note': note,
+                'set_ids': set_ids,
+                'reps': reps,
+                'weight': weight,
+                'technique': _change_points(technique),
+                'equipment': _change_points(equipment),
+            })
+
+        return {
+            'id': plan.id,
+            'subscription': plan.subscription_id,
+            'cycle_length': plan.cycle_length,
+            'created_at': plan.created_at,
+            'techniques': self.TECHNIQUES,
+            'equipment': self.EQUIPMENT,
+            'splits': [
+                {
+                    'id': split.id,
+                    'order': split.order,
+                    'name': split.name,
+                    'exercises': exercises_by_split.get(split.id, []),
+                }
+                for split in plan.splits.all()
+            ],
+        }
+
+
+# ---------------------------------------------------------------------------
+# TRAINING PLAN TREE EDIT (PUT /training-plans/<id>/tree/ payload)
+# ---------------------------------------------------------------------------
+# Input-only: checks the bulk edit against the model fields' choices and
+# lengths before TrainingPlan.sync_splits() bulk-writes it unvalidated.
+# Optional keys stay absent when not sent, which sync_splits relies on.
+
+class TrainingSetTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    reps = serializers.CharField(max_length=50, allow_blank=True, required=False)
+    weight = serializers.CharField(max_length=50, allow_blank=True, required=False)
+    technique = serializers.ChoiceField(choices=TrainingSet.TECHNIQUE_CHOICES, required=False)
+    equipment = serializers.ChoiceField(
+        choices=TrainingSet.EQUIPMENT_CHOICES, allow_blank=True, allow_null=True, required=False
+    )
+
+
+class TrainingExerciseTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    name = serializers.CharField(max_length=200, allow_blank=True, required=False)
+    note = serializers.CharField(max_length=200, allow_blank=True, required=False)
+    sets = TrainingSetTreeSerializer(many=True, required=False)
+
+
+class TrainingSplitTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField(max_length=100, allow_blank=True, required=False)
+    exercises = TrainingExerciseTreeSerializer(many=True, required=False)
+
+
+class TrainingPlanTreeSerializer(serializers.Serializer):
+    splits = TrainingSplitTreeSerializer(many=True)
+
+
 # ---------------------------------------------------------------------------
 # SESSION LOG (legacy)
 # ---------------------------------------------------------------------------
@@ -117,8 +232,9 @@ class TrainingSessionSerializer(serializers.ModelSerializer):
         model = TrainingSession
         fields = [
             'id', 'subscription', 'session_number', 'name', 'is_completed',
-            'date_completed', 'exercises', 'trainer_name', 'completed_by',
+            'date_completed', 'exercises', 'trainer_name', 'completed_by', 'version',
         ]
+        read_only_fields = ['version']
 
 
 class TrainingSessionListSerializer(serializers.ModelSerializer):
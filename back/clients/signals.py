@@ -0,0 +1,197 @@
+"""
+signals.py — model signal receivers, connected from ClientsConfig.ready().
+
+* Drops cached dashboard responses when the data behind them changes.
+  Bulk writes (queryset.update(), bulk_create()) do not send these signals;
+  code paths that use them call clients.cache.invalidate_dashboard() directly.
+* Reverses TrainerRevenueLedger entries when a sale, a completed session or
+  a charged group participant is deleted (including cascades), and re-values
+  them when a package's price or units change.
+* Revokes a user's JWTs when a field carried in their token claims changes,
+  so ClaimsJWTAuthentication never serves stale claims.
+* Keeps the in-process food search index (food_search.py) current and
+  logs every food change for the catalog snapshot/delta (food_catalog.py).
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+
+from .authentication import CLAIMS_USER_ATTR, revoke_user_tokens
+from .cache import invalidate_dashboard
+from .food_search import ENTRY_FIELDS, food_changed
+from .models import (
+    Client, ClientSubscription, FoodCatalogChange, FoodDatabase, GroupSessionParticipant,
+    Subscription, TrainerRevenueLedger, TrainerSchedule, TrainerShift, TrainingSession,
+)
+
+DASHBOARD_SOURCES = (
+    TrainingSession,
+    GroupSessionParticipant,
+    ClientSubscription,
+    TrainerSchedule,
+    TrainerShift,
+    Client,
+)
+
+
+def invalidate_dashboard_on_change(sender, **kwargs):
+    invalidate_dashboard()
+
+
+for model in DASHBOARD_SOURCES:
+    post_save.connect(invalidate_dashboard_on_change, sender=model, dispatch_uid=f"dashboard-save-{model.__name__}")
+    post_delete.connect(invalidate_dashboard_on_change, sender=model, dispatch_uid=f"dashboard-delete-{model.__name__}")
+
+
+# ---------------------------------------------------------------------------
+# REVENUE LEDGER
+# ---------------------------------------------------------------------------
+# pre_delete runs inside the deletion's transaction while related rows (the
+# subscription, the group session) still exist, cascades included.
+
+def reverse_subscription_sale(sender, instance, **kwargs):
+    TrainerRevenueLedger.record_subscription(instance, sign=-1)
+
+
+def reverse_completed_session(sender, instance, **kwargs):
+    if instance.is_completed:
+        TrainerRevenueLedger.record_session(instance, instance.subscription, sign=-1)
+
+
+def reverse_group_participant(sender, instance, **kwargs):
+    TrainerRevenueLedger.reverse_group_participation(instance)
+
+
+def remember_plan_pricing(sender, instance, **kwargs):
+    instance._ledger_previous = (
+        Subscription.objects.filter(pk=instance.pk).first() if instance.pk else None
+    )
+
+
+def reprice_plan_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is not None:
+        reprice_plan(instance.pk, previous, instance)
+
+
+def reprice_plan_on_delete(sender, instance, **kwargs):
+    reprice_plan(instance.pk, instance, None)  # ClientSubscription.plan is SET_NULL.
+
+
+def reprice_plan(plan_id, old, new):
+    """
+    Re-values every sale and cross-trainer session of package `plan_id` from
+    `old` to `new` pricing (None: no package). Group participants keep the
+    value snapshotted when they were charged, as in the rebuild.
+    """
+    old_price = Decimal(str(old.price)) if old is not None and old.price is not None else Decimal(0)
+    new_price = Decimal(str(new.price)) if new is not None and new.price is not None else Decimal(0)
+    old_value = TrainerRevenueLedger.session_value(old) or 0
+    new_value = TrainerRevenueLedger.session_value(new) or 0
+    if old_price == new_price and old_value == new_value:
+        return
+
+    deltas = defaultdict(lambda: defaultdict(Decimal))  # (trainer, year, month) → {field: amount}
+    if old_price != new_price:
+        for trainer_id, created_at in ClientSubscription.objects.filter(
+            plan_id=plan_id, trainer__isnull=False
+        ).values_list('trainer_id', 'created_at'):
+            when = timezone.localtime(created_at)
+            deltas[trainer_id, when.year, when.month]['base_revenue'] += new_price - old_price
+
+    if old_value != new_value:
+        for owner_id, coach_id, completed in (
+            TrainingSession.objects.filter(
+                subscription__plan_id=plan_id,
+                is_completed=True,
+                date_completed__isnull=False,
+                completed_by__isnull=False,
+                subscription__trainer__isnull=False,
+            )
+            .exclude(completed_by=F('subscription__trainer'))
+            .values_list('subscription__trainer_id', 'completed_by_id', 'date_completed')
+        ):
+            deltas[owner_id, completed.year, completed.month]['session_deductions'] += new_value - old_value
+            deltas[coach_id, completed.year, completed.month]['session_additions'] += new_value - old_value
+
+    for (trainer_id, year, month), amounts in deltas.items():
+        TrainerRevenueLedger.apply(trainer_id, date(year, month, 1), **amounts)
+
+
+pre_delete.connect(reverse_subscription_sale, sender=ClientSubscription, dispatch_uid="ledger-sale-delete")
+pre_delete.connect(reverse_completed_session, sender=TrainingSession, dispatch_uid="ledger-session-delete")
+pre_delete.connect(reverse_group_participant, sender=GroupSessionParticipant, dispatch_uid="ledger-participant-delete")
+pre_save.connect(remember_plan_pricing, sender=Subscription, dispatch_uid="ledger-plan-pre-save")
+post_save.connect(reprice_plan_on_save, sender=Subscription, dispatch_uid="ledger-plan-save")
+pre_delete.connect(reprice_plan_on_delete, sender=Subscription, dispatch_uid="ledger-plan-delete")
+
+
+# ---------------------------------------------------------------------------
+# TOKEN CLAIMS
+# ---------------------------------------------------------------------------
+
+CLAIM_FIELDS = ('username', 'first_name', 'is_superuser', 'is_active', 'password')
+
+
+def guard_claims_user_save(sender, instance, **kwargs):
+    if getattr(instance, CLAIMS_USER_ATTR, False):
+        raise RuntimeError(
+            "This User was built from JWT claims; load it from the database before saving."
+        )
+    if instance.pk is None:
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*CLAIM_FIELDS).first()
+    if previous and any(previous[f] != getattr(instance, f) for f in CLAIM_FIELDS):
+        revoke_user_tokens(instance.pk)
+
+
+def revoke_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # post_clear has no pk_set: remember who is about to leave the group.
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        revoke_user_tokens(instance.pk)
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_user_ids', ())
+    for user_id in pk_set or ():
+        revoke_user_tokens(user_id)
+
+
+def revoke_on_user_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+pre_save.connect(guard_claims_user_save, sender=User, dispatch_uid="claims-user-save")
+post_delete.connect(revoke_on_user_delete, sender=User, dispatch_uid="claims-user-delete")
+m2m_changed.connect(revoke_on_group_change, sender=User.groups.through, dispatch_uid="claims-user-groups")
+
+
+# ---------------------------------------------------------------------------
+# FOOD SEARCH INDEX / CATALOG LOG
+# ---------------------------------------------------------------------------
+
+def index_food_on_save(sender, instance, **kwargs):
+    FoodCatalogChange.log(instance.pk)
+    row = {field: getattr(instance, field) for field in ENTRY_FIELDS}
+    transaction.on_commit(lambda: food_changed(row=row))
+
+
+def unindex_food_on_delete(sender, instance, **kwargs):
+    food_id = instance.pk
+    FoodCatalogChange.log(food_id, deleted=True)
+    transaction.on_commit(lambda: food_changed(removed_id=food_id))
+
+
+post_save.connect(index_food_on_save, sender=FoodDatabase, dispatch_uid="food-search-save")
+post_delete.connect(unindex_food_on_delete, sender=FoodDatabase, dispatch_uid="food-search-delete")
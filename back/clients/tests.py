@@ -1,7 +1,31 @@
+import gzip
+import json
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
 from django.test import TestCase
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
 from rest_framework.test import APIClient
-from .models import Client, Subscription, ClientSubscription, TrainingSession
+from . import pdf_export
+from .management.commands.benchmark_group_adjustments import _legacy_group_adjustments
+from .serializers import CompactTrainingPlanSerializer, TrainingPlanSerializer
+from .views.utils import _compute_group_adjustments
+from .models import (
+    Client, Subscription, ClientSubscription, TrainingSession, SessionSet, TrainerRevenueLedger,
+    TrainingPlan, TrainingDaySplit, TrainingExercise, TrainingSet, NutritionPlan, MealPlan, FoodItem, FoodDatabase,
+    GroupSessionLog, GroupSessionParticipant, ExerciseHistoryEntry, parse_reps,
+)
 
 
 class TrainingSessionSecurityTest(TestCase):
@@ -53,3 +77,783 @@ class TrainingSessionSecurityTest(TestCase):
 
         # الاختبار الأهم: التأكد من أن جلسة الاشتراك الثاني لم تتسرب!
         self.assertNotIn(self.session_sub_2.id, returned_ids)
+
+    def test_save_data_keeps_row_ids_and_writes_only_changes(self):
+        def save(exercises):
+            return self.client_api.post("/api/training-sessions/save-data/", {
+                "subscription": self.sub_1.id, "session_number": 2, "exercises": exercises,
+            }, format="json").data["exercises"]
+
+        squat = {"name": "Squat", "sets": [{"reps": "10", "weight": "60"}, {"reps": "8", "weight": "70"}]}
+        first = save([squat, {"name": "Row", "sets": [{"reps": "12", "weight": "40"}]}])
+
+        squat["id"] = first[0]["id"]
+        squat["sets"] = [
+            {"id": first[0]["sets"][0], "reps": "10", "weight": "60"},
+            {"id": first[0]["sets"][1], "reps": "8", "weight": "75"},
+        ]
+        # Row dropped, one weight changed: besides the session row itself only
+        # the exercise (and its cascaded set) is deleted and one set updated.
+        with CaptureQueriesContext(connection) as queries:
+            second = save([squat])
+        self.assertEqual(second, [first[0]])
+        writes = [q["sql"].split()[0] for q in queries.captured_queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+        self.assertEqual(sorted(writes), ["DELETE", "DELETE", "UPDATE", "UPDATE"])
+        self.assertEqual(SessionSet.objects.get(pk=first[0]["sets"][1]).weight, "75")
+
+    def test_stale_version_is_rejected_with_current_state(self):
+        url = "/api/training-sessions/save-data/"
+        payload = {"subscription": self.sub_1.id, "session_number": 3, "exercises": []}
+        version = self.client_api.post(url, payload, format="json").data["version"]
+
+        tablet = self.client_api.post(url, {**payload, "name": "Tablet"}, format="json", HTTP_IF_MATCH=f'"{version}"')
+        self.assertEqual(tablet.status_code, 200)
+        self.assertEqual(tablet["ETag"], f'"{version + 1}"')
+
+        stale = self.client_api.post(url, {**payload, "name": "Phone", "version": version}, format="json")
+        self.assertEqual(stale.status_code, 409)
+        self.assertEqual(stale.data["current"]["name"], "Tablet")
+        self.assertEqual(stale.data["current"]["version"], version + 1)
+
+        session_id = tablet.data["session_id"]
+        stale = self.client_api.patch(f"/api/training-sessions/{session_id}/", {"name": "Phone"}, format="json", HTTP_IF_MATCH=f'"{version}"')
+        self.assertEqual(stale.status_code, 409)
+
+        session_url = f"/api/training-sessions/{session_id}/"
+        done = self.client_api.patch(session_url, {"is_completed": True}, format="json", HTTP_IF_MATCH=f'"{version + 1}"')
+        again = self.client_api.patch(session_url, {"is_completed": True}, format="json", HTTP_IF_MATCH=f'"{done.data["version"]}"')
+        self.assertEqual(again.data["version"], TrainingSession.objects.get(pk=session_id).version)
+        renamed = self.client_api.patch(session_url, {"name": "Phone"}, format="json", HTTP_IF_MATCH=f'"{again.data["version"]}"')
+        self.assertEqual(renamed.status_code, 200)
+
+    def test_grid_is_columnar_single_query_and_etagged(self):
+        self.session_sub_1.completed_by = self.trainer
+        self.session_sub_1.save()
+        self.client_api.post("/api/training-sessions/save-data/", {
+            "subscription": self.sub_1.id, "session_number": 2,
+            "exercises": [{"name": "Squat", "sets": [{"reps": "5"}, {"reps": "5"}]}, {"name": "Plank"}],
+        }, format="json")
+
+        url = f"/api/training-sessions/grid/?subscription_id={self.sub_1.id}"
+        with self.assertNumQueries(1):
+            response = self.client_api.get(url)
+        self.assertEqual(response.data["session_numbers"], [1, 2])
+        self.assertEqual(response.data["trainer_names"], [self.trainer.first_name, None])
+        self.assertEqual(response.data["exercise_counts"], [0, 2])
+        self.assertEqual(response.data["set_counts"], [0, 2])
+        self.assertEqual(self.client_api.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+class TrainingClientTestCase(TestCase):
+    """One trainer and a client with two subscriptions, shared by the session tests below."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer = User.objects.create_user(username="trainer1", password="password")
+        cls.client_obj = Client.objects.create(name="Test Client", manual_id="001")
+        plan = Subscription.objects.create(name="Plan A", units=10, duration_days=30)
+        cls.sub_1 = ClientSubscription.objects.create(client=cls.client_obj, plan=plan, trainer=cls.trainer)
+        cls.sub_2 = ClientSubscription.objects.create(client=cls.client_obj, plan=plan, trainer=cls.trainer)
+
+    def setUp(self):
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=self.trainer)
+
+
+class ExerciseHistoryTest(TrainingClientTestCase):
+    def test_history_and_progression_span_subscriptions(self):
+        url = "/api/training-sessions/save-data/"
+        for sub, number, weight in ((self.sub_1, 2, "60kg"), (self.sub_2, 2, "65"), (self.sub_2, 3, "70")):
+            self.client_api.post(url, {
+                "subscription": sub.id, "session_number": number, "mark_complete": True,
+                "exercises": [{"name": "Bench Press", "sets": [{"reps": "8-10", "weight": weight}] * 2}],
+            }, format="json")
+
+        page = self.client_api.get(f"/api/training-sessions/client-history/?subscription={self.sub_1.id}&page_size=2")
+        self.assertEqual(len(page.data["results"]), 2)
+        self.assertEqual(page.data["results"][0]["exercises"][0]["sets_count"], 2)
+        self.assertEqual(len(self.client_api.get(page.data["next"]).data["results"]), 1)
+
+        series = self.client_api.get(
+            f"/api/training-sessions/progression/?client_id={self.client_obj.id}&exercise=bench press"
+        ).data["points"]
+        self.assertEqual([p["top_weight"] for p in series], [Decimal("60"), Decimal("65"), Decimal("70")])
+        self.assertEqual(series[0]["volume"], Decimal("960"))
+
+    def test_backfill_skips_values_out_of_column_range(self):
+        migration = import_module("clients.migrations.0010_exercisehistoryentry")
+
+        session = TrainingSession.objects.create(
+            subscription=self.sub_1, session_number=2, is_completed=True, date_completed=timezone.localdate(),
+        )
+        exercise = session.exercises.create(name="Squat", order=1)
+        SessionSet.objects.bulk_create([
+            SessionSet(exercise=exercise, order=1, reps="5", weight="100"),
+            SessionSet(exercise=exercise, order=2, reps="5", weight="6000000"),
+        ])
+        ExerciseHistoryEntry.objects.all().delete()
+        migration.backfill(apps, None)
+
+        entry = ExerciseHistoryEntry.objects.get(session=session)
+        self.assertEqual((entry.total_reps, entry.top_weight, entry.volume), (10, None, Decimal("30000500")))
+
+
+class SessionSetParsingTest(TrainingClientTestCase):
+    def test_set_values_are_parsed_and_volume_aggregated_in_db(self):
+        self.client_api.post("/api/training-sessions/save-data/", {
+            "subscription": self.sub_2.id, "session_number": 2, "mark_complete": True,
+            "exercises": [{"name": "Deadlift", "sets": [
+                {"reps": "5", "weight": "100kg"}, {"reps": "3", "weight": "220 lbs"},
+                {"reps": "AMRAP", "weight": "60"}, {"reps": "30s", "weight": ""},
+            ]}],
+        }, format="json")
+        parsed = list(SessionSet.objects.filter(exercise__name="Deadlift").values_list(
+            "reps_value", "weight_value", "weight_unit"))
+        self.assertEqual(parsed, [(5, Decimal("100"), "kg"), (3, Decimal("220"), "lb"),
+                                  (None, Decimal("60"), "kg"), (None, None, "")])
+
+        with self.assertNumQueries(1):
+            weeks = self.client_api.get(
+                f"/api/training-sessions/volume/?client_id={self.client_obj.id}&exercise=deadlift"
+            ).data["exercises"]["deadlift"]
+        self.assertEqual(len(weeks), 1)
+        self.assertEqual((weeks[0]["sets"], weeks[0]["reps"]), (2, 8))
+        self.assertEqual(weeks[0]["volume"], Decimal("799.37"))  # 500 + 3 × 220 lb in kg
+        self.assertEqual(weeks[0]["estimated_1rm"], Decimal("116.67"))
+
+    def test_parse_reps_takes_the_leading_count(self):
+        cases = {"10": 10, "10reps": 10, "12 Reps": 12, "8-10": 8, "5x3": 5, "3 x 12": 3, "12 each side": 12,
+                 "30s": None, "45 sec": None, "1 min": None, "AMRAP": None, "": None}
+        self.assertEqual({text: parse_reps(text) for text in cases}, cases)
+
+
+class SessionMaterializeTest(TrainingClientTestCase):
+    def test_materialize_copies_plan_split_with_carried_weights(self):
+        plan = TrainingPlan.objects.create(subscription=self.sub_1, cycle_length=2)
+        push, pull = TrainingDaySplit.objects.bulk_create([
+            TrainingDaySplit(plan=plan, order=1, name="Push"), TrainingDaySplit(plan=plan, order=2, name="Pull"),
+        ])
+        for order, name in enumerate(["Bench", "Dips", "Fly"], 1):
+            exercise = TrainingExercise.objects.create(split=push, order=order, name=name)
+            TrainingSet.objects.bulk_create([TrainingSet(exercise=exercise, order=i, reps="10", weight="20") for i in (1, 2)])
+        self.client_api.post("/api/training-sessions/save-data/", {
+            "subscription": self.sub_2.id, "session_number": 2, "mark_complete": True,
+            "exercises": [{"name": "bench", "sets": [{"reps": "8", "weight": "80"}]}],
+        }, format="json")
+
+        url = "/api/training-sessions/materialize/"
+        with self.assertNumQueries(16):  # Independent of how many exercises / sets the split has.
+            response = self.client_api.post(url, {"subscription": self.sub_1.id, "session_number": 3, "carry_forward": True}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["name"], "Push")
+        self.assertEqual([e["name"] for e in response.data["exercises"]], ["Bench", "Dips", "Fly"])
+        self.assertEqual([s["weight"] for s in response.data["exercises"][0]["sets"]], ["80", "80"])
+        self.assertEqual(response.data["exercises"][1]["sets"][0]["weight_value"], "20.00")
+
+        again = self.client_api.post(url, {"subscription": self.sub_1.id, "session_number": 3}, format="json")
+        self.assertEqual((again.status_code, again.data["materialized"]), (200, False))
+
+
+class TrainingPlanPayloadBenchmarkTest(TestCase):
+    """Tracks the compact plan payload against the nested serializer as plans grow."""
+
+    def setUp(self):
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=User.objects.create_user(username="coach"))
+        self.plan_subscription = Subscription.objects.create(name="Plan", units=10, duration_days=30)
+
+    def _plan(self, exercises_per_split, sets_per_exercise=4, splits=4):
+        client = Client.objects.create(name=f"c{exercises_per_split}", manual_id=f"b{exercises_per_split}")
+        sub = ClientSubscription.objects.create(client=client, plan=self.plan_subscription)
+        plan = TrainingPlan.objects.create(subscription=sub, cycle_length=splits)
+        day_splits = TrainingDaySplit.objects.bulk_create(
+            [TrainingDaySplit(plan=plan, order=d, name=f"Day {d}") for d in range(1, splits + 1)]
+        )
+        exercises = TrainingExercise.objects.bulk_create([
+            TrainingExercise(split=split, order=e, name=f"Exercise {e}")
+            for split in day_splits for e in range(1, exercises_per_split + 1)
+        ])
+        TrainingSet.objects.bulk_create([
+            TrainingSet(exercise=exercise, order=i, reps="10", weight=str(20 + i),
+                        technique="Drop Set" if i == sets_per_exercise else "Regular")
+            for exercise in exercises for i in range(1, sets_per_exercise + 1)
+        ])
+        return sub
+
+    def test_compact_plan_cost_stays_flat_as_plan_grows(self):
+        for exercises_per_split in (5, 40):
+            sub = self._plan(exercises_per_split)
+            with self.assertNumQueries(4):
+                compact = self.client_api.get(f"/api/training-plans/compact/?subscription_id={sub.id}")
+            exercise = compact.data["splits"][0]["exercises"][0]
+            self.assertEqual(exercise["reps"], ["10"] * 4)
+            self.assertEqual(exercise["technique"], [[0, 0], [3, 1]])
+
+            plan = TrainingPlan.objects.get(subscription=sub)
+            with self.assertNumQueries(4):
+                nested = json.dumps(TrainingPlanSerializer(
+                    TrainingPlan.objects.prefetch_related("splits__exercises__sets").get(pk=plan.pk)
+                ).data, cls=DjangoJSONEncoder)
+            with self.assertNumQueries(3):
+                packed = json.dumps(CompactTrainingPlanSerializer(plan).data, cls=DjangoJSONEncoder)
+            self.assertLess(len(packed), len(nested))
+
+    def test_plan_tree_bulk_edit_diffs_all_splits_at_once(self):
+        sub = self._plan(2, sets_per_exercise=2, splits=2)
+        plan = TrainingPlan.objects.get(subscription=sub)
+        before = self.client_api.get(f"/api/training-plans/compact/?subscription_id={sub.id}").data["splits"]
+        day1, day2 = before
+        kept = day1["exercises"][0]
+
+        payload = {"splits": [
+            {"id": day1["id"], "name": "Push", "exercises": [
+                {"id": kept["id"], "name": kept["name"], "sets": [
+                    {"id": kept["set_ids"][0], "reps": "10", "weight": "21"},
+                    {"id": kept["set_ids"][1], "reps": "8", "weight": "30", "technique": "Drop Set"},
+                ]},
+                {"name": "Dips", "sets": [{"reps": "12", "weight": "BW"}]},
+            ]},
+            {"id": day2["id"], "exercises": []},
+        ]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_api.put(f"/api/training-plans/{plan.id}/tree/", payload, format="json")
+        self.assertEqual(response.status_code, 200)
+        writes = sorted(q["sql"].split()[0] for q in queries.captured_queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE")))
+        # Rename, dropped exercises (+ their sets), new exercise, new set, one changed set.
+        self.assertEqual(writes, ["DELETE", "DELETE", "INSERT", "INSERT", "UPDATE", "UPDATE"])
+
+        push, pull = response.data["splits"]
+        self.assertEqual((push["name"], [e["name"] for e in push["exercises"]]), ("Push", [kept["name"], "Dips"]))
+        self.assertEqual(push["exercises"][0]["sets"][1]["reps_value"], 8)
+        self.assertEqual(pull["exercises"], [])
+        self.assertEqual(self.client_api.put(f"/api/training-plans/{plan.id}/tree/", {"splits": [{"id": 0}]}, format="json").status_code, 400)
+
+        for bad_split in (
+            {"id": day1["id"], "name": None},
+            {"id": day1["id"], "exercises": [{"name": "Row", "sets": [{"technique": "Cheat"}]}]},
+            {"id": day1["id"], "exercises": [{"name": "Row", "sets": [{"technique": None}]}]},
+            {"id": day1["id"], "exercises": [{"name": "Row", "sets": [{"reps": "1" * 51}]}]},
+        ):
+            response = self.client_api.put(f"/api/training-plans/{plan.id}/tree/", {"splits": [bad_split]}, format="json")
+            self.assertEqual(response.status_code, 400, bad_split)
+        self.assertEqual(TrainingPlan.objects.get(pk=plan.pk).splits.get(pk=day1["id"]).name, "Push")
+
+
+class NutritionApiTest(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=User.objects.create_user(username="nutritionist"))
+        client = Client.objects.create(name="Diet Client", manual_id="N1")
+        plan = Subscription.objects.create(name="Plan", units=10, duration_days=30)
+        self.sub = ClientSubscription.objects.create(client=client, plan=plan)
+
+    def test_update_writes_only_changed_rows_in_bulk(self):
+        food = lambda name, grams: {"name": name, "amount": grams, "calories": grams}
+        meals = [
+            {"day": day, "meal_type": meal_type, "foods": [food(f"{meal_type}-{i}", 100) for i in range(5)]}
+            for day in range(1, 15) for meal_type in ("breakfast", "lunch", "dinner")
+        ]
+        created = self.client_api.post("/api/nutrition-plans/", {
+            "subscription": self.sub.id, "name": "Cut", "meal_plans": meals,
+        }, format="json").data
+        self.assertEqual(MealPlan.objects.filter(order=3).count(), 14)
+
+        meals = created["meal_plans"]
+        meals[0]["foods"][0]["amount"] = 150          # one changed food
+        meals[1]["meal_type"] = "snack_1"             # one changed meal
+        meals[2]["foods"].pop()                       # one removed food
+        del meals[3]                                  # one removed meal (and its foods)
+        meals.append({"day": 15, "meal_type": "breakfast", "foods": [food("oats", 80)]})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_api.put(
+                f"/api/nutrition-plans/{created['id']}/",
+                {"subscription": self.sub.id, "name": "Cut", "meal_plans": meals}, format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        writes = sorted(q["sql"].split()[0] for q in queries.captured_queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE")))
+        # Plan row; removed meal (+ cascaded foods); removed food; new meal; new food; changed meal;
+        # changed food; one totals recompute for the meals whose foods changed.
+        self.assertEqual(writes, ["DELETE", "DELETE", "DELETE", "INSERT", "INSERT", "UPDATE", "UPDATE", "UPDATE", "UPDATE"])
+
+        self.assertEqual(FoodItem.objects.get(pk=meals[0]["foods"][0]["id"]).amount, 150)
+        self.assertEqual(MealPlan.objects.get(pk=meals[1]["id"]).order, 2)
+        self.assertEqual(MealPlan.objects.filter(nutrition_plan_id=created["id"]).count(), 42)
+        self.assertEqual(FoodItem.objects.filter(meal_plan__nutrition_plan_id=created["id"]).count(), 42 * 5 - 1 - 4)
+
+    def test_meal_totals_are_derived_from_foods(self):
+        created = self.client_api.post("/api/nutrition-plans/", {
+            "subscription": self.sub.id, "target_calories": 1000, "meal_plans": [
+                {"day": 1, "meal_type": "breakfast", "total_calories": 9999, "foods": [
+                    {"name": "eggs", "calories": 300, "protein": 20.5}, {"name": "toast", "calories": 150, "carbs": 30},
+                ]},
+                {"day": 1, "meal_type": "lunch", "foods": [{"name": "rice", "calories": 400, "carbs": 90}]},
+                {"day": 2, "meal_type": "lunch", "foods": []},
+            ],
+        }, format="json").data
+        breakfast = MealPlan.objects.get(nutrition_plan_id=created["id"], meal_type="breakfast")
+        self.assertEqual((breakfast.total_calories, breakfast.total_protein, breakfast.total_carbs), (450, 20.5, 30))
+
+        toast = breakfast.foods.get(name="toast")
+        self.client_api.delete(f"/api/food-items/{toast.id}/")
+
+        with self.assertNumQueries(2):
+            totals = self.client_api.get(f"/api/nutrition-plans/{created['id']}/totals/").data
+        day1, day2 = totals["days"]
+        self.assertEqual((day1["meals"], day1["calories"], day1["carbs"]), (2, 700, 90))
+        self.assertEqual((day1["calories_diff"], day1["calories_percent"]), (-300, 70))
+        self.assertEqual(day2["calories"], 0)
+        self.assertEqual(totals["average"]["calories"], 350)
+
+    def test_food_search_is_normalized_ranked_and_incremental(self):
+        def food(name, arabic, category="Protein", **extra):
+            return FoodDatabase(
+                name=name, arabic_name=arabic, category=category, calories_per_100g=100,
+                protein_per_100g=10, carbs_per_100g=0, fats_per_100g=1, **extra,
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for row in (food("Chicken Breast", "صدر الدجاج", is_verified=True), food("Chickpeas", "حمص", "Legumes"),
+                        food("Rice", "أَرُزّ أبيض"), food("Chicken", "دجاج")):
+                row.save()
+
+        url = "/api/food-database/autocomplete/?q="
+        self.client_api.get(url + "x")  # Build the index.
+        with self.assertNumQueries(0):
+            names = [f["name"] for f in self.client_api.get(url + "chick").data["results"]]
+        self.assertEqual(names, ["Chicken Breast", "Chicken", "Chickpeas"])  # Verified first, then closer.
+        self.assertEqual([f["name"] for f in self.client_api.get(url + "ارز").data["results"]], ["Rice"])
+        self.assertEqual([f["name"] for f in self.client_api.get(url + "دجاج").data["results"]], ["Chicken", "Chicken Breast"])
+        self.assertEqual(self.client_api.get(url + "chiken brest").data["results"][0]["name"], "Chicken Breast")
+
+        # The category is applied inside the index, before the result cap.
+        with mock.patch("clients.views.nutrition.FoodIndexSearchFilter.max_results", 1):
+            listed = self.client_api.get("/api/food-database/?search=chick&category=Legumes").data["results"]
+        self.assertEqual([f["name"] for f in listed], ["Chickpeas"])
+
+        rice = FoodDatabase.objects.get(name="Rice")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_api.patch(f"/api/food-database/{rice.id}/", {"name": "Basmati Rice"}, format="json")
+        self.assertEqual([f["name"] for f in self.client_api.get(url + "basm").data["results"]], ["Basmati Rice"])
+        listed = self.client_api.get("/api/food-database/?search=chick").data["results"]
+        self.assertEqual([f["name"] for f in listed], names)
+
+    def test_food_catalog_snapshot_is_versioned_compressed_and_has_deltas(self):
+        oats, milk = (
+            FoodDatabase.objects.create(name=name, category="Grains", calories_per_100g=100,
+                                        protein_per_100g=5, carbs_per_100g=10, fats_per_100g=1)
+            for name in ("Oats", "Milk")
+        )
+        response = self.client_api.get("/api/food-database/catalog/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        document = json.loads(gzip.decompress(response.content))
+        self.assertEqual(document["columns"]["name"], ["Oats", "Milk"])
+        self.assertEqual((document["columns"]["category"], document["dictionaries"]["category"]), ([0, 0], ["Grains"]))
+        version = document["version"]
+        self.assertEqual(response["ETag"], f'"{version}"')
+
+        with self.assertNumQueries(1):  # Only the sequence lookup; the body comes from the cache.
+            response = self.client_api.get("/api/food-database/catalog/", HTTP_IF_NONE_MATCH=f'"{version}"')
+        self.assertEqual(response.status_code, 304)
+
+        self.client_api.patch(f"/api/food-database/{oats.id}/", {"name": "Rolled Oats"}, format="json")
+        self.client_api.delete(f"/api/food-database/{milk.id}/")
+        delta = self.client_api.get(f"/api/food-database/catalog/delta/?since={version}").data
+        self.assertEqual(delta["upserted"]["columns"]["name"], ["Rolled Oats"])
+        self.assertEqual(delta["deleted"], [milk.id])
+        self.assertNotEqual(delta["version"], version)
+        fresh = json.loads(self.client_api.get("/api/food-database/catalog/").content)
+        self.assertEqual((fresh["version"], fresh["columns"]["name"]), (delta["version"], ["Rolled Oats"]))
+        self.assertEqual(self.client_api.get("/api/food-database/catalog/delta/?since=999").status_code, 410)
+
+    def test_generator_fills_a_four_week_plan_to_macro_targets(self):
+        foods = {
+            "Protein": [("Chicken Breast", 165, 31, 0, 3.6), ("Egg Whites", 52, 11, 0.7, 0.2), ("Tuna", 130, 29, 0, 1)],
+            "Carbs": [("Rice", 130, 2.7, 28, 0.3), ("Oats", 389, 17, 66, 7), ("Potato", 77, 2, 17, 0.1)],
+            "Fats": [("Olive Oil", 884, 0, 0, 100), ("Almonds", 579, 21, 22, 50), ("Avocado", 160, 2, 9, 15)],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            for category, rows in foods.items():
+                for name, kcal, protein, carbs, fats in rows:
+                    FoodDatabase.objects.create(name=name, category=category, calories_per_100g=kcal,
+                                                protein_per_100g=protein, carbs_per_100g=carbs, fats_per_100g=fats)
+        plan = NutritionPlan.objects.create(
+            subscription=self.sub, duration_weeks=4, calc_meals=3, calc_snacks=2,
+            target_calories=2300, target_protein=160, target_carbs=250, target_fats=70,
+        )
+
+        response = self.client_api.post(f"/api/nutrition-plans/{plan.id}/generate/", {
+            "exclude_foods": ["Tuna"], "meal_categories": {"snack_1": ["Protein", "Fats"]}, "seed": 1,
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["days"], response.data["meals"]), (28, 140))
+        self.assertEqual(response.data["within_tolerance"], 140 - 28)  # All but the carb-free snack.
+
+        meals = MealPlan.objects.filter(nutrition_plan=plan)
+        self.assertEqual(meals.count(), 140)
+        self.assertFalse(FoodItem.objects.filter(meal_plan__nutrition_plan=plan, name="Tuna").exists())
+        self.assertFalse(FoodItem.objects.filter(meal_plan__meal_type="snack_1", name__in=["Rice", "Oats", "Potato"]).exists())
+        for day in plan.day_totals():
+            self.assertAlmostEqual(day["protein"], 160, delta=16)
+            self.assertAlmostEqual(day["fats"], 70, delta=7)
+
+        for bad in ({"meal_categories": ["x"]}, {"exclude_foods": "Rice"}, {"categories": "Fats"},
+                    {"days": 100000}, {"meal_categories": {"brunch": ["Fats"]}}, {"meal_types": ["tea"]}):
+            response = self.client_api.post(f"/api/nutrition-plans/{plan.id}/generate/", bad, format="json")
+            self.assertEqual(response.status_code, 400, bad)
+
+    def test_batch_macros_come_from_the_nutrient_matrix(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rice = FoodDatabase.objects.create(name="Rice", category="Carbs", calories_per_100g=130,
+                                               protein_per_100g=2.7, carbs_per_100g=28, fats_per_100g=0.3)
+            oil = FoodDatabase.objects.create(name="Olive Oil", category="Fats", calories_per_100g=884,
+                                              protein_per_100g=0, carbs_per_100g=0, fats_per_100g=100)
+        url = "/api/food-database/macros/"
+        self.client_api.post(url, {"items": []}, format="json")  # Load the matrix.
+        with self.assertNumQueries(0):
+            data = self.client_api.post(url, {"items": [
+                {"food_id": rice.id, "grams": 200}, {"name": "olive oil", "grams": 10}, {"food_id": 999, "grams": 5},
+            ]}, format="json").data
+        self.assertEqual([(i["food_id"], i["calories"]) for i in data["items"]], [(rice.id, 260), (oil.id, 88.4)])
+        self.assertEqual((data["totals"]["carbs"], data["totals"]["fats"], data["missing"]), (56, 10.6, [999]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_api.patch(f"/api/food-database/{rice.id}/", {"carbs_per_100g": 30}, format="json")
+        data = self.client_api.post(url, {"meal_plans": [
+            {"day": 1, "meal_type": "lunch", "foods": [{"food_id": rice.id, "amount": 100}, {"name": "Olive Oil", "amount": 5}]},
+            {"day": 1, "meal_type": "dinner", "foods": [{"name": "Rice", "amount": 100}]},
+        ]}, format="json").data
+        self.assertEqual([(m["meal_type"], m["carbs"]) for m in data["meals"]], [("lunch", 30), ("dinner", 30)])
+        self.assertEqual((data["days"][0]["carbs"], data["days"][0]["fats"]), (60, 5.6))
+        for bad in ({"meal_plans": "x"}, {"meal_plans": [{"day": 1, "foods": [{"name": "Rice", "amount": "lots"}]}]},
+                    {"items": [{"name": "Rice", "grams": "NaN"}]}, {"items": "Rice"}):
+            self.assertEqual(self.client_api.post(url, bad, format="json").status_code, 400, bad)
+
+    def test_plan_pdf_is_rendered_once_per_content(self):
+        plan = NutritionPlan.objects.create(subscription=self.sub, pdf_brand_text="Gym Pro", notes="اشرب الماء")
+        meal = MealPlan.objects.create(nutrition_plan=plan, day=1, meal_type="breakfast")
+        FoodItem.objects.create(meal_plan=meal, name="شوفان", amount=80, calories=311)
+        url = f"/api/nutrition-plans/{plan.id}/pdf/?lang=ar"
+
+        with mock.patch.object(pdf_export, "render_pdf", wraps=pdf_export.render_pdf) as render_pdf:
+            first = self.client_api.get(url)
+            again = self.client_api.get(url)
+            unchanged = self.client_api.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+            plan.notes = "Drink water"
+            plan.save()
+            edited = self.client_api.get(url)
+        self.assertEqual((first.status_code, first["Content-Type"]), (200, "application/pdf"))
+        self.assertTrue(first.content.startswith(b"%PDF"))
+        self.assertIn(b"/FontFile2", first.content)  # Vector text in the embedded Cairo subset.
+        self.assertEqual((again.content, unchanged.status_code), (first.content, 304))
+        self.assertNotEqual(edited["ETag"], first["ETag"])
+        self.assertEqual(render_pdf.call_count, 2)
+
+        with self.settings(PDF_FONT_DIR="/nonexistent"), mock.patch.object(
+            pdf_export.pdfmetrics, "getRegisteredFontNames", return_value=[]
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                pdf_export.render_pdf(pdf_export.nutrition_plan_document(plan))
+
+
+class TrainerRevenueLedgerTest(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.owner = User.objects.create_user(username="owner", password="password")
+        self.coach = User.objects.create_user(username="coach", password="password")
+
+        self.plan = Subscription.objects.create(
+            name="Plan 10", units=10, duration_days=30, price=1000
+        )
+        self.adult = Client.objects.create(name="Adult", manual_id="A1")
+        self.child = Client.objects.create(name="Child", manual_id="C1", is_child=True)
+        self.adult_sub = ClientSubscription.objects.create(
+            client=self.adult, plan=self.plan, trainer=self.owner
+        )
+        self.child_sub = ClientSubscription.objects.create(
+            client=self.child, plan=self.plan, trainer=self.owner
+        )
+
+    def _ledger(self, trainer):
+        today = timezone.now()
+        return TrainerRevenueLedger.objects.get(
+            trainer=trainer, year=today.year, month=today.month
+        )
+
+    def test_ledger_tracks_sales_and_cross_trainer_sessions(self):
+        self.client_api.force_authenticate(user=self.coach)
+        response = self.client_api.post("/api/training-sessions/save-data/", {
+            "subscription": self.adult_sub.id,
+            "session_number": 1,
+            "mark_complete": True,
+            "exercises": [],
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client_api.post("/api/group-training/complete_session/", {
+            "day_name": "Monday",
+            "participants": [{"client_id": self.child.id}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        participant = GroupSessionParticipant.objects.get(client=self.child)
+        self.assertEqual(participant.subscription_id, self.child_sub.id)
+        self.assertEqual(participant.owner_trainer_id, self.owner.id)
+        self.assertEqual(participant.session_value, Decimal("100"))
+
+        owner_row = self._ledger(self.owner)
+        self.assertEqual(owner_row.base_revenue, Decimal("2000"))
+        self.assertEqual(owner_row.session_deductions, Decimal("100"))
+        self.assertEqual(owner_row.group_adjustment, Decimal("-100"))
+        self.assertEqual(self._ledger(self.coach).adjustment, Decimal("200"))
+
+        self.client_api.force_authenticate(user=self.owner)
+        summary = self.client_api.get("/api/dashboard/stats/").data["summary"]
+        self.assertEqual(summary["net_revenue"], Decimal("1800.00"))
+        self.assertEqual(summary["deductions"], Decimal("200.00"))
+
+        call_command("rebuild_revenue_ledger", "--verify", stdout=StringIO())
+
+    def test_ledger_reverses_deletes_uncompletions_and_repricing(self):
+        today = timezone.now().date()
+        session = TrainingSession.objects.create(
+            subscription=self.adult_sub, session_number=1, is_completed=True,
+            date_completed=today, completed_by=self.coach,
+        )
+        self.client_api.force_authenticate(user=self.coach)
+        self.client_api.post("/api/group-training/complete_session/", {
+            "day_name": "Monday",
+            "participants": [{"client_id": self.child.id}],
+        }, format="json")
+        self.assertEqual(self._ledger(self.coach).adjustment, Decimal("200"))
+
+        self.plan.price = 2000
+        self.plan.save()
+        self.assertEqual(self._ledger(self.owner).base_revenue, Decimal("4000"))
+        self.assertEqual(self._ledger(self.coach).session_additions, Decimal("200"))
+        call_command("rebuild_revenue_ledger", "--verify", stdout=StringIO())
+
+        session.is_completed = False
+        session.save()
+        GroupSessionLog.objects.all().delete()
+        self.adult_sub.delete()
+        owner_row = self._ledger(self.owner)
+        self.assertEqual(owner_row.base_revenue, Decimal("2000"))
+        self.assertEqual(owner_row.adjustment, Decimal("0"))
+        self.assertEqual(self._ledger(self.coach).adjustment, Decimal("0"))
+        call_command("rebuild_revenue_ledger", "--verify", stdout=StringIO())
+
+    def test_dashboard_is_cached_with_etag_until_data_changes(self):
+        self.client_api.force_authenticate(user=self.owner)
+        first = self.client_api.get("/api/dashboard/stats/")
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            cached = self.client_api.get("/api/dashboard/stats/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        self.adult_sub.sessions_used = 3
+        self.adult_sub.save()
+        changed = self.client_api.get("/api/dashboard/stats/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_rebuild_restores_missing_rows(self):
+        TrainerRevenueLedger.objects.all().delete()
+        call_command("rebuild_revenue_ledger", stdout=StringIO())
+        self.assertEqual(self._ledger(self.owner).base_revenue, Decimal("2000"))
+
+    def test_backfill_fills_missing_charge_snapshot(self):
+        self.client_api.force_authenticate(user=self.coach)
+        self.client_api.post("/api/group-training/complete_session/", {
+            "day_name": "Monday",
+            "participants": [{"client_id": self.child.id}],
+        }, format="json")
+        GroupSessionParticipant.objects.update(
+            subscription=None, owner_trainer=None, session_value=None
+        )
+        # An expired subscription is still found through its date window.
+        ClientSubscription.objects.filter(pk=self.child_sub.pk).update(is_active=False)
+
+        call_command("backfill_group_participants", stdout=StringIO())
+        participant = GroupSessionParticipant.objects.get(client=self.child)
+        self.assertEqual(participant.subscription_id, self.child_sub.id)
+        self.assertEqual(participant.owner_trainer_id, self.owner.id)
+
+
+class GroupSessionBulkCompletionTest(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.coach = User.objects.create_user(username="coach", password="password")
+        self.client_api.force_authenticate(user=self.coach)
+        self.plan = Subscription.objects.create(name="Kids 2", units=2, duration_days=30, price=200)
+
+    def _child(self, n, sessions_used=0, subscribed=True):
+        child = Client.objects.create(name=f"Child {n}", manual_id=f"K{n}", is_child=True)
+        sub = None
+        if subscribed:
+            sub = ClientSubscription.objects.create(
+                client=child, plan=self.plan, trainer=self.coach, sessions_used=sessions_used
+            )
+        return child, sub
+
+    def test_complete_session_uses_fixed_number_of_queries(self):
+        children = [self._child(i)[0] for i in range(30)]
+        payload = {
+            "day_name": "Sunday",
+            "participants": [{"client_id": c.id} for c in children],
+        }
+        with self.assertNumQueries(10):
+            response = self.client_api.post(
+                "/api/group-training/complete_session/", payload, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            set(ClientSubscription.objects.values_list("sessions_used", flat=True)), {1}
+        )
+
+    def test_complete_session_keeps_deduction_semantics(self):
+        last_session, last_sub = self._child(1, sessions_used=1)
+        unsubscribed, _ = self._child(2, subscribed=False)
+
+        response = self.client_api.post("/api/group-training/complete_session/", {
+            "day_name": "Sunday",
+            "participants": [
+                {"client_id": last_session.id, "note": "Great"},
+                {"client_id": unsubscribed.id},
+            ],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        last_sub.refresh_from_db()
+        self.assertEqual(last_sub.sessions_used, 2)
+        self.assertFalse(last_sub.is_active)
+
+        skipped = GroupSessionParticipant.objects.get(client=unsubscribed)
+        self.assertTrue(skipped.deducted)
+        self.assertIsNone(skipped.subscription_id)
+        self.assertEqual(
+            GroupSessionParticipant.objects.get(client=last_session).note, "Great"
+        )
+
+    def test_group_adjustments_match_the_legacy_query(self):
+        owner = User.objects.create_user(username="owner", password="password")
+        other = User.objects.create_user(username="other", password="password")
+        plan = Subscription.objects.create(name="Kids 10", units=10, duration_days=30, price=1000)
+        today = timezone.localdate()
+
+        def child(n, *subscriptions):
+            client = Client.objects.create(name=f"Child {n}", manual_id=f"L{n}", is_child=True)
+            for trainer, start_date, is_active in subscriptions:
+                ClientSubscription.objects.create(
+                    client=client, plan=plan, trainer=trainer, start_date=start_date, is_active=is_active,
+                )
+            return client
+
+        own = child(1, (self.coach, today, True))                     # The coach owns the subscription.
+        lapsed = child(2, (owner, today - timedelta(days=40), False))  # No active subscription.
+        unsubscribed = child(3)
+        double = child(4, (owner, today - timedelta(days=10), True), (other, today, True))
+        single = child(5, (owner, today, True))
+
+        self.client_api.post("/api/group-training/complete_session/", {
+            "day_name": "Sunday", "participants": [{"client_id": c.id} for c in (own, lapsed, unsubscribed, double)],
+        }, format="json")
+        log = GroupSessionLog.objects.create(coach=self.coach, day_name="Monday")
+        for client in (single, double):
+            GroupSessionParticipant.objects.create(session=log, client=client, deducted=True)
+        # Deducted before the charge snapshot existed: filled by migration 0018.
+        GroupSessionParticipant.objects.bulk_create([
+            GroupSessionParticipant(session=log, client=child(6, (owner, today, True)), deducted=True),
+        ])
+        import_module("clients.migrations.0018_backfill_participant_snapshot").backfill_snapshot(apps, None)
+
+        adjustments = _compute_group_adjustments(today.month, today.year)
+        self.assertEqual(adjustments, {self.coach.id: Decimal(400), owner.id: Decimal(-200), other.id: Decimal(-200)})
+        self.assertEqual(
+            {k: v.quantize(Decimal("0.01")) for k, v in adjustments.items()},
+            {k: v.quantize(Decimal("0.01")) for k, v in _legacy_group_adjustments(today.month, today.year).items()},
+        )
+
+    def test_exercise_history_reads_normalized_results(self):
+        child, _ = self._child(1)
+        for weight in ("40", "45"):
+            response = self.client_api.post("/api/group-training/complete_session/", {
+                "day_name": "Sunday",
+                "exercises_summary": [{
+                    "name": "Squat", "type": "strength", "sets_count": 3,
+                    "results": [{"client_id": child.id, "val1": "10", "val2": weight}],
+                }],
+                "participants": [{"client_id": child.id}],
+            }, format="json")
+            self.assertEqual(response.status_code, 201)
+
+        def latest():
+            response = self.client_api.post("/api/group-training/bulk_exercise_history/", {
+                "day_name": "Sunday", "exercise_names": ["squat"], "client_ids": [child.id],
+            }, format="json")
+            return response.data[str(child.id)]["squat"]
+
+        with self.assertNumQueries(1):
+            found = latest()
+        self.assertEqual((found["category"], found["val2"], found["val3"]), ("weight", "45", ""))
+
+        response = self.client_api.get(f"/api/group-training/child_history/?client_id={child.id}")
+        performance = [s["performance"][0]["val2"] for s in response.data["results"]]
+        self.assertEqual(performance, ["45", "40"])
+
+        newest = GroupSessionLog.objects.latest("id")
+        self.client_api.delete(f"/api/group-training/{newest.id}/")
+        self.assertEqual(latest()["val2"], "40")
+
+
+class RoleResolutionTest(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.rec = User.objects.create_user(username="desk", password="password")
+        self.rec.groups.add(Group.objects.create(name="REC"))
+        self.trainer = User.objects.create_user(username="coach", password="password")
+        plan = Subscription.objects.create(name="Plan", units=8, duration_days=30, price=800)
+        ClientSubscription.objects.create(
+            client=Client.objects.create(name="A", manual_id="R1"), plan=plan, trainer=self.trainer
+        )
+
+    def _login(self, username):
+        tokens = self.client_api.post(
+            "/api/auth/login/", {"username": username, "password": "password"}, format="json"
+        ).data
+        self.client_api.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        return tokens
+
+    def test_role_is_read_from_token_claim(self):
+        self._login("desk")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_api.get("/api/client-subscriptions/")
+        self.assertEqual(response.data["count"], 1)
+        self.assertFalse(any("auth_user_groups" in q["sql"] for q in queries.captured_queries))
+
+        self._login("coach")
+        response = self.client_api.post("/api/group-training/", {"day_name": "Sunday"}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_claims_user_skips_user_fetch_until_revoked(self):
+        tokens = self._login("coach")
+        self.client_api.get("/api/dashboard/stats/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_api.get("/api/dashboard/stats/")
+        self.assertEqual(response.data["summary"]["active_clients"], 1)
+        self.assertEqual(len(queries), 1)  # Only the denylist check.
+        self.assertIn("clients_tokenrevocation", queries[0]["sql"])
+
+        # Revoked within the same second the token was issued; the denylist is
+        # in the database, so clearing the (per-process) cache changes nothing.
+        self.trainer.groups.add(Group.objects.get(name="REC"))
+        cache.clear()
+        self.assertEqual(self.client_api.get("/api/dashboard/stats/").status_code, 401)
+        response = self.client_api.post("/api/auth/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_clearing_a_group_revokes_its_members(self):
+        self._login("desk")
+        self.assertEqual(self.client_api.get("/api/client-subscriptions/").status_code, 200)
+        Group.objects.get(name="REC").user_set.clear()
+        self.assertEqual(self.client_api.get("/api/client-subscriptions/").status_code, 401)
@@ -3,7 +3,7 @@ views/__init__.py — re-exports every ViewSet and view so that urls.py
 can import from `clients.views` directly.
 """
 
-from .utils import StandardResultsSetPagination, HistoryPagination
+from .utils import StandardResultsSetPagination, HistoryPagination, TrainingHistoryCursorPagination
 
 from .auth import LoginRateThrottle, MyTokenObtainPairSerializer, MyTokenObtainPairView, CurrentUserView
 
@@ -40,7 +40,7 @@ from .manual_saves import ManualNutritionSaveViewSet, ManualWorkoutSaveViewSet
 from .admin_oversight import AdminTrainerOversightViewSet
 
 __all__ = [
-    'StandardResultsSetPagination', 'HistoryPagination',
+    'StandardResultsSetPagination', 'HistoryPagination', 'TrainingHistoryCursorPagination',
     'LoginRateThrottle', 'MyTokenObtainPairSerializer',
     'MyTokenObtainPairView', 'CurrentUserView',
     'ClientViewSet', 'ManageTrainersViewSet',
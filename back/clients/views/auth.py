@@ -2,9 +2,14 @@ from rest_framework import permissions
 from rest_framework.response import Response
 from rest_framework.throttling import AnonRateThrottle
 from rest_framework.views import APIView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from ..authentication import ISSUED_MS_CLAIM, is_revoked
+from ..roles import REC_GROUP
+
 
 class LoginRateThrottle(AnonRateThrottle):
     """
@@ -23,13 +28,26 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
+        token[ISSUED_MS_CLAIM] = int(token.current_time.timestamp() * 1000)
         token["username"] = user.username
         token["first_name"] = user.first_name
         token["is_superuser"] = user.is_superuser
-        token["is_receptionist"] = user.groups.filter(name="REC").exists()
+        token["is_receptionist"] = user.groups.filter(name=REC_GROUP).exists()
         return token
 
 
+class DenylistTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses to mint access tokens from a revoked refresh token; otherwise a
+    revoked user would get fresh tokens carrying their old claims.
+    Wired in through SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'].
+    """
+    def validate(self, attrs):
+        if is_revoked(RefreshToken(attrs["refresh"])):
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        return super().validate(attrs)
+
+
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
     throttle_classes = [LoginRateThrottle]
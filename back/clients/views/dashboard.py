@@ -1,29 +1,38 @@
 import calendar
-from decimal import Decimal
 
 from django.contrib.auth.models import User
-from django.db.models import (
-    Sum, Count, Q, F, Case, When, DecimalField, ExpressionWrapper,
-)
+from django.db.models import Sum, Count, Q
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
 
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from ..models import ClientSubscription, TrainingSession, GroupSessionParticipant, TrainerShift, TrainerSchedule
-from .utils import _build_client_dict, _compute_group_adjustments
+from ..authentication import ClaimsJWTAuthentication
+from ..cache import (
+    dashboard_cache_key, dashboard_generation, etag_matches,
+    get_cached_dashboard, set_cached_dashboard,
+)
+from ..models import ClientSubscription, TrainerRevenueLedger, TrainerShift, TrainerSchedule
+from ..roles import ROLE_REC, ROLE_TRAINER, get_role
+from .utils import _build_client_dict
 
 
 class DashboardAnalyticsViewSet(viewsets.ViewSet):
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     @action(detail=False, methods=["get"])
     def stats(self, request):
+        """
+        Role-specific dashboard figures. Responses are cached per (role, user,
+        month, year) until the underlying data changes and carry a strong
+        ETag; a matching If-None-Match is answered with 304 Not Modified.
+        """
         user = request.user
         now = timezone.now()
-        is_rec = user.groups.filter(name="REC").exists()
+        role = get_role(request)
 
         try:
             month = int(request.query_params.get("month", now.month))
@@ -31,45 +40,32 @@ class DashboardAnalyticsViewSet(viewsets.ViewSet):
         except (ValueError, TypeError):
             month, year = now.month, now.year
 
-        # ── VIEW 1: TRAINER ───────────────────────────────────────────────
-        if not user.is_superuser and not is_rec:
-            base_revenue = ClientSubscription.objects.filter(
-                trainer=user, created_at__month=month, created_at__year=year
-            ).aggregate(total=Sum("plan__price"))["total"] or Decimal(0)
-
-            _session_value_expr = ExpressionWrapper(
-                F("subscription__plan__price") / F("subscription__plan__units"),
-                output_field=DecimalField(max_digits=12, decimal_places=4),
-            )
-
-            deduction_amount = TrainingSession.objects.filter(
-                subscription__trainer=user,
-                is_completed=True,
-                date_completed__month=month,
-                date_completed__year=year,
-                subscription__plan__units__gt=0,
-            ).exclude(completed_by=user).exclude(completed_by=None).annotate(
-                session_value=_session_value_expr
-            ).aggregate(total=Sum("session_value"))["total"] or Decimal(0)
-
-            addition_amount = TrainingSession.objects.filter(
-                completed_by=user,
-                is_completed=True,
-                date_completed__month=month,
-                date_completed__year=year,
-                subscription__plan__units__gt=0,
-            ).exclude(subscription__trainer=user).annotate(
-                session_value=_session_value_expr
-            ).aggregate(total=Sum("session_value"))["total"] or Decimal(0)
+        key = dashboard_cache_key(
+            dashboard_generation(), role, user.id, month, year, request.get_host()
+        )
+        cached = get_cached_dashboard(key)
+        if cached is None:
+            data = self._build_stats(request, user, role, month, year)
+            etag = set_cached_dashboard(key, data)
+        else:
+            etag, data = cached
 
-            group_adj = _compute_group_adjustments(month, year)
-            my_group_adj = group_adj.get(user.id, Decimal(0))
-            if my_group_adj > 0:
-                addition_amount += my_group_adj
-            else:
-                deduction_amount += abs(my_group_adj)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
 
-            net_revenue = base_revenue - deduction_amount + addition_amount
+    def _build_stats(self, request, user, role, month, year) -> dict:
+        # ── VIEW 1: TRAINER ───────────────────────────────────────────────
+        if role == ROLE_TRAINER:
+            ledger = (
+                TrainerRevenueLedger.objects.filter(trainer=user, year=year, month=month).first()
+                or TrainerRevenueLedger(trainer=user, year=year, month=month)
+            )
+            base_revenue = ledger.base_revenue
+            deduction_amount = ledger.deductions
+            addition_amount = ledger.additions
+            net_revenue = ledger.net_revenue
 
             subs = ClientSubscription.objects.filter(
                 trainer=user, is_active=True
@@ -77,7 +73,7 @@ class DashboardAnalyticsViewSet(viewsets.ViewSet):
 
             client_list = [_build_client_dict(sub, request) for sub in subs]
 
-            return Response({
+            return {
                 "role": "trainer",
                 "summary": {
                     "active_clients": len(client_list),
@@ -87,10 +83,10 @@ class DashboardAnalyticsViewSet(viewsets.ViewSet):
                     "additions": round(addition_amount, 2),
                 },
                 "clients": client_list,
-            })
+            }
 
         # ── VIEW 2: RECEPTIONIST ──────────────────────────────────────────
-        elif is_rec:
+        elif role == ROLE_REC:
             trainers = (
                 User.objects.filter(is_superuser=False)
                 .exclude(groups__name="REC")
@@ -137,10 +133,10 @@ class DashboardAnalyticsViewSet(viewsets.ViewSet):
                     "active_clients": active_count_map.get(trainer.id, 0),
                 })
 
-            return Response({
+            return {
                 "role": "rec",
                 "trainers": trainers_data,
-            })
+            }
 
         # ── VIEW 3: ADMIN ─────────────────────────────────────────────────
         else:
@@ -157,81 +153,26 @@ class DashboardAnalyticsViewSet(viewsets.ViewSet):
                         filter=Q(clientsubscription__is_active=False),
                     ),
                     total_assigned=Count("clientsubscription"),
-                    base_monthly_revenue=Sum(
-                        Case(
-                            When(
-                                clientsubscription__created_at__month=month,
-                                clientsubscription__created_at__year=year,
-                                then=F("clientsubscription__plan__price"),
-                            ),
-                            default=0,
-                            output_field=DecimalField(),
-                        )
-                    ),
                 )
             )
 
-            cross_session_value_expr = ExpressionWrapper(
-                F("subscription__plan__price") / F("subscription__plan__units"),
-                output_field=DecimalField(max_digits=12, decimal_places=4),
-            )
-
-            cross_base_qs = (
-                TrainingSession.objects.filter(
-                    date_completed__month=month,
-                    date_completed__year=year,
-                    is_completed=True,
-                    subscription__plan__units__gt=0,
-                )
-                .exclude(completed_by=F("subscription__trainer"))
-                .exclude(completed_by=None)
-                .exclude(subscription__trainer=None)
-            )
-
-            deductions_qs = (
-                cross_base_qs.annotate(session_value=cross_session_value_expr)
-                .values("subscription__trainer")
-                .annotate(total=Sum("session_value"))
-                .values_list("subscription__trainer", "total")
-            )
-
-            additions_qs = (
-                cross_base_qs.annotate(session_value=cross_session_value_expr)
-                .values("completed_by")
-                .annotate(total=Sum("session_value"))
-                .values_list("completed_by", "total")
-            )
-
-            adjustments: dict = {}
-            for trainer_id, total_lost in deductions_qs:
-                if trainer_id is not None:
-                    adjustments[trainer_id] = (
-                        adjustments.get(trainer_id, Decimal(0)) - (total_lost or Decimal(0))
-                    )
-            for trainer_id, total_gained in additions_qs:
-                if trainer_id is not None:
-                    adjustments[trainer_id] = (
-                        adjustments.get(trainer_id, Decimal(0)) + (total_gained or Decimal(0))
-                    )
-
-            group_adj = _compute_group_adjustments(month, year)
-            for trainer_id, amount in group_adj.items():
-                adjustments[trainer_id] = adjustments.get(trainer_id, Decimal(0)) + amount
+            ledger_map = {
+                row.trainer_id: row
+                for row in TrainerRevenueLedger.objects.filter(year=year, month=month)
+            }
 
             trainers_stats = []
             for trainer in trainers:
-                base = trainer.base_monthly_revenue or Decimal(0)
-                adjustment = adjustments.get(trainer.id, Decimal(0))
-                net = base + adjustment
+                ledger = ledger_map.get(trainer.id) or TrainerRevenueLedger()
                 trainers_stats.append({
                     "id": trainer.id,
                     "name": trainer.first_name or trainer.username,
                     "active_packages": trainer.active_packages,
                     "inactive_packages": trainer.inactive_packages,
                     "total_assigned": trainer.total_assigned,
-                    "base_revenue": round(base, 2),
-                    "adjustments": round(adjustment, 2),
-                    "net_revenue": round(net, 2),
+                    "base_revenue": round(ledger.base_revenue, 2),
+                    "adjustments": round(ledger.adjustment, 2),
+                    "net_revenue": round(ledger.net_revenue, 2),
                 })
 
             current_month_qs = ClientSubscription.objects.filter(
@@ -256,7 +197,7 @@ class DashboardAnalyticsViewSet(viewsets.ViewSet):
                 for i in range(1, 13)
             ]
 
-            return Response({
+            return {
                 "role": "admin",
                 "trainers_overview": trainers_stats,
                 "financials": {
@@ -266,4 +207,4 @@ class DashboardAnalyticsViewSet(viewsets.ViewSet):
                     "total_revenue": total_revenue_sales,
                     "chart_data": formatted_chart,
                 },
-            })
+            }
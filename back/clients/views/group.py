@@ -1,5 +1,3 @@
-import json
-
 from django.db import transaction
 
 from rest_framework import viewsets, permissions, status
@@ -7,20 +5,23 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 
+from ..authentication import ClaimsJWTAuthentication
 from ..models import (
     CoachSchedule, GroupSessionLog, GroupSessionParticipant,
-    GroupWorkoutTemplate,
+    GroupExerciseResult, GroupLatestExerciseResult, GroupWorkoutTemplate,
 )
+from ..roles import is_admin_or_receptionist, is_receptionist
 from ..serializers import (
     CoachScheduleSerializer,
     GroupSessionLogSerializer,
     GroupWorkoutTemplateSerializer,
 )
-from .utils import HistoryPagination, _legacy_type_to_category
+from .utils import HistoryPagination
 
 
 class CoachScheduleViewSet(viewsets.ModelViewSet):
     serializer_class = CoachScheduleSerializer
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -28,7 +29,7 @@ class CoachScheduleViewSet(viewsets.ModelViewSet):
         if trainer_id:
             return CoachSchedule.objects.filter(coach_id=trainer_id).select_related("client")
         user = self.request.user
-        if user.is_superuser or user.groups.filter(name="REC").exists():
+        if is_admin_or_receptionist(self.request):
             return CoachSchedule.objects.all().select_related("client")
         return CoachSchedule.objects.filter(coach=user).select_related("client")
 
@@ -53,10 +54,22 @@ class GroupTrainingViewSet(viewsets.ModelViewSet):
         )
 
     def perform_create(self, serializer):
-        if self.request.user.groups.filter(name="REC").exists():
+        if is_receptionist(self.request):
             raise PermissionDenied("Receptionists cannot log group training sessions.")
         serializer.save(coach=self.request.user)
 
+    def perform_update(self, serializer):
+        session = serializer.save()
+        if {"exercises_summary", "date", "day_name"} & serializer.validated_data.keys():
+            GroupExerciseResult.rebuild_for_session(session)
+
+    def perform_destroy(self, instance):
+        client_ids = set(instance.exercise_results.values_list("client_id", flat=True))
+        with transaction.atomic():
+            instance.delete()
+            if client_ids:
+                GroupLatestExerciseResult.rebuild(client_ids, {instance.day_name})
+
     @action(
         detail=False,
         methods=["get"],
@@ -73,56 +86,38 @@ class GroupTrainingViewSet(viewsets.ModelViewSet):
 
         participations = (
             GroupSessionParticipant.objects.filter(client_id=client_id)
-            .select_related("session__coach", "client")
-            .prefetch_related("session__participants__client")
+            .select_related("session__coach")
             .order_by("-session__date")
         )
 
         page = paginator.paginate_queryset(participations, request)
-        history_data = []
         items = page if page is not None else participations
 
+        performance_by_session: dict = {}
+        for row in GroupExerciseResult.objects.filter(
+            client_id=client_id,
+            session_id__in=[p.session_id for p in items],
+        ).order_by("exercise_order"):
+            performance_by_session.setdefault(row.session_id, []).append({
+                "exercise": row.exercise_name,
+                "category": row.category,
+                "sets_count": row.sets_count,
+                "val1": "-" if row.val1 is None else row.val1,
+                "val2": "-" if row.val2 is None else row.val2,
+                "val3": "-" if row.val3 is None else row.val3,
+                "note": row.note,
+            })
+
+        history_data = []
         for p in items:
             session = p.session
-            client_name = p.client.name if p.client else ""
-            client_id_str = str(client_id)
-            child_performance = []
-
-            exercises_data = session.exercises_summary
-            if isinstance(exercises_data, str):
-                try:
-                    exercises_data = json.loads(exercises_data)
-                except Exception:
-                    exercises_data = []
-
-            for ex in exercises_data if isinstance(exercises_data, list) else []:
-                results = ex.get("results", [])
-                user_res = next(
-                    (
-                        r for r in results
-                        if r.get("client") == client_name
-                        or str(r.get("client_id")) == client_id_str
-                    ),
-                    None,
-                )
-                if user_res:
-                    child_performance.append({
-                        "exercise": ex.get("name", "Unknown"),
-                        "category": ex.get("category") or _legacy_type_to_category(ex.get("type", "")),
-                        "sets_count": ex.get("sets_count", 0),
-                        "val1": user_res.get("val1", "-"),
-                        "val2": user_res.get("val2", "-"),
-                        "val3": user_res.get("val3", "-"),
-                        "note": user_res.get("note", ""),
-                    })
-
             history_data.append({
                 "id": session.id,
                 "date": session.date,
                 "day_name": session.day_name,
                 "coach": session.coach.first_name if session.coach else "Unknown",
                 "session_note": p.note,
-                "performance": child_performance,
+                "performance": performance_by_session.get(session.id, []),
             })
 
         if page is not None:
@@ -150,69 +145,31 @@ class GroupTrainingViewSet(viewsets.ModelViewSet):
             return Response({})
 
         requested_names_map = {str(n).strip().lower(): str(n).strip() for n in exercise_names}
-        ex_name_set = set(requested_names_map.keys())
-
-        participations = (
-            GroupSessionParticipant.objects.filter(
-                client_id__in=client_ids, session__day_name=day_name
-            )
-            .select_related("session", "client")
-            .order_by("-session__date")
-        )
 
         result = {
             str(cid): {ename: None for ename in exercise_names} for cid in client_ids
         }
-        resolved = {str(cid): set() for cid in client_ids}
-
-        for p in participations:
-            client_id_str = str(p.client_id)
-            client_name = p.client.name if p.client else ""
-
-            if len(resolved.get(client_id_str, set())) == len(exercise_names):
-                continue
-
-            exercises_data = p.session.exercises_summary
-            if isinstance(exercises_data, str):
-                try:
-                    exercises_data = json.loads(exercises_data)
-                except Exception:
-                    exercises_data = []
-
-            for ex in exercises_data if isinstance(exercises_data, list) else []:
-                ex_name_db = str(ex.get("name", "")).strip()
-                ex_name_lower = ex_name_db.lower()
-
-                if ex_name_lower not in ex_name_set:
-                    continue
-
-                original_requested_name = requested_names_map[ex_name_lower]
-
-                if original_requested_name in resolved.get(client_id_str, set()):
-                    continue
-
-                results = (
-                    ex.get("results", []) if isinstance(ex.get("results"), list) else []
-                )
-                user_res = next(
-                    (
-                        r for r in results
-                        if r.get("client") == client_name
-                        or str(r.get("client_id")) == client_id_str
-                    ),
-                    None,
-                )
-                if user_res:
-                    result[client_id_str][original_requested_name] = {
-                        "found": True,
-                        "category": ex.get("category") or _legacy_type_to_category(ex.get("type", "")),
-                        "sets_count": int(ex.get("sets_count") or 0),
-                        "val1": str(user_res.get("val1", "")),
-                        "val2": str(user_res.get("val2", "")),
-                        "val3": str(user_res.get("val3", "")),
-                        "note": str(user_res.get("note", "")),
-                    }
-                    resolved.setdefault(client_id_str, set()).add(original_requested_name)
+
+        latest = (
+            GroupLatestExerciseResult.objects.filter(
+                client_id__in=client_ids,
+                day_name=day_name,
+                exercise_key__in=requested_names_map.keys(),
+            )
+            .select_related("result")
+        )
+        for pointer in latest:
+            row = pointer.result
+            original_requested_name = requested_names_map[pointer.exercise_key]
+            result.setdefault(str(pointer.client_id), {})[original_requested_name] = {
+                "found": True,
+                "category": row.category,
+                "sets_count": row.sets_count,
+                "val1": row.val1 or "",
+                "val2": row.val2 or "",
+                "val3": row.val3 or "",
+                "note": row.note,
+            }
 
         for cid_str in result:
             for ename in result[cid_str]:
@@ -231,9 +188,9 @@ class GroupTrainingViewSet(viewsets.ModelViewSet):
         """
         Atomically creates a GroupSessionLog and all associated
         GroupSessionParticipant records in a single transaction.
-        Setting deducted=True on each participant triggers the model's save()
-        hook which atomically increments sessions_used on the client's active
-        subscription and auto-deactivates if the plan limit is reached.
+        GroupSessionParticipant.bulk_deduct() charges every child's active
+        subscription and auto-deactivates it when the plan limit is reached,
+        using a fixed number of queries however many children attended.
         """
         day_name = request.data.get("day_name", "")
         exercises_summary = request.data.get("exercises_summary", [])
@@ -251,16 +208,12 @@ class GroupTrainingViewSet(viewsets.ModelViewSet):
                 day_name=day_name,
                 exercises_summary=exercises_summary,
             )
-            for p in participants_data:
-                client_id = p.get("client_id")
-                if not client_id:
-                    continue
-                GroupSessionParticipant.objects.create(
-                    session=session,
-                    client_id=client_id,
-                    note=p.get("note", "Completed"),
-                    deducted=True,
-                )
+            GroupSessionParticipant.bulk_deduct(session, [
+                (p.get("client_id"), p.get("note", "Completed"))
+                for p in participants_data
+                if p.get("client_id")
+            ])
+            GroupExerciseResult.rebuild_for_session(session, fresh=True)
 
         return Response(
             {"status": "success", "session_id": session.id},
@@ -1,15 +1,49 @@
+import math
+
 from rest_framework import viewsets, permissions, filters
+from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, When
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
 
+from .. import food_catalog
+from ..cache import etag_matches
+from ..food_search import food_index
+from ..meal_generator import MealPlanGenerator
+from ..nutrient_matrix import nutrient_matrix
+from ..pdf_export import nutrition_plan_document
 from ..models import NutritionPlan, MealPlan, FoodItem, NutritionProgress, FoodDatabase
 from ..serializers import (
     NutritionPlanSerializer,
     NutritionPlanCreateSerializer,
+    MealPlanGenerateSerializer,
     MealPlanSerializer,
     FoodItemSerializer,
     NutritionProgressSerializer,
     FoodDatabaseSerializer,
 )
+from .utils import _pdf_response
+
+
+def _list(value):
+    """`value` when it is a list (None → []); raises TypeError otherwise."""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise TypeError("Expected a list.")
+    return value
+
+
+def _grams(value):
+    """A finite, non-negative gram amount (None → 0); raises ValueError otherwise."""
+    grams = float(value or 0)
+    if not math.isfinite(grams) or grams < 0:
+        raise ValueError("Invalid amount.")
+    return grams
 
 
 class FoodDatabasePagination(PageNumberPagination):
@@ -46,6 +80,84 @@ class NutritionPlanViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    @action(detail=True, methods=["get"])
+    def totals(self, request, pk=None):
+        """
+        GET /nutrition-plans/<id>/totals/
+
+        Per-day macro totals (summed from the server-maintained meal totals)
+        against the plan targets, plus the plan-wide daily average, without
+        sending any meal or food rows.
+        """
+        plan = NutritionPlan.objects.filter(pk=pk).only(
+            'id', 'target_calories', 'target_protein', 'target_carbs', 'target_fats'
+        ).first()
+        if plan is None:
+            return Response({"error": "Nutrition plan not found."}, status=404)
+
+        targets = {
+            "calories": plan.target_calories,
+            "protein": plan.target_protein,
+            "carbs": plan.target_carbs,
+            "fats": plan.target_fats,
+        }
+        days = plan.day_totals()
+        for day in days:
+            for macro, target in targets.items():
+                day[macro] = round(day[macro] or 0, 1)
+                day[f"{macro}_diff"] = round(day[macro] - target, 1)
+                day[f"{macro}_percent"] = round(day[macro] * 100 / target) if target else None
+
+        average = {
+            macro: round(sum(day[macro] for day in days) / len(days), 1) if days else 0
+            for macro in targets
+        }
+        return Response({"plan": plan.id, "targets": targets, "average": average, "days": days})
+
+    @action(detail=True, methods=["post"])
+    def generate(self, request, pk=None):
+        """
+        POST /nutrition-plans/<id>/generate/
+        {"days"?, "meal_types"?, "categories"?, "meal_categories"?, "exclude_foods"?,
+         "exclude_categories"?, "tolerance"?, "seed"?, "save"?: true}
+
+        Builds every day's meals from the food database to hit the plan's
+        macro targets (see meal_generator.py) and, unless "save" is false,
+        replaces the plan's meals with them. Returns the generated meals and
+        a per-day report. Options are checked by MealPlanGenerateSerializer
+        (at most 366 days).
+        """
+        plan = get_object_or_404(NutritionPlan, pk=pk)
+        payload = MealPlanGenerateSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        options = dict(payload.validated_data)
+        saved = options.pop("save")
+        try:
+            meal_plans, report = MealPlanGenerator(plan, **options).generate()
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+        if saved:
+            with transaction.atomic():
+                plan.save(update_fields=["updated_at"])
+                plan.sync_meal_plans(meal_plans)
+        return Response({"plan": plan.id, "saved": saved, **report, "meal_plans": meal_plans})
+
+    @action(detail=True, methods=["get"])
+    def pdf(self, request, pk=None):
+        """
+        GET /nutrition-plans/<id>/pdf/?lang=en|ar
+
+        The plan (targets, every day's meals and foods, notes, pdf_brand_text)
+        rendered server-side, right to left for ?lang=ar; see
+        views.utils._pdf_response for caching and the 202 while rendering.
+        """
+        plan = get_object_or_404(
+            NutritionPlan.objects.select_related("subscription__client", "created_by"), pk=pk
+        )
+        document = nutrition_plan_document(plan, request.query_params.get("lang", "en"))
+        return _pdf_response(request, document, f"nutrition-plan-{plan.pk}")
+
 
 class MealPlanViewSet(viewsets.ModelViewSet):
     serializer_class = MealPlanSerializer
@@ -70,6 +182,21 @@ class FoodItemViewSet(viewsets.ModelViewSet):
             return FoodItem.objects.filter(meal_plan_id=meal_plan_id)
         return FoodItem.objects.all()
 
+    # Keep the owning meal's totals in step with single-food edits.
+    def perform_create(self, serializer):
+        food = serializer.save()
+        MealPlan.recompute_totals([food.meal_plan_id])
+
+    def perform_update(self, serializer):
+        previous_meal_id = serializer.instance.meal_plan_id
+        food = serializer.save()
+        MealPlan.recompute_totals({previous_meal_id, food.meal_plan_id})
+
+    def perform_destroy(self, instance):
+        meal_plan_id = instance.meal_plan_id
+        instance.delete()
+        MealPlan.recompute_totals([meal_plan_id])
+
 
 class NutritionProgressViewSet(viewsets.ModelViewSet):
     serializer_class = NutritionProgressSerializer
@@ -82,10 +209,32 @@ class NutritionProgressViewSet(viewsets.ModelViewSet):
         return NutritionProgress.objects.all()
 
 
+class FoodIndexSearchFilter(filters.SearchFilter):
+    """
+    ?search= answered from the in-process food index (name / Arabic name /
+    category, normalized, typo-tolerant) in relevance order instead of
+    icontains scans.
+    """
+    max_results = 500
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset  # get_queryset() already applies ?category=.
+        # Filtered inside the index, so the top max_results are all in the category.
+        category = request.query_params.get("category")
+        ids = [food["id"] for food in food_index().search(
+            query, limit=self.max_results, category=category if category and category != "All" else None,
+        )]
+        return queryset.filter(pk__in=ids).order_by(
+            Case(*[When(pk=pk, then=rank) for rank, pk in enumerate(ids)], output_field=IntegerField())
+        )
+
+
 class FoodDatabaseViewSet(viewsets.ModelViewSet):
     serializer_class = FoodDatabaseSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FoodIndexSearchFilter]
     search_fields = ["name", "arabic_name", "category"]
     pagination_class = FoodDatabasePagination
 
@@ -98,3 +247,103 @@ class FoodDatabaseViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """
+        GET /food-database/autocomplete/?q=<text>[&category=<name>][&limit=20]
+
+        Ranked matches with their macros straight from the in-process index,
+        without a database query; meant for the food picker's keystrokes.
+        """
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+        except (TypeError, ValueError):
+            limit = 20
+        category = request.query_params.get("category")
+        results = food_index().search(
+            request.query_params.get("q", ""), limit=limit,
+            category=category if category and category != "All" else None,
+        )
+        return Response({"results": results})
+
+    @action(detail=False, methods=["post"])
+    def macros(self, request):
+        """
+        POST /food-database/macros/
+        {"items": [{"food_id" | "name", "grams"}, ...]} or {"meal_plans": [<meal with foods>, ...]}
+
+        Batch macro calculation from the in-process nutrient matrix: per-item
+        values and totals for "items", per-meal and per-day totals for
+        "meal_plans" (foods given by "food_id" or "name" with "amount" in
+        grams). Foods not in the database are listed under "missing".
+        """
+        matrix = nutrient_matrix()
+        if "meal_plans" in request.data:
+            try:
+                meals = [
+                    (int(meal.get("day") or 0), str(meal.get("meal_type") or ""), [
+                        (food.get("food_id") or food.get("name"), _grams(food.get("amount")))
+                        for food in _list(meal.get("foods"))
+                    ])
+                    for meal in _list(request.data["meal_plans"])
+                ]
+            except (AttributeError, TypeError, ValueError):
+                return Response(
+                    {"error": "meal_plans must be a list of {day, meal_type, foods: [{food_id or name, amount}]}."},
+                    status=400,
+                )
+            foods = [food for _, _, items in meals for food, _ in items]
+            return Response({**matrix.meal_plan_totals(meals), "missing": matrix.missing(foods)})
+
+        try:
+            items = [
+                (item.get("food_id") or item.get("name"), _grams(item.get("grams")))
+                for item in _list(request.data.get("items"))
+            ]
+        except (AttributeError, TypeError, ValueError):
+            return Response({"error": "items must be a list of {food_id or name, grams}."}, status=400)
+        return Response({
+            "items": matrix.macros(items),
+            "totals": matrix.totals(items),
+            "missing": matrix.missing([food for food, _ in items]),
+        })
+
+    @action(detail=False, methods=["get"])
+    def catalog(self, request):
+        """
+        GET /food-database/catalog/
+
+        The whole food database as one columnar document, served pre-compressed
+        (brotli or gzip per Accept-Encoding) from the snapshot cache. The ETag is
+        the catalog version; a matching If-None-Match gets 304.
+        """
+        version, bodies = food_catalog.snapshot()
+        etag = f'"{version}"'
+        encoding = food_catalog.pick_encoding(request.headers.get("Accept-Encoding"), bodies)
+        if etag_matches(request, etag):
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(bodies[encoding], content_type="application/json")
+            if encoding != "identity":
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    @action(detail=False, methods=["get"], url_path="catalog/delta")
+    def catalog_delta(self, request):
+        """
+        GET /food-database/catalog/delta/?since=<version>
+
+        Foods changed (columnar, current values) and ids deleted since the
+        catalog version a client holds. 410 when `since` is unknown to this
+        server, in which case the client refetches the full catalog.
+        """
+        since = food_catalog.parse_version(request.query_params.get("since"))
+        if since is None or since < 0:
+            return Response({"error": "since must be a catalog version"}, status=400)
+        if since > food_catalog.current_sequence():
+            return Response({"error": "Unknown catalog version; fetch the full catalog."}, status=410)
+        return Response(food_catalog.delta(since))
@@ -4,6 +4,7 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from ..authentication import ClaimsJWTAuthentication
 from ..models import TrainerShift, TrainerSchedule, ClientSubscription
 from ..serializers import TrainerShiftSerializer, TrainerScheduleSerializer
 from .utils import _build_client_dict
@@ -74,6 +75,7 @@ class TrainerScheduleViewSet(viewsets.ModelViewSet):
     where the linked ClientSubscription is still active.
     """
     serializer_class = TrainerScheduleSerializer
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = None  # Full flat list — a trainer's schedule is small and bounded.
 
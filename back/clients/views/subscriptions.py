@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from ..models import Subscription, ClientSubscription, Country
+from ..roles import is_admin_or_receptionist, is_receptionist
 from ..serializers import (
     SubscriptionSerializer,
     ClientSubscriptionSerializer,
@@ -47,7 +48,7 @@ class ClientSubscriptionViewSet(viewsets.ModelViewSet):
         if client_id:
             queryset = queryset.filter(client=client_id)
         else:
-            if not user.is_superuser and not user.groups.filter(name="REC").exists():
+            if not is_admin_or_receptionist(self.request):
                 queryset = queryset.filter(trainer=user)
 
         return queryset
@@ -70,7 +71,7 @@ class ClientSubscriptionViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         is_admin = user.is_superuser
-        is_rec = user.groups.filter(name='REC').exists()
+        is_rec = is_receptionist(self.request)
 
         if not is_admin and not is_rec:
             if not serializer.validated_data.get('trainer'):
@@ -1,25 +1,38 @@
+from datetime import timedelta
+from decimal import Decimal
+
 import django_filters
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, FloatField, Max, Sum, Value, When
+from django.db.models.functions import Lower, Trim, TruncWeek
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
+from ..cache import content_etag, etag_matches
+from ..pdf_export import training_plan_document, training_session_document
 from ..models import (
     TrainingPlan, TrainingExercise, SessionLog,
-    TrainingSession, SessionExercise, SessionSet, ClientSubscription,
+    TrainingSession, ClientSubscription,
+    ExerciseHistoryEntry, SessionSet,
+    LB_TO_KG, WEIGHT_UNIT_LB,
 )
+from ..roles import is_receptionist
 from ..serializers import (
     TrainingPlanSerializer,
+    CompactTrainingPlanSerializer,
+    TrainingPlanTreeSerializer,
     TrainingExerciseSerializer,
     SessionLogSerializer,
     TrainingSessionSerializer,
     TrainingSessionListSerializer,
 )
+from .utils import TrainingHistoryCursorPagination, _pdf_response
 
 
 class TrainingSessionFilter(django_filters.FilterSet):
@@ -42,6 +55,71 @@ class TrainingPlanViewSet(viewsets.ModelViewSet):
             return base_qs.filter(subscription_id=subscription_id)
         return base_qs
 
+    @action(detail=True, methods=["put"])
+    def tree(self, request, pk=None):
+        """
+        PUT /training-plans/<id>/tree/
+        {"splits": [{"id": <split_id>, "name": "Push", "exercises": [
+            {"id"?: <exercise_id>, "name": ..., "note": ..., "sets": [
+                {"id"?: <set_id>, "reps": ..., "weight": ..., "technique": ..., "equipment": ...}]}]}]}
+
+        Bulk edit of one, several or all splits in a single transaction (see
+        TrainingPlan.sync_splits): only the rows that differ are written.
+        The payload is checked by TrainingPlanTreeSerializer first (400 on
+        bad choices, lengths or nulls).
+        Returns the whole updated plan as GET /training-plans/<id>/ does.
+        """
+        payload = TrainingPlanTreeSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        splits_data = payload.validated_data["splits"]
+
+        with transaction.atomic():
+            plan = get_object_or_404(TrainingPlan.objects.select_for_update(), pk=pk)
+            split_ids = set(plan.splits.values_list("id", flat=True))
+            unknown = [item.get("id") for item in splits_data if item.get("id") not in split_ids]
+            if unknown:
+                raise ValidationError({"splits": f"Not splits of this plan: {unknown}"})
+            plan.sync_splits(splits_data)
+
+        plan = self.get_queryset().get(pk=plan.pk)
+        return Response(self.get_serializer(plan).data)
+
+    @action(detail=False, methods=["get"])
+    def compact(self, request):
+        """
+        GET /training-plans/compact/?subscription_id=<id>
+
+        The subscription's plan in the flattened CompactTrainingPlanSerializer
+        shape, from a fixed four queries whatever the plan size. Carries a
+        content ETag; If-None-Match → 304.
+        """
+        subscription_id = request.query_params.get("subscription_id")
+        if not subscription_id:
+            raise ValidationError({"subscription_id": "subscription_id is required."})
+        plan = TrainingPlan.objects.filter(subscription_id=subscription_id).first()
+        if plan is None:
+            return Response({"error": "No training plan for this subscription."}, status=status.HTTP_404_NOT_FOUND)
+
+        data = CompactTrainingPlanSerializer(plan).data
+        etag = content_etag(data)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(data, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    @action(detail=True, methods=["get"])
+    def pdf(self, request, pk=None):
+        """
+        GET /training-plans/<id>/pdf/?lang=en|ar
+
+        The whole program (every split, exercise and set) rendered server-side;
+        see views.utils._pdf_response for caching and the 202 while rendering.
+        """
+        plan = get_object_or_404(
+            TrainingPlan.objects.select_related("subscription__client", "subscription__trainer"), pk=pk
+        )
+        document = training_plan_document(plan, request.query_params.get("lang", "en"))
+        return _pdf_response(request, document, f"training-plan-{plan.pk}")
+
 
 class TrainingExerciseViewSet(viewsets.ModelViewSet):
     serializer_class = TrainingExerciseSerializer
@@ -65,6 +143,47 @@ class SessionLogViewSet(viewsets.ModelViewSet):
         return SessionLog.objects.all()
 
 
+class SessionVersionConflict(APIException):
+    """409 carrying the session as it is now, so the client can merge and retry."""
+    status_code = status.HTTP_409_CONFLICT
+    default_code = "version_conflict"
+
+    def __init__(self, session_pk):
+        current = (
+            TrainingSession.objects.select_related("completed_by")
+            .prefetch_related("exercises__sets")
+            .get(pk=session_pk)
+        )
+        super().__init__()
+        # Assigned directly: APIException would coerce the serialized values to strings.
+        self.detail = {
+            "error": "This session was changed by someone else. Reload it and try again.",
+            "current": TrainingSessionSerializer(current).data,
+        }
+
+
+def _expected_version(request):
+    """
+    Version the client last saw, from If-Match (ETag form, "3" or W/"3") or
+    a "version" field in the payload; None when the client sent neither,
+    which keeps the locking behaviour for older clients.
+    """
+    raw = request.headers.get("If-Match") or request.data.get("version")
+    if raw in (None, "", "*"):
+        return None
+    raw = str(raw).strip()
+    if raw.startswith("W/"):
+        raw = raw[2:]
+    try:
+        return int(raw.strip('"'))
+    except ValueError:
+        raise ValidationError({"version": "version / If-Match must be an integer."})
+
+
+def _etag(session):
+    return f'"{session.version}"'
+
+
 class TrainingSessionViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
@@ -78,7 +197,7 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         if self.action in ('list',):
-            qs = TrainingSession.objects.all()
+            qs = TrainingSession.objects.select_related('completed_by')
         else:
             qs = (
                 TrainingSession.objects
@@ -105,18 +224,26 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
         return qs
 
     def perform_create(self, serializer):
-        if self.request.user.groups.filter(name="REC").exists():
+        if is_receptionist(self.request):
             raise PermissionDenied("Receptionists cannot create training sessions.")
         serializer.save()
 
     def perform_update(self, serializer):
-        if self.request.user.groups.filter(name="REC").exists():
+        if is_receptionist(self.request):
             raise PermissionDenied("Receptionists cannot modify training sessions.")
 
+        expected = _expected_version(self.request)
         with transaction.atomic():
-            locked_session = TrainingSession.objects.select_for_update().get(
-                pk=serializer.instance.pk
-            )
+            if expected is None:
+                locked_session = TrainingSession.objects.select_for_update().get(
+                    pk=serializer.instance.pk
+                )
+                serializer.instance.version = locked_session.version
+            else:
+                # Conditional write instead of a row lock: fail fast on conflict.
+                locked_session = serializer.instance
+                if locked_session.version != expected:
+                    raise SessionVersionConflict(locked_session.pk)
 
             if locked_session.is_completed and not self.request.user.is_superuser:
                 if locked_session.completed_by != self.request.user:
@@ -125,10 +252,15 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
                     )
 
             if locked_session.is_completed and serializer.validated_data.get('is_completed'):
-                return  # Idempotent — no double deduction
+                return  # Idempotent — no double deduction, and the version stays as the client has it.
+
+            # Claimed only now that a write follows, so no-op requests keep the version.
+            if expected is not None and not TrainingSession.claim_version(locked_session.pk, expected):
+                raise SessionVersionConflict(locked_session.pk)
 
             was_completed = locked_session.is_completed
-            updated = serializer.save()
+            completing = not was_completed and serializer.validated_data.get('is_completed')
+            updated = serializer.save(**({"completed_by": self.request.user} if completing else {}))
 
             if not was_completed and updated.is_completed:
                 ClientSubscription.objects.filter(pk=updated.subscription_id).update(
@@ -141,8 +273,53 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
                     sub.is_active = False
                     sub.save(update_fields=["is_active"])
 
-                updated.completed_by = self.request.user
-                updated.save(update_fields=["completed_by"])
+            if updated.is_completed or was_completed:
+                ExerciseHistoryEntry.rebuild_for_session(updated)
+
+    @action(detail=False, methods=["get"], url_path="grid")
+    def grid(self, request):
+        """
+        GET /training-sessions/grid/?subscription_id=<id>
+
+        Everything ClientTrainingTab's session grid shows, as parallel
+        columns (one entry per session, ordered by session_number), from a
+        single query. Carries a content ETag; If-None-Match → 304.
+        """
+        try:
+            sub_id = int(request.query_params.get("subscription_id"))
+        except (TypeError, ValueError):
+            raise ValidationError({"subscription_id": "An integer subscription_id is required."})
+
+        rows = list(
+            TrainingSession.objects.filter(subscription_id=sub_id)
+            .values_list(
+                "id", "session_number", "name", "is_completed", "date_completed",
+                "completed_by__first_name", "version",
+            )
+            .annotate(
+                exercise_count=Count("exercises", distinct=True),
+                set_count=Count("exercises__sets"),
+            )
+            .order_by("session_number")
+        )
+        columns = list(zip(*rows)) or [()] * 9
+        data = {
+            "subscription": sub_id,
+            "ids": list(columns[0]),
+            "session_numbers": list(columns[1]),
+            "names": list(columns[2]),
+            "is_completed": list(columns[3]),
+            "date_completed": list(columns[4]),
+            "trainer_names": list(columns[5]),
+            "versions": list(columns[6]),
+            "exercise_counts": list(columns[7]),
+            "set_counts": list(columns[8]),
+        }
+
+        etag = content_etag(data)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(data, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
 
     @action(detail=False, methods=["get"], url_path="get-data")
     def get_data(self, request):
@@ -162,7 +339,7 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
             return Response({"name": f"Session {session_num}", "exercises": []})
 
         serializer = self.get_serializer(session)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={"ETag": _etag(session)})
 
     @action(detail=False, methods=["post"], url_path="save-data")
     def save_data(self, request):
@@ -179,9 +356,15 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
             raise ValidationError({"detail": "subscription and session_number must be integers."})
 
         mark_complete = data.get("mark_complete", False)
+        expected = _expected_version(request)
 
         with transaction.atomic():
-            session, created = TrainingSession.objects.select_for_update().get_or_create(
+            # Clients that send the version they loaded skip the row lock; the
+            # conditional claim_version() below rejects stale writes instead.
+            sessions = TrainingSession.objects
+            if expected is None:
+                sessions = sessions.select_for_update()
+            session, created = sessions.get_or_create(
                 subscription_id=sub_id,
                 session_number=session_num,
                 defaults={"name": data.get("name", f"Session {session_num}")},
@@ -194,6 +377,10 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_403_FORBIDDEN,
                     )
 
+            if expected is not None and not created:
+                if session.version != expected or not TrainingSession.claim_version(session.pk, expected):
+                    raise SessionVersionConflict(session.pk)
+
             session.name = data.get("name", session.name)
 
             if mark_complete and not session.is_completed:
@@ -209,37 +396,53 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
                     sub.is_active = False
                     sub.save(update_fields=["is_active"])
 
-            session.save()
+            session.save()  # Books the completion in the revenue ledger.
 
-            session.exercises.all().delete()
-            exercises_data = data.get("exercises", [])
+            exercise_ids = session.sync_exercises(data.get("exercises", []), created=created)
+            if session.is_completed:
+                ExerciseHistoryEntry.rebuild_for_session(session)
 
-            exercises_to_create = [
-                SessionExercise(
-                    training_session=session,
-                    order=ex_idx + 1,
-                    name=ex_data.get("name", ""),
-                    note=ex_data.get("note", ""),
-                )
-                for ex_idx, ex_data in enumerate(exercises_data)
-            ]
-            created_exercises = SessionExercise.objects.bulk_create(exercises_to_create)
-
-            sets_to_create = []
-            for ex_obj, ex_data in zip(created_exercises, exercises_data):
-                for set_idx, set_data in enumerate(ex_data.get("sets", [])):
-                    sets_to_create.append(SessionSet(
-                        exercise=ex_obj,
-                        order=set_idx + 1,
-                        reps=set_data.get("reps", ""),
-                        weight=set_data.get("weight", ""),
-                        technique=set_data.get("technique", "Regular"),
-                        equipment=set_data.get("equipment", ""),
-                    ))
-            if sets_to_create:
-                SessionSet.objects.bulk_create(sets_to_create)
-
-        return Response({"status": "success", "session_id": session.id})
+        return Response(
+            {
+                "status": "success",
+                "session_id": session.id,
+                "version": session.version,
+                "exercises": exercise_ids,
+            },
+            headers={"ETag": _etag(session)},
+        )
+
+    @action(detail=False, methods=["post"])
+    def materialize(self, request):
+        """
+        POST /training-sessions/materialize/
+        {"subscription": <id>, "session_number": <n>, "carry_forward": true}
+
+        Prefills session n from the subscription's training plan on the
+        server (see TrainingSession.materialize) and returns it as get-data
+        does: 201 when exercises were created, 200 when the session already
+        had content, 404 when there is no plan split for it.
+        """
+        if is_receptionist(request):
+            raise PermissionDenied("Receptionists cannot create training sessions.")
+        try:
+            sub_id = int(request.data.get("subscription"))
+            session_num = int(request.data.get("session_number"))
+        except (TypeError, ValueError):
+            raise ValidationError({"detail": "subscription and session_number must be integers."})
+
+        session, materialized = TrainingSession.materialize(
+            sub_id, session_num, carry_forward=bool(request.data.get("carry_forward", False))
+        )
+        if session is None:
+            return Response({"error": "No training plan split for this session."}, status=status.HTTP_404_NOT_FOUND)
+
+        session = TrainingSession.objects.prefetch_related("exercises__sets").get(pk=session.pk)
+        return Response(
+            {**self.get_serializer(session).data, "materialized": materialized},
+            status=status.HTTP_201_CREATED if materialized else status.HTTP_200_OK,
+            headers={"ETag": _etag(session)},
+        )
 
     @action(detail=False, methods=["get"])
     def history(self, request):
@@ -251,3 +454,172 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(sessions, many=True)
         return Response(serializer.data)
+
+    @action(detail=True, methods=["get"])
+    def pdf(self, request, pk=None):
+        """
+        GET /training-sessions/<id>/pdf/?lang=en|ar
+
+        One session's workout sheet rendered server-side (see views.utils._pdf_response).
+        """
+        session = get_object_or_404(
+            TrainingSession.objects.select_related("subscription__client", "subscription__trainer"), pk=pk
+        )
+        document = training_session_document(session, request.query_params.get("lang", "en"))
+        return _pdf_response(request, document, f"session-{session.session_number}")
+
+    @action(detail=False, methods=["get"], url_path="client-history")
+    def client_history(self, request):
+        """
+        GET /training-sessions/client-history/?client_id=<id>  (or ?subscription=<id>)
+
+        Completed sessions across all of the client's subscriptions, newest
+        first, cursor-paginated (follow `next`). Each session carries its
+        per-exercise summary from ExerciseHistoryEntry rather than the full
+        exercises__sets tree.
+        """
+        client_id = self._history_client_id(request)
+        sessions = TrainingSession.objects.filter(
+            subscription__client_id=client_id,
+            is_completed=True,
+            date_completed__isnull=False,
+        ).values(
+            "id", "subscription_id", "session_number", "name", "date_completed",
+            trainer_name=F("completed_by__first_name"),
+        )
+
+        paginator = TrainingHistoryCursorPagination()
+        page = paginator.paginate_queryset(sessions, request, view=self)
+
+        exercises_by_session: dict = {}
+        for entry in ExerciseHistoryEntry.objects.filter(
+            session_id__in=[s["id"] for s in page]
+        ).order_by("exercise_order"):
+            exercises_by_session.setdefault(entry.session_id, []).append(_history_entry_dict(entry))
+
+        for session in page:
+            session["exercises"] = exercises_by_session.get(session["id"], [])
+        return paginator.get_paginated_response(page)
+
+    @action(detail=False, methods=["get"])
+    def progression(self, request):
+        """
+        GET /training-sessions/progression/?client_id=<id>&exercise=<name>
+
+        Time series for one exercise across all of the client's completed
+        sessions, oldest first. Without `exercise`, lists the exercises the
+        client has history for, with how often and when they were last done.
+        """
+        client_id = self._history_client_id(request)
+        entries = ExerciseHistoryEntry.objects.filter(client_id=client_id)
+
+        exercise = (request.query_params.get("exercise") or "").strip().lower()
+        if not exercise:
+            summary = (
+                entries.values("exercise_key")
+                .annotate(sessions=Count("id"), last_date=Max("date"), name=Max("exercise_name"))
+                .order_by("exercise_key")
+            )
+            return Response({"client_id": client_id, "exercises": list(summary)})
+
+        points = entries.filter(exercise_key=exercise).order_by("date", "session_id", "exercise_order")
+        return Response({
+            "client_id": client_id,
+            "exercise": exercise,
+            "points": [
+                {"date": e.date, "session_id": e.session_id, "subscription_id": e.subscription_id,
+                 **_history_entry_dict(e)}
+                for e in points
+            ],
+        })
+
+    @action(detail=False, methods=["get"])
+    def volume(self, request):
+        """
+        GET /training-sessions/volume/?client_id=<id>[&exercise=<name>][&weeks=12]
+
+        Weekly load per exercise over the client's completed sessions, all
+        aggregated in the database from the parsed set columns (weights in
+        kg, Decimals to 0.01): sets, reps, volume (Σ reps × weight), top weight and estimated
+        1RM (Epley, weight × (1 + reps / 30); a single rep counts as-is).
+        Sets without both a numeric rep count and weight are ignored.
+        """
+        client_id = self._history_client_id(request)
+        try:
+            weeks = min(max(int(request.query_params.get("weeks", 12)), 1), 104)
+        except (TypeError, ValueError):
+            raise ValidationError({"weeks": "weeks must be an integer."})
+        since = timezone.now().date() - timedelta(weeks=weeks)
+
+        sets = SessionSet.objects.filter(
+            exercise__training_session__subscription__client_id=client_id,
+            exercise__training_session__is_completed=True,
+            exercise__training_session__date_completed__gte=since,
+            reps_value__gt=0,
+            weight_value__isnull=False,
+        ).annotate(
+            exercise_key=Lower(Trim("exercise__name")),
+            weight_kg=Case(
+                When(weight_unit=WEIGHT_UNIT_LB, then=F("weight_value") * Value(LB_TO_KG)),
+                default=F("weight_value"),
+                output_field=DecimalField(max_digits=9, decimal_places=4),
+            ),
+        )
+        exercise = (request.query_params.get("exercise") or "").strip().lower()
+        if exercise:
+            sets = sets.filter(exercise_key=exercise)
+
+        rows = (
+            sets.annotate(week=TruncWeek("exercise__training_session__date_completed"))
+            .values("exercise_key", "week")
+            .annotate(
+                sets=Count("id"),
+                reps=Sum("reps_value"),
+                volume=Sum(ExpressionWrapper(F("reps_value") * F("weight_kg"), output_field=FloatField())),
+                top_weight=Max(ExpressionWrapper(F("weight_kg"), output_field=FloatField())),
+                estimated_1rm=Max(Case(
+                    When(reps_value=1, then=F("weight_kg")),
+                    default=F("weight_kg") + F("weight_kg") * F("reps_value") / Value(30.0),
+                    output_field=FloatField(),
+                )),
+            )
+            .order_by("exercise_key", "week")
+        )
+
+        # Summed as floats in SQL (backends disagree on decimal division),
+        # returned as Decimals like the other history endpoints.
+        cents = Decimal("0.01")
+        exercises: dict = {}
+        for row in rows:
+            exercises.setdefault(row.pop("exercise_key"), []).append({
+                **row,
+                "volume": Decimal(row["volume"]).quantize(cents),
+                "top_weight": Decimal(row["top_weight"]).quantize(cents),
+                "estimated_1rm": Decimal(row["estimated_1rm"]).quantize(cents),
+            })
+        return Response({"client_id": client_id, "since": since, "unit": "kg", "exercises": exercises})
+
+    @staticmethod
+    def _history_client_id(request):
+        client_id = request.query_params.get("client_id")
+        if client_id is None and request.query_params.get("subscription"):
+            client_id = (
+                ClientSubscription.objects.filter(pk=request.query_params["subscription"])
+                .values_list("client_id", flat=True)
+                .first()
+            )
+        try:
+            return int(client_id)
+        except (TypeError, ValueError):
+            raise ValidationError({"client_id": "client_id or subscription is required."})
+
+
+def _history_entry_dict(entry):
+    return {
+        "exercise": entry.exercise_name,
+        "sets_count": entry.sets_count,
+        "total_reps": entry.total_reps,
+        "top_weight": entry.top_weight,
+        "volume": entry.volume,
+        "sets": entry.sets,
+    }
@@ -4,10 +4,16 @@ views/utils.py — Pagination classes and shared view-level helper functions.
 
 from decimal import Decimal
 
-from django.db.models import F, OuterRef, Subquery, DecimalField, ExpressionWrapper
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import F, Sum, DecimalField, ExpressionWrapper
+from django.http import HttpResponse
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
 
-from ..models import ClientSubscription, GroupSessionParticipant
+from .. import pdf_export
+from ..cache import etag_matches
+
+from ..models import ClientSubscription, GroupSessionParticipant, TrainingSession
+from ..models import legacy_type_to_category as _legacy_type_to_category  # noqa: F401 (re-export)
 
 
 # ---------------------------------------------------------------------------
@@ -26,6 +32,14 @@ class HistoryPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class TrainingHistoryCursorPagination(CursorPagination):
+    """Newest completed session first; stable while new sessions are completed."""
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
+    ordering = ("-date_completed", "-id")
+
+
 # ---------------------------------------------------------------------------
 # CLIENT DICT BUILDER
 # ---------------------------------------------------------------------------
@@ -55,6 +69,30 @@ def _build_client_dict(sub: ClientSubscription, request) -> dict:
     }
 
 
+# ---------------------------------------------------------------------------
+# PDF EXPORT RESPONSE
+# ---------------------------------------------------------------------------
+
+def _pdf_response(request, document, filename):
+    """
+    Serves `document` (see pdf_export.py) as an inline PDF with its content
+    hash as ETag: 304 for a matching If-None-Match, 202 with Retry-After
+    while a new render is still running in the worker pool.
+    """
+    etag = f'"{pdf_export.document_hash(document)}"'
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        _, pdf = pdf_export.render(document)
+        if pdf is None:
+            response = Response({"status": "rendering"}, status=202, headers={"Retry-After": "2"})
+        else:
+            response = HttpResponse(pdf, content_type="application/pdf")
+            response["Content-Disposition"] = f'inline; filename="{filename}.pdf"'
+    response["ETag"] = etag
+    return response
+
+
 # ---------------------------------------------------------------------------
 # GROUP REVENUE ADJUSTMENT CALCULATOR
 # ---------------------------------------------------------------------------
@@ -65,62 +103,107 @@ def _compute_group_adjustments(month: int, year: int) -> dict:
     cross-trainer group-session completions in the given month/year.
     A positive value means the trainer gained revenue; negative means they lost it.
 
-    Uses a correlated Subquery (one per annotated field) to guarantee exactly one
-    result row per GroupSessionParticipant — no JOIN fan-out, no collapsing.
+    Attribution uses the subscription snapshot (owner_trainer, session_value)
+    written on each participant when it was deducted, so this is a single
+    grouped aggregate and stays correct after the subscription expires.
+    Rows deducted before the snapshot existed are filled in by migration
+    0018 (and, for rows bulk-written later, by
+    `python manage.py backfill_group_participants`). A deduction charges
+    the client's latest-started active subscription, the one the original
+    per-participant subqueries attributed revenue to, so for live data
+    both give the same totals.
     """
-    active_sub = ClientSubscription.objects.filter(
-        client=OuterRef("client"),
-        is_active=True,
-        plan__units__gt=0,
-        trainer__isnull=False,
-    ).order_by("-start_date")
-
-    qs = (
+    totals = (
         GroupSessionParticipant.objects.filter(
             deducted=True,
-            client__isnull=False,
             session__date__month=month,
             session__date__year=year,
             session__coach__isnull=False,
+            owner_trainer__isnull=False,
+            session_value__isnull=False,
         )
-        .annotate(
-            coach_id_ann=F("session__coach_id"),
-            owner_id_ann=Subquery(active_sub.values("trainer_id")[:1]),
-            price_ann=Subquery(active_sub.values("plan__price")[:1]),
-            units_ann=Subquery(active_sub.values("plan__units")[:1]),
-        )
-        .filter(
-            owner_id_ann__isnull=False,
-            price_ann__isnull=False,
-            units_ann__isnull=False,
-        )
-        .exclude(coach_id_ann=F("owner_id_ann"))
-        .values("id", "coach_id_ann", "owner_id_ann", "price_ann", "units_ann")
+        .exclude(owner_trainer=F("session__coach"))
+        .values_list("owner_trainer_id", "session__coach_id")
+        .annotate(total=Sum("session_value"))
+        .order_by()
     )
 
     adjustments: dict = {}
-    for row in qs:
-        if not row["units_ann"]:
-            continue
-        session_value = Decimal(str(row["price_ann"])) / Decimal(str(row["units_ann"]))
-        owner = row["owner_id_ann"]
-        coach = row["coach_id_ann"]
-        adjustments[owner] = adjustments.get(owner, Decimal(0)) - session_value
-        adjustments[coach] = adjustments.get(coach, Decimal(0)) + session_value
+    for owner_id, coach_id, total in totals:
+        amount = Decimal(str(total))
+        adjustments[owner_id] = adjustments.get(owner_id, Decimal(0)) - amount
+        adjustments[coach_id] = adjustments.get(coach_id, Decimal(0)) + amount
 
     return adjustments
 
 
 # ---------------------------------------------------------------------------
-# LEGACY TYPE MAPPER
+# AD-HOC MONTHLY REVENUE (source of truth for the revenue ledger)
 # ---------------------------------------------------------------------------
 
-def _legacy_type_to_category(type_str: str) -> str:
-    mapping = {
-        "strength": "weight",
-        "cardio": "time",
-        "time": "time",
-        "weight": "weight",
-        "reps": "reps",
-    }
-    return mapping.get((type_str or "").lower(), "weight")
+def _compute_monthly_revenue(month: int, year: int) -> dict:
+    """
+    Recomputes every trainer's revenue figures for month/year straight from
+    ClientSubscription, TrainingSession and GroupSessionParticipant rows.
+
+    Returns { trainer_id: {field: Decimal} } keyed by the amount fields of
+    TrainerRevenueLedger. Used by `rebuild_revenue_ledger` to rebuild and verify
+    the ledger that the dashboard reads.
+    """
+    figures: dict = {}
+
+    def _add(trainer_id, field, amount):
+        if trainer_id is None or not amount:
+            return
+        row = figures.setdefault(trainer_id, {
+            "base_revenue": Decimal(0),
+            "session_deductions": Decimal(0),
+            "session_additions": Decimal(0),
+            "group_adjustment": Decimal(0),
+        })
+        row[field] += Decimal(str(amount))
+
+    base_qs = (
+        ClientSubscription.objects.filter(
+            trainer__isnull=False, created_at__month=month, created_at__year=year
+        )
+        .values("trainer_id")
+        .annotate(total=Sum("plan__price"))
+        .values_list("trainer_id", "total")
+    )
+    for trainer_id, total in base_qs:
+        _add(trainer_id, "base_revenue", total)
+
+    session_value_expr = ExpressionWrapper(
+        F("subscription__plan__price") / F("subscription__plan__units"),
+        output_field=DecimalField(max_digits=12, decimal_places=4),
+    )
+    cross_qs = (
+        TrainingSession.objects.filter(
+            date_completed__month=month,
+            date_completed__year=year,
+            is_completed=True,
+            subscription__plan__units__gt=0,
+        )
+        .exclude(completed_by=F("subscription__trainer"))
+        .exclude(completed_by=None)
+        .exclude(subscription__trainer=None)
+        .annotate(session_value=session_value_expr)
+    )
+    for trainer_id, total in (
+        cross_qs.values("subscription__trainer")
+        .annotate(total=Sum("session_value"))
+        .values_list("subscription__trainer", "total")
+    ):
+        _add(trainer_id, "session_deductions", total)
+    for trainer_id, total in (
+        cross_qs.values("completed_by")
+        .annotate(total=Sum("session_value"))
+        .values_list("completed_by", "total")
+    ):
+        _add(trainer_id, "session_additions", total)
+
+    for trainer_id, amount in _compute_group_adjustments(month, year).items():
+        _add(trainer_id, "group_adjustment", amount)
+
+    return figures
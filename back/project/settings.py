@@ -123,13 +123,80 @@ WSGI_APPLICATION = "project.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+#
+# DB_ENGINE=postgres selects PostgreSQL (psycopg2), configured from the
+# POSTGRES_* variables, with persistent connections (DB_CONN_MAX_AGE seconds)
+# and health checks so a dropped connection is replaced instead of failing
+# the next request.
+#
+# Otherwise SQLite is used, tuned for several concurrent writers: every new
+# connection switches to WAL journaling (readers no longer block the writer),
+# waits up to SQLITE_BUSY_TIMEOUT_MS for a lock instead of failing with
+# "database is locked", and opens write transactions IMMEDIATE so the
+# select_for_update() / atomic() blocks take the write lock up front rather
+# than deadlocking on a read-to-write upgrade.
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite").lower()
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", "60"))
+
+if DB_ENGINE in ("postgres", "postgresql"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "gym"),
+            "USER": os.environ.get("POSTGRES_USER", "gym"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+else:
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "20000"))
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+                "transaction_mode": "IMMEDIATE",
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};"
+                    f"PRAGMA synchronous={os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')};"
+                    f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))};"
+                    "PRAGMA temp_store=MEMORY;"
+                ),
+            },
+        }
+    }
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+#
+# Per-process local memory by default. Set DJANGO_CACHE_DIR to share one
+# file-based cache (and its invalidations) between several worker processes.
+
+if os.environ.get("DJANGO_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["DJANGO_CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "gym-default",
+        }
     }
-}
+
+# Seconds a cached dashboard response may live; it is also dropped as soon
+# as any data it is built from changes (see clients/cache.py).
+DASHBOARD_CACHE_TIMEOUT = 300
 
 
 # Password validation
@@ -185,7 +252,7 @@ CORS_ALLOW_ALL_ORIGINS = True  # For development only
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'clients.authentication.DenylistJWTAuthentication',
     ),
     'DEFAULT_THROTTLE_RATES': {
         'login_anon': '10/min', # السماح بـ 10 محاولات فقط في الدقيقة
@@ -194,6 +261,16 @@ REST_FRAMEWORK = {
 
 from datetime import timedelta
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=2), # User stays logged in for 1 day
+    'ACCESS_TOKEN_LIFETIME': timedelta(days=2),
+    # Tokens carry the user's role as a claim; ORM changes to the user or its
+    # groups revoke them at once (clients/signals.py), raw SQL / .update() does not.
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
-}
\ No newline at end of file
+    'TOKEN_REFRESH_SERIALIZER': 'clients.views.auth.DenylistTokenRefreshSerializer',
+}
+# Server-side PDF export (clients/pdf_export.py): the Cairo fonts shipped with
+# the backend, render threads per process, seconds a request waits for a new
+# render before answering 202, and how long rendered PDFs stay cached.
+PDF_FONT_DIR = os.environ.get("PDF_FONT_DIR", BASE_DIR / "clients" / "fonts")
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", "2"))
+PDF_RENDER_WAIT = 10
+PDF_CACHE_TIMEOUT = 7 * 24 * 60 * 60